@@ -4,6 +4,9 @@ from dotenv import load_dotenv
 import json
 import time
 import sys
+import signal
+import threading
+from contextlib import contextmanager
 import tiktoken
 from modules import functions
 from modules import logger
@@ -183,10 +186,48 @@ def is_command(message: str, handler: functions.FunctionHandler) -> bool:
     if message == "help":
         logger.FancyPrint(logger.Role.GPT, handler.get_welcome_message())
         return True
+
+    if message == "stop":
+        emergency_stop(handler)
+        return True
     
     return False
 
 
+def emergency_stop(handler: functions.FunctionHandler) -> None:
+    """
+    Stops the robot without chatGPT (see modules.estop)
+
+    Args:
+        handler (functions.FunctionHandler): Function handler with the emergency stop
+    """
+    msg = handler.estop.trigger()
+    logger.FancyPrint(logger.Role.SYSTEM, f"Nouzové zastavení: {msg}")
+
+
+@contextmanager
+def stop_on_interrupt(handler: functions.FunctionHandler):
+    """
+    Ctrl+C while the assistant works (waits for chatGPT, moves the robot or runs a program) stops the robot right away.
+    Second Ctrl+C interrupts the assistant.
+
+    Args:
+        handler (functions.FunctionHandler): Function handler with the emergency stop
+    """
+    def on_interrupt(signum, frame):
+        if handler.estop.engaged.is_set():
+            raise KeyboardInterrupt
+
+        # The interrupted code may hold locks of the robot connection, so the stop runs in its own thread
+        threading.Thread(target=emergency_stop, args=(handler,), daemon=True, name="EmergencyStop").start()
+
+    previous = signal.signal(signal.SIGINT, on_interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+
 def better_input() -> str:
     """
     Get user input with better handling of KeyboardInterrupt
@@ -337,7 +378,21 @@ def main():
         messages.append({"role": "user", "content": user_input})
         log.log_message(str(json.dumps({"role": "user", "content": user_input}, indent=4)))
 
-        resp = send_to_chatGPT(messages, handler, log)
+        # New request of the user allows moving the robot again after the emergency stop
+        handler.estop.reset()
+
+        try:
+            with stop_on_interrupt(handler):
+                resp = send_to_chatGPT(messages, handler, log)
+
+        except KeyboardInterrupt:
+            # Unfinished function calls of the interrupted answer are not sent to chatGPT again
+            while messages[-1]["role"] != "user":
+                messages.pop()
+
+            logger.FancyPrint(logger.Role.SYSTEM, "Zpracování bylo přerušeno.")
+            user_input = better_input()
+            continue
 
         logger.FancyPrint(logger.Role.GPT, resp)
         user_input = better_input()
@@ -0,0 +1,204 @@
+"""
+Benchmarks of the robot client and the function dispatch.
+By default runs against the local simulator (modules.simulator), results are written as JSON.
+
+Usage:
+    python benchmark.py                                 # simulator with instant moves
+    python benchmark.py --latency 0.002 -n 500          # simulated network latency
+    python benchmark.py --url http://robot:5018         # real controller (moves the robot!)
+    python benchmark.py --compare bench_old.json        # print comparison with an older run
+"""
+import argparse
+import datetime
+import json
+import platform
+import time
+import modules.robot as r
+import modules.ik_cache as ik
+import modules.simulator as sim
+import modules.functions as functions
+
+POSE = r.Pose(
+    r.Position(x=0.014, y=-0.292, z=-0.052),
+    r.Orientation(w=0, x=-0.690, y=0.724, z=0)
+)
+POSE_2 = r.Pose(
+    r.Position(x=0.2, y=0.1, z=0.02),
+    r.Orientation(w=0, x=-0.690, y=0.724, z=0)
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Returns q-th percentile (0-100) of the values (nearest rank)
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """
+    Returns statistics of the samples (seconds) in milliseconds
+    """
+    return {
+        "n": len(samples),
+        "mean_ms": 1000 * sum(samples) / len(samples),
+        "min_ms": 1000 * min(samples),
+        "p50_ms": 1000 * percentile(samples, 50),
+        "p90_ms": 1000 * percentile(samples, 90),
+        "p99_ms": 1000 * percentile(samples, 99),
+        "max_ms": 1000 * max(samples),
+    }
+
+
+def measure(func, n: int, warmup: int = 5) -> list[float]:
+    """
+    Calls func n times and returns duration of each call in seconds
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def bench_endpoints(robot: r.Robot, n: int) -> dict:
+    calls = {
+        "started": robot.started,
+        "get_pose": robot.get_pose,
+        "get_joins": robot.get_joins,
+        "calculate_ik": lambda: robot.calculate_ik(POSE),
+        "move_to": lambda: robot.move_to(POSE, "LINEAR", 100, 100),
+        "suck": robot.suck,
+        "release": robot.release,
+        "belt_speed": lambda: robot.belt_speed("forward", 10),
+        "belt_distance": lambda: robot.belt_distance("forward", 50, 0.001),
+    }
+
+    return {name: summarize(measure(func, n)) for name, func in calls.items()}
+
+
+def bench_throughput(robot: r.Robot, cached_robot: r.Robot, n: int) -> dict:
+    poses = [POSE, POSE_2]
+    results = {}
+
+    loops = {
+        "move_to": lambda i: robot.move_to(poses[i % 2], "LINEAR", 100, 100),
+        "calculate_ik": lambda i: robot.calculate_ik(poses[i % 2]),
+        "calculate_ik_cached": lambda i: cached_robot.calculate_ik(poses[i % 2]),
+    }
+
+    for name, func in loops.items():
+        start = time.perf_counter()
+        for i in range(n):
+            func(i)
+        elapsed = time.perf_counter() - start
+
+        results[name] = {"n": n, "seconds": elapsed, "ops_per_s": n / elapsed}
+
+    return results
+
+
+def bench_move_object(robot: r.Robot, n: int) -> dict:
+    return summarize(measure(lambda: robot.move_object(POSE, POSE_2, 100), n, warmup=2))
+
+
+def bench_dispatch(handler: functions.FunctionHandler, n: int) -> dict:
+    params = {"moveType": "LINEAR", "pose": POSE.to_dict(), "velocity": 100, "acceleration": 100}
+
+    dispatch = measure(lambda: handler.handle_function("move_to", params), n)
+    direct = measure(lambda: handler.robot.move_to(POSE, "LINEAR", 100, 100), n)
+    conversion = measure(lambda: r.Pose.from_dict(params["pose"]), n)
+
+    return {
+        "handle_function_move_to": summarize(dispatch),
+        "robot_move_to": summarize(direct),
+        "put_pose_conversion": summarize(conversion),
+        "dispatch_overhead_ms": 1000 * (percentile(dispatch, 50) - percentile(direct, 50)),
+    }
+
+
+def compare(old: dict, new: dict, prefix: str = "") -> None:
+    """
+    Prints p50 (or ops/s) of both runs for every benchmark present in both
+    """
+    for key, value in new.items():
+        if key not in old:
+            continue
+
+        if isinstance(value, dict) and "p50_ms" in value:
+            change = 100 * (value["p50_ms"] - old[key]["p50_ms"]) / old[key]["p50_ms"]
+            print(f"{prefix}{key:<40} p50 {old[key]['p50_ms']:10.3f} ms -> {value['p50_ms']:10.3f} ms ({change:+.1f} %)")
+
+        elif isinstance(value, dict) and "ops_per_s" in value:
+            change = 100 * (value["ops_per_s"] - old[key]["ops_per_s"]) / old[key]["ops_per_s"]
+            print(f"{prefix}{key:<40} {old[key]['ops_per_s']:10.1f} op/s -> {value['ops_per_s']:10.1f} op/s ({change:+.1f} %)")
+
+        elif isinstance(value, dict):
+            compare(old[key], value, prefix + key + ".")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the robot client")
+    parser.add_argument("--url", default=None, help="controller url (default: start local simulator)")
+    parser.add_argument("-n", type=int, default=200, help="iterations of every benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated network latency in seconds")
+    parser.add_argument("--time-scale", type=float, default=0.0, help="simulated motion time multiplier")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="JSON file of an older run to compare with")
+    args = parser.parse_args()
+
+    simulator = None
+    url = args.url
+    if url is None:
+        simulator = sim.Simulator(latency=args.latency, time_scale=args.time_scale)
+        url = simulator.start()
+
+    # IK cache is disabled so every calculate_ik goes to the controller
+    robot = r.Robot(url, ik_cache=ik.IKCache(max_size=0))
+    cached_robot = r.Robot(url, ik_cache=ik.IKCache())
+    handler = functions.FunctionHandler(0, url)
+
+    results = {
+        "meta": {
+            "time": datetime.datetime.now().isoformat(),
+            "url": url,
+            "simulator": simulator is not None,
+            "latency": args.latency,
+            "time_scale": args.time_scale,
+            "n": args.n,
+            "python": platform.python_version(),
+        },
+        "endpoints": bench_endpoints(robot, args.n),
+        "throughput": bench_throughput(robot, cached_robot, args.n),
+        "move_object": bench_move_object(robot, max(1, args.n // 10)),
+        "dispatch": bench_dispatch(handler, args.n),
+    }
+
+    if simulator is not None:
+        simulator.stop()
+
+    output = args.output or f"bench_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+    with open(output, 'w', encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<20} p50 {stats['p50_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms")
+    print(f"move_object cycle    p50 {results['move_object']['p50_ms']:8.3f} ms")
+    print(f"dispatch overhead    {results['dispatch']['dispatch_overhead_ms']:8.3f} ms")
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding="utf-8") as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 import modules.functions as f
 import modules.logger as l
 import json
+import threading
+import time
 
 # Fix pro šířku stránky
 st.markdown("""
@@ -49,6 +51,10 @@ def is_command(message: str, handler: f.FunctionHandler, messages: list[dict]) -
         #l.FancyPrint(l.Role.GPT, handler.get_welcome_message())
         messages.append({"role": "show", "content": handler.get_welcome_message()})
         return True
+
+    if message == "stop":
+        messages.append({"role": "show", "content": handler.estop.trigger()})
+        return True
     
     return False
 
@@ -64,6 +70,27 @@ def rename_file(directory, old_name, new_name):
     os.rename(old_path, new_path)
 
 
+def start_processing(messages: list[dict], handler: f.FunctionHandler, log: l.Logger) -> None:
+    """
+    Runs send_to_chatGPT in a background thread, so the script can react to the stop button while the assistant works
+    """
+    result = {}
+
+    def work():
+        try:
+            result["response"] = a.send_to_chatGPT(messages=messages, handler=handler, log=log)
+        except BaseException as e:
+            # send_to_chatGPT exits on fatal errors, the thread must still report something
+            result["response"] = f"Nastala chyba: {e}"
+
+    # New request of the user allows moving the robot again after the emergency stop
+    handler.estop.reset()
+
+    thread = threading.Thread(target=work, daemon=True, name="Assistant")
+    thread.start()
+    st.session_state.worker = (thread, result)
+
+
 def clear_session_vars():
     for key in list(st.session_state.keys()):
         del st.session_state[key]
@@ -126,6 +153,10 @@ elif "messages" not in st.session_state:
 if "is_processing" not in st.session_state:
     st.session_state.is_processing = False
 
+# EMERGENCY STOP (at the top of the script, so the click is handled before waiting for the assistant)
+if st.sidebar.button("Nouzové zastavení", type="primary", use_container_width=True):
+    st.session_state.messages.append({"role": "show", "content": st.session_state.handler.estop.trigger()})
+
 
 # UPDATE CONTEXT LENGTH
 st.session_state.context_len = len(st.session_state.messages)
@@ -150,15 +181,25 @@ for message in st.session_state.messages[1:]:
 if st.session_state.is_processing:
     with st.spinner("Zpracování..."):        
         prompt = st.session_state.messages[-1]["content"]
-        if is_command(prompt, st.session_state.handler, st.session_state.messages):
+        if "worker" not in st.session_state and is_command(prompt, st.session_state.handler, st.session_state.messages):
             pass
         else:
-
-            response = a.send_to_chatGPT(
-                messages=[msg for msg in st.session_state.messages if msg["role"] in ["system", "assistant", "user"]], 
-                handler=st.session_state.handler, 
-                log=st.session_state.logger,
-                )
+            if "worker" not in st.session_state:
+                start_processing(
+                    messages=[msg for msg in st.session_state.messages if msg["role"] in ["system", "assistant", "user"]], 
+                    handler=st.session_state.handler, 
+                    log=st.session_state.logger,
+                    )
+
+            thread, result = st.session_state.worker
+            heartbeat = st.empty()
+            while thread.is_alive():
+                # Every streamlit call lets the click on the stop button rerun the script (the thread keeps working)
+                heartbeat.empty()
+                time.sleep(0.05)
+
+            del st.session_state.worker
+            response = result.get("response", "")
             
             st.session_state.messages.append({"role": "assistant", "content": response})
             with st.chat_message("assistant"):
@@ -0,0 +1,159 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import modules.robot as r
+import modules.transport as t
+
+
+class AsyncRobot:
+    """
+    Asyncio version of Robot. Offers the same methods as coroutines, so arm moves,
+    conveyor moves and state queries can run at the same time.
+
+    The calls run in worker threads over one Robot. Arm commands and state queries share the pose shadow
+    and IK cache of the Robot, so they are sent one after another; belt commands wait only for each other,
+    started and stop are sent at once (stop interrupts a running move).
+
+    Example:
+        async with await AsyncRobot.create() as robot:
+            await asyncio.gather(
+                robot.move_to(pose, "JUMP"),
+                robot.belt_distance("forward", 50, 0.1),
+            )
+    """
+
+    def __init__(self, robot: r.Robot, max_workers: int = t.POOL_SIZE):
+        """
+        Wraps a connected Robot, use await AsyncRobot.create() to connect without blocking the event loop
+
+        Args:
+            robot (Robot): The connected robot, all requests go through it (results and errors are the same as with Robot).
+            max_workers (int, optional): Maximum number of requests running at the same time. Defaults to the connection pool size.
+        """
+        self.robot = robot
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AsyncRobot")
+        self.arm_lock = asyncio.Lock()
+        self.belt_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, url: str = r.URL, mode: r.Mode = r.Mode.DEFAULT, transport: t.Transport = None,
+                     max_workers: int = t.POOL_SIZE) -> 'AsyncRobot':
+        """
+        Connects to the robot in a worker thread (the event loop keeps running) and returns the AsyncRobot
+
+        Args:
+            url (str, optional): Url of the robot. Defaults to ROBOT_URL from .env file.
+            mode (Mode, optional): Error handling mode. Defaults to Mode.DEFAULT.
+            transport (Transport, optional): Connection to the robot. Defaults to pooled connection shared by the whole process.
+            max_workers (int, optional): Maximum number of requests running at the same time. Defaults to the connection pool size.
+        """
+        loop = asyncio.get_running_loop()
+        robot = await loop.run_in_executor(None, r.Robot, url, mode, transport)
+
+        return cls(robot, max_workers)
+
+    async def __aenter__(self) -> 'AsyncRobot':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the worker threads (already running requests are finished)
+        """
+        self.executor.shutdown(wait=False)
+
+    async def _call(self, lock: asyncio.Lock, func, *args):
+        loop = asyncio.get_running_loop()
+
+        if lock is None:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+        async with lock:
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    async def started(self) -> bool:
+        """
+        Returns True if the robot is started, False if not
+        """
+        return await self._call(None, self.robot.started)
+
+    async def start(self) -> str:
+        """
+        Starts the robot
+        """
+        return await self._call(self.arm_lock, self.robot.start)
+
+    async def stop(self) -> str:
+        """
+        Stops the robot
+        """
+        return await self._call(None, self.robot.stop)
+
+    async def get_pose(self) -> r.Pose:
+        """
+        Returns:
+            Pose: The current pose of the robot.
+        """
+        return await self._call(self.arm_lock, self.robot.get_pose)
+
+    async def move_to(self, pose: r.Pose, moveType: str, velocity: int = None, acceleration: int = None, safe: bool = None) -> str:
+        """
+        Moves the robot to the specified pose (see Robot.move_to)
+        """
+        return await self._call(self.arm_lock, self.robot.move_to, pose, moveType, velocity, acceleration, safe)
+
+    async def home(self) -> str:
+        """
+        Calibrates the robot and moves to the home position
+        """
+        return await self._call(self.arm_lock, self.robot.home)
+
+    async def suck(self) -> str:
+        """
+        Turn on the vacuum. (Holds an object)
+        """
+        return await self._call(self.arm_lock, self.robot.suck)
+
+    async def release(self) -> str:
+        """
+        Turn off the vacuum. (Releases an object)
+        """
+        return await self._call(self.arm_lock, self.robot.release)
+
+    async def belt_speed(self, direction: str, velocity: int) -> str:
+        """
+        Starts the conveyor belt with the given velocity and direction (see Robot.belt_speed)
+        """
+        return await self._call(self.belt_lock, self.robot.belt_speed, direction, velocity)
+
+    async def belt_distance(self, direction: str, velocity: int, distance: float) -> str:
+        """
+        Moves the conveyor belt with the given velocity, direction and distance (see Robot.belt_distance)
+        """
+        return await self._call(self.belt_lock, self.robot.belt_distance, direction, velocity, distance)
+
+    async def get_joins(self) -> list[float]:
+        """
+        Returns:
+            list[float]: The current joins of the robot.
+        """
+        return await self._call(self.arm_lock, self.robot.get_joins)
+
+    async def calculate_ik(self, pose: r.Pose = None) -> list[float]:
+        """
+        Returns the calculated joins for the pose or None if IK is not possible (see Robot.calculate_ik)
+        """
+        return await self._call(self.arm_lock, self.robot.calculate_ik, pose)
+
+    async def move_object(self, src_pose: r.Pose, dst_pose: r.Pose, velocity: int = 100, rtrn_to_origin: bool = False) -> str:
+        """
+        Moves an object from one pose to another (see Robot.move_object)
+        """
+        return await self._call(self.arm_lock, self.robot.move_object, src_pose, dst_pose, velocity, rtrn_to_origin)
+
+    async def rotate_arm_degrees(self, angle_deg: float, velocity: int = 100, maintain_ori: bool = False) -> str:
+        """
+        Rotates the arm to the specified angle (see Robot.rotate_arm_degrees)
+        """
+        return await self._call(self.arm_lock, self.robot.rotate_arm_degrees, angle_deg, velocity, maintain_ori)
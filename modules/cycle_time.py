@@ -0,0 +1,508 @@
+"""
+Cycle-time optimizer of saved programs.
+Runs the program on the local simulator (dry run) or reads recorded telemetry, predicts duration of every move
+with a motion-time model (fitted from measured move_to latencies) and searches velocity, acceleration and allowed move types
+of every move_to call for the gentlest setting (lowest velocity + acceleration) whose predicted time is within --slack
+of the fastest one. The move type is kept unless a change is explicitly allowed
+(a different move type follows a different path, so it may collide). The result is written as a rewritten program.
+
+Usage:
+    python -m modules.cycle_time ./src/program.py --output ./src/program_fast.py
+    python -m modules.cycle_time ./src/program.py --telemetry telemetry --carry-acceleration 50 --slack 5
+"""
+from dotenv import load_dotenv
+from urllib.parse import urlparse, parse_qs
+import argparse
+import ast
+import json
+import math
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+load_dotenv()
+DEFAULT_VELOCITY = 50           # % used by the controller when move_to is called without velocity
+DEFAULT_ACCELERATION = 50       # % used by the controller when move_to is called without acceleration
+SEARCH_STEP = 5                 # % between searched velocities and accelerations
+
+# move types which can replace the original one, by default the path of every move stays the same
+ALTERNATIVES = {
+    "JUMP": ("JUMP",),
+    "LINEAR": ("LINEAR",),
+    "JOINTS": ("JOINTS",),
+}
+# allowed by --swap-linear-joints (straight line becomes an arc in joint space and back)
+DIRECT_ALTERNATIVES = {
+    "LINEAR": ("LINEAR", "JOINTS"),
+    "JOINTS": ("JOINTS", "LINEAR"),
+}
+
+
+class MotionModel:
+    """
+    Duration of moves with trapezoidal velocity profile (defaults are the same as in the local simulator)
+    """
+    PARAMETERS = ("max_speed", "max_acceleration", "jump_height", "joints_factor", "overhead")
+
+    def __init__(self, max_speed: float = 0.3, max_acceleration: float = 1.0, jump_height: float = 0.05,
+                 joints_factor: float = 0.8, overhead: float = 0.05):
+        """
+        Args:
+            max_speed (float, optional): m/s of the arm at velocity 100.
+            max_acceleration (float, optional): m/s^2 of the arm at acceleration 100.
+            jump_height (float, optional): Meters the arm is lifted by JUMP moves.
+            joints_factor (float, optional): Duration of JOINTS moves relative to LINEAR moves of the same distance.
+            overhead (float, optional): Seconds added to every move (latency, settling).
+        """
+        self.max_speed = max_speed
+        self.max_acceleration = max_acceleration
+        self.jump_height = jump_height
+        self.joints_factor = joints_factor
+        self.overhead = overhead
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.PARAMETERS}
+
+    def profile_time(self, distance, velocity, acceleration):
+        """
+        Returns duration of straight move of the distance (meters) with velocity and acceleration in percentage
+        (numbers or NumPy arrays broadcast against each other, also against array parameters of the model)
+        """
+        v = self.max_speed * np.asarray(velocity, dtype=float) / 100
+        a = self.max_acceleration * np.asarray(acceleration, dtype=float) / 100
+        distance = np.asarray(distance, dtype=float)
+
+        # triangular profile if the arm can't reach the velocity
+        return np.where(distance <= v * v / a, 2 * np.sqrt(distance / a), distance / v + v / a)
+
+    def move_times(self, move_types, distances, velocities, accelerations) -> np.ndarray:
+        """
+        Returns predicted durations of many moves at once (including overhead), arguments are broadcast against each other
+        """
+        move_types = np.asarray(move_types)
+        distances = np.where(move_types == "JOINTS", self.joints_factor * np.asarray(distances, dtype=float), distances)
+        seconds = self.profile_time(distances, velocities, accelerations)
+
+        # JUMP goes up, across and down
+        lift = 2 * self.profile_time(self.jump_height, velocities, accelerations)
+
+        return seconds + np.where(move_types == "JUMP", lift, 0.0) + self.overhead
+
+    def move_time(self, move_type: str, distance: float, velocity: float = None, acceleration: float = None) -> float:
+        """
+        Returns predicted duration of the move (including overhead)
+        """
+        velocity = DEFAULT_VELOCITY if velocity is None else velocity
+        acceleration = DEFAULT_ACCELERATION if acceleration is None else acceleration
+
+        return float(self.move_times(move_type, distance, velocity, acceleration))
+
+    @classmethod
+    def fit(cls, moves: list['Move'], jump_height: float = 0.05, joints_factor: float = 0.8) -> 'MotionModel':
+        """
+        Fits max_speed, max_acceleration and overhead to measured durations of moves (least squares on a grid)
+
+        Raises:
+            ValueError: If there are less than 3 measured moves.
+        """
+        moves = [move for move in moves if move.seconds is not None]
+        if len(moves) < 3:
+            raise ValueError("At least 3 measured moves are needed to fit the model")
+
+        measured = np.array([move.seconds for move in moves])
+        move_types, distances, velocities, accelerations = move_arrays(moves)
+        max_accelerations = np.geomspace(0.05, 20.0, 48)[:, None]
+        best = None
+
+        # all accelerations of one speed at once, rows of the grid x moves
+        for max_speed in np.geomspace(0.02, 2.0, 48):
+            model = cls(max_speed, max_accelerations, jump_height, joints_factor, 0.0)
+            residuals = measured - model.move_times(move_types, distances, velocities, accelerations)
+
+            # best overhead for these parameters is the mean residual (not negative)
+            overheads = np.maximum(0.0, residuals.mean(axis=1))
+            errors = np.sum((residuals - overheads[:, None]) ** 2, axis=1)
+            i = int(np.argmin(errors))
+
+            if best is None or errors[i] < best[0]:
+                best = (float(errors[i]), max_speed, max_accelerations[i, 0], float(overheads[i]))
+
+        _, max_speed, max_acceleration, overhead = best
+
+        return cls(float(max_speed), float(max_acceleration), jump_height, joints_factor, overhead)
+
+
+class Move:
+    """
+    One executed move_to command
+    """
+    __slots__ = ("line", "move_type", "velocity", "acceleration", "start", "target", "carrying", "seconds")
+
+    def __init__(self, line: int, move_type: str, velocity: float, acceleration: float, start: tuple, target: tuple,
+                 carrying: bool = False, seconds: float = None):
+        self.line = line                    # line of the program which sent the move (None if unknown)
+        self.move_type = move_type
+        self.velocity = velocity            # None = default of the controller
+        self.acceleration = acceleration
+        self.start = start                  # (x, y, z) before the move
+        self.target = target                # (x, y, z) after the move
+        self.carrying = carrying            # vacuum was on during the move
+        self.seconds = seconds              # measured duration
+
+    @property
+    def distance(self) -> float:
+        return math.dist(self.start, self.target)
+
+
+def move_arrays(moves: list[Move]) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns move types, distances, velocities and accelerations of the moves as arrays (defaults of the controller filled in)
+    """
+    return (
+        np.array([move.move_type for move in moves]),
+        np.array([move.distance for move in moves]),
+        np.array([DEFAULT_VELOCITY if move.velocity is None else move.velocity for move in moves], dtype=float),
+        np.array([DEFAULT_ACCELERATION if move.acceleration is None else move.acceleration for move in moves], dtype=float),
+    )
+
+
+def parse_commands(commands: list[dict], home: tuple = (0.2, 0.0, 0.05)) -> list[Move]:
+    """
+    Converts sent commands to moves
+
+    Args:
+        commands (list[dict]): Items {"path": path with query, "body": JSON body, "seconds": latency, "line": line or None, "ok": bool}.
+        home (tuple, optional): Position of the arm before the first move and after homing.
+    """
+    moves = []
+    position = home
+    carrying = False
+
+    for command in commands:
+        if not command.get("ok", True):
+            continue
+
+        url = urlparse(command["path"])
+
+        if url.path == "/suck":
+            carrying = True
+        elif url.path == "/release":
+            carrying = False
+        elif url.path == "/home":
+            position = home
+        elif url.path == "/eef/pose" and command.get("body"):
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            p = json.loads(command["body"])["position"]
+            target = (p["x"], p["y"], p["z"])
+
+            moves.append(Move(
+                command.get("line"),
+                query.get("moveType", "JUMP"),
+                float(query["velocity"]) if "velocity" in query else None,
+                float(query["acceleration"]) if "acceleration" in query else None,
+                position,
+                target,
+                carrying,
+                command.get("seconds"),
+            ))
+            position = target
+
+    return moves
+
+
+def moves_from_telemetry(directory: str, start: float = None, end: float = None) -> list[Move]:
+    """
+    Returns moves recorded by modules.telemetry (with measured durations, without lines of the program)
+    """
+    import modules.telemetry as tel
+
+    log = tel.TelemetryLog(directory)
+    arrays = log.commands(start, end)
+    commands = []
+
+    for i in range(len(arrays["time"])):
+        if log.endpoints[arrays["endpoint"][i]].startswith("GET ") or arrays["truncated"][i]:
+            continue
+
+        commands.append({
+            "path": arrays["path"][i].decode("utf-8"),
+            "body": arrays["body"][i].decode("utf-8"),
+            "seconds": float(arrays["seconds"][i]),
+            "ok": 200 <= int(arrays["status"][i]) < 300,
+        })
+
+    return parse_commands(commands)
+
+
+def trace_program(path: str, timeout: float = 60.0) -> list[Move]:
+    """
+    Runs the program on the local simulator (instant moves) and returns its moves with lines of the program
+
+    Raises:
+        RuntimeError: If the program fails.
+    """
+    import modules.simulator as sim
+
+    simulator = sim.Simulator(time_scale=0)
+    url = simulator.start()
+    home = sim.HOME_POSE["position"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "trace.json")
+        env = dict(os.environ, ROBOT_URL=url)
+
+        try:
+            result = subprocess.run([sys.executable, "-m", "modules.cycle_time", "--trace", output, path],
+                                    capture_output=True, text=True, env=env, timeout=timeout)
+        finally:
+            simulator.stop()
+
+        if result.returncode != 0:
+            raise RuntimeError(f"Program failed in the dry run:\n{result.stderr}")
+
+        with open(output, 'r', encoding="utf-8") as file:
+            commands = json.load(file)
+
+    return parse_commands(commands, (home["x"], home["y"], home["z"]))
+
+
+def _trace(path: str, output: str) -> None:
+    """
+    Runs the program in this process and saves sent commands with lines of the program (used by trace_program)
+    """
+    import modules.robot as r
+
+    program = os.path.abspath(path)
+    commands = []
+
+    def observer(record) -> None:
+        # innermost frame of the program is the line which sent the command
+        frame = sys._getframe()
+        while frame is not None and os.path.abspath(frame.f_code.co_filename) != program:
+            frame = frame.f_back
+
+        commands.append({
+            "path": record.path,
+            "body": record.body,
+            "seconds": record.seconds,
+            "line": frame.f_lineno if frame is not None else None,
+            "ok": 200 <= record.status < 300,
+        })
+
+    r.t.get_transport(r.URL).add_observer(observer)
+
+    try:
+        runpy.run_path(program, run_name="__main__")
+    finally:
+        with open(output, 'w', encoding="utf-8") as file:
+            json.dump(commands, file)
+
+
+class Limits:
+    """
+    Limits of the optimizer
+    """
+    def __init__(self, max_velocity: int = 100, max_acceleration: int = 100, carry_velocity: int = None,
+                 carry_acceleration: int = None, alternatives: dict = None, slack: float = 0.02):
+        """
+        Args:
+            max_velocity (int, optional): Maximum velocity (1-100) of all moves.
+            max_acceleration (int, optional): Maximum acceleration (1-100) of all moves.
+            carry_velocity (int, optional): Maximum velocity of moves with vacuum on (carrying an object).
+            carry_acceleration (int, optional): Maximum acceleration of moves with vacuum on.
+            alternatives (dict, optional): Original moveType -> allowed moveTypes. Defaults to ALTERNATIVES.
+            slack (float, optional): Allowed fraction of time above the fastest setting, traded for lower velocity
+                and acceleration (0 = fastest, only values which don't shorten the moves are lowered). Defaults to 0.02.
+        """
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        self.carry_velocity = carry_velocity if carry_velocity is not None else max_velocity
+        self.carry_acceleration = carry_acceleration if carry_acceleration is not None else max_acceleration
+        self.alternatives = alternatives if alternatives is not None else ALTERNATIVES
+        self.slack = slack
+
+    def velocity(self, move: Move) -> int:
+        return min(self.max_velocity, self.carry_velocity) if move.carrying else self.max_velocity
+
+    def acceleration(self, move: Move) -> int:
+        return min(self.max_acceleration, self.carry_acceleration) if move.carrying else self.max_acceleration
+
+
+def search_values(limit: int, step: int = SEARCH_STEP) -> np.ndarray:
+    """
+    Returns velocities or accelerations searched up to the limit (every step %, the limit itself included)
+    """
+    return np.unique(np.append(np.arange(step, limit, step), limit)).astype(float)
+
+
+def optimize(moves: list[Move], model: MotionModel, limits: Limits = None) -> dict:
+    """
+    Chooses moveType, velocity and acceleration for every line of the program with move_to
+
+    Every allowed move type is evaluated on a grid of velocities and accelerations up to the limits. The fastest
+    predicted time is allowed to grow by limits.slack, and within it the setting with the lowest velocity + acceleration
+    is chosen (e.g. short moves never reach the full velocity, so a lower one costs nothing).
+    Moves sent from the same line share the choice (e.g. move_to in a loop), so it has to satisfy limits of all of them.
+
+    Returns:
+        dict: "lines" (line -> {"moveType", "velocity", "acceleration", "before", "after", "fastest", "moves", "changed"}),
+            "before" and "after" (predicted cycle time in seconds).
+    """
+    limits = limits or Limits()
+    by_line: dict[int, list[Move]] = {}
+    unchanged = 0.0
+
+    for move in moves:
+        if move.line is None:
+            unchanged += model.move_time(move.move_type, move.distance, move.velocity, move.acceleration)
+        else:
+            by_line.setdefault(move.line, []).append(move)
+
+    lines = {}
+    for line, group in by_line.items():
+        move_types, distances, velocities, accelerations = move_arrays(group)
+        before = float(model.move_times(move_types, distances, velocities, accelerations).sum())
+
+        # every move of the line must be allowed to change to the chosen type
+        types = set.intersection(*(set(limits.alternatives.get(m.move_type, (m.move_type,))) for m in group))
+
+        # grid of velocities (rows) x accelerations (columns) x moves
+        v = search_values(min(limits.velocity(m) for m in group))[:, None, None]
+        a = search_values(min(limits.acceleration(m) for m in group))[None, :, None]
+        candidates = []
+
+        for move_type in sorted(types):
+            after = model.move_times(move_type, distances, v, a).sum(axis=2)
+            candidates += [(float(after[i, j]), move_type, int(v[i, 0, 0]), int(a[0, j, 0]))
+                           for i in range(after.shape[0]) for j in range(after.shape[1])]
+
+        # moves of different types sent from one line (e.g. by move_object) can't be changed together
+        fastest = min((c[0] for c in candidates), default=before)
+        allowed = [c for c in candidates if c[0] <= fastest * (1 + limits.slack) + 1e-9]
+        after, move_type, velocity, acceleration = min(allowed, key=lambda c: (c[2] + c[3], c[0]), default=(before, None, None, None))
+
+        # the original setting is kept if it is within the slack and at least as gentle as the chosen one
+        keep = move_type is None or (before <= fastest * (1 + limits.slack) + 1e-9 and
+                                     (velocities[0] + accelerations[0], before) <= (velocity + acceleration, after))
+
+        changed = not keep
+        if keep:
+            after, move_type, velocity, acceleration = before, group[0].move_type, group[0].velocity, group[0].acceleration
+
+        lines[line] = {"moveType": move_type, "velocity": velocity, "acceleration": acceleration, "before": before,
+                       "after": after, "fastest": fastest, "moves": len(group), "changed": changed}
+
+    return {
+        "lines": lines,
+        "before": unchanged + sum(line["before"] for line in lines.values()),
+        "after": unchanged + sum(line["after"] for line in lines.values()),
+    }
+
+
+def rewrite(source: str, lines: dict) -> str:
+    """
+    Returns source with moveType, velocity and acceleration of move_to calls replaced by the chosen ones.
+    Lines with more than one move_to call are left unchanged.
+    """
+    calls: dict[int, list[ast.Call]] = {}
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "move_to":
+            calls.setdefault(node.lineno, []).append(node)
+
+    offsets = [0]
+    for text in source.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(text))
+
+    def position(line: int, col: int) -> int:
+        # ast columns are in utf-8 bytes
+        text = source[offsets[line - 1]:offsets[line]]
+        return offsets[line - 1] + len(text.encode("utf-8")[:col].decode("utf-8"))
+
+    replacements = []
+    for line, choice in lines.items():
+        if len(calls.get(line, [])) != 1 or not choice["changed"]:
+            continue
+
+        node = calls[line][0]
+        arguments = {name: value for name, value in zip(("pose", "moveType", "velocity", "acceleration"), node.args)}
+        arguments.update({keyword.arg: keyword.value for keyword in node.keywords if keyword.arg is not None})
+        missing = ""
+
+        # only the values are replaced, so the rest of the call keeps its formatting
+        for name, value in (("moveType", choice["moveType"]), ("velocity", int(choice["velocity"])), ("acceleration", int(choice["acceleration"]))):
+            if name in arguments:
+                argument = arguments[name]
+                replacements.append((position(argument.lineno, argument.col_offset), position(argument.end_lineno, argument.end_col_offset), json.dumps(value)))
+            else:
+                missing += f", {name}={json.dumps(value)}"
+
+        if missing:
+            last = max(node.args + [keyword.value for keyword in node.keywords], key=lambda n: (n.end_lineno, n.end_col_offset))
+            end = position(last.end_lineno, last.end_col_offset)
+            replacements.append((end, end, missing))
+
+    for start, end, text in sorted(replacements, reverse=True):
+        source = source[:start] + text + source[end:]
+
+    return source
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chooses the gentlest moveType, velocity and acceleration of move_to calls within --slack of the shortest cycle time")
+    parser.add_argument("program", help="saved program (e.g. ./src/program.py)")
+    parser.add_argument("--output", default=None, help="rewritten program (default: only print the report)")
+    parser.add_argument("--telemetry", default=None, help="telemetry directory used to fit the motion model")
+    parser.add_argument("--max-velocity", type=int, default=100)
+    parser.add_argument("--max-acceleration", type=int, default=100)
+    parser.add_argument("--carry-velocity", type=int, default=None, help="maximum velocity while vacuum is on")
+    parser.add_argument("--carry-acceleration", type=int, default=None, help="maximum acceleration while vacuum is on")
+    parser.add_argument("--replace-jump", action="store_true", help="allow replacing JUMP moves by direct moves (no lift over obstacles)")
+    parser.add_argument("--slack", type=float, default=2.0, help="%% of cycle time traded for lower velocity and acceleration (default 2)")
+    parser.add_argument("--swap-linear-joints", action="store_true", help="allow replacing LINEAR by JOINTS moves and back (different path)")
+    parser.add_argument("--trace", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trace:
+        _trace(args.program, args.trace)
+        return
+
+    model = MotionModel()
+    if args.telemetry:
+        model = MotionModel.fit(moves_from_telemetry(args.telemetry))
+        print(f"Fitted motion model: {json.dumps(model.to_dict())}")
+
+    alternatives = dict(ALTERNATIVES)
+    if args.swap_linear_joints:
+        alternatives.update(DIRECT_ALTERNATIVES)
+    if args.replace_jump:
+        alternatives["JUMP"] = ("JUMP", "LINEAR", "JOINTS")
+
+    limits = Limits(args.max_velocity, args.max_acceleration, args.carry_velocity, args.carry_acceleration, alternatives, args.slack / 100)
+    result = optimize(trace_program(args.program), model, limits)
+
+    for line, choice in sorted(result["lines"].items()):
+        if not choice["changed"]:
+            print(f"line {line:4}: {choice['moves']:3}x unchanged ({choice['before']:.2f} s)")
+            continue
+
+        print(f"line {line:4}: {choice['moves']:3}x -> {choice['moveType']:<7} velocity {choice['velocity']}, "
+              f"acceleration {choice['acceleration']}  ({choice['before']:.2f} s -> {choice['after']:.2f} s, fastest {choice['fastest']:.2f} s)")
+
+    saving = 1 - result["after"] / result["before"] if result["before"] > 0 else 0.0
+    print(f"Predicted cycle time {result['before']:.2f} s -> {result['after']:.2f} s ({100 * saving:.0f} % shorter)")
+
+    if args.output:
+        with open(args.program, 'r', encoding="utf-8") as file:
+            source = file.read()
+
+        with open(args.output, 'w', encoding="utf-8") as file:
+            file.write(rewrite(source, result["lines"]))
+
+        print(f"Rewritten program saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Emergency stop independent of the assistant.
+Every controller gets its own connection which is used only for stopping, so the stop is sent right away
+even while the shared connection waits for a long move, the assistant waits for chatGPT or a program runs.
+Queued robot commands are cancelled by the listeners after the stop was sent.
+"""
+from dotenv import load_dotenv
+import os
+import threading
+import time
+import modules.transport as t
+
+load_dotenv()
+STOP_TIMEOUT = float(os.getenv('ROBOT_STOP_TIMEOUT', '1.0'))      # seconds for connecting and answering of stop requests
+STOP_PATHS = ("/state/stop", "/release")                          # sent in this order to every controller
+
+
+class EmergencyStop:
+    """
+    Stops all controllers and cancels queued commands.
+
+    Example:
+        estop = EmergencyStop([robot_url])
+        estop.add_listener(robot.cancel_pending)
+        estop.trigger()     # e.g. from a signal handler or a button
+    """
+    def __init__(self, urls: list[str], timeout: float = STOP_TIMEOUT):
+        """
+        Args:
+            urls (list[str]): Urls of the controllers to stop.
+            timeout (float, optional): Timeout in seconds of the stop requests. Defaults to ROBOT_STOP_TIMEOUT.
+        """
+        # own connections, nothing else waits on them
+        self.transports = [t.HttpTransport(url, timeout, timeout, retries=0, pool_size=1) for url in dict.fromkeys(urls) if url]
+        self.listeners = []
+        self.engaged = threading.Event()    # set by trigger, robot commands should not be sent until reset
+        self.lock = threading.Lock()
+
+        # connections are opened in advance, the stop does not wait for the TCP handshake
+        threading.Thread(target=self.warm_up, daemon=True, name="EmergencyStop warm-up").start()
+
+    def warm_up(self) -> None:
+        for transport in self.transports:
+            try:
+                transport.get("/state/started")
+            except Exception:
+                pass
+
+    def add_listener(self, listener) -> None:
+        """
+        Registers listener() called after the stop was sent (e.g. cancels queued commands)
+        """
+        if listener not in self.listeners:
+            self.listeners = self.listeners + [listener]
+
+    def trigger(self) -> str:
+        """
+        Sends stop and release to all controllers at once and calls the listeners.
+        Safe to call from any thread, concurrent calls send the stop only once.
+
+        Returns:
+            str: A message with the result of every request and the time until the controllers answered.
+        """
+        if not self.lock.acquire(blocking=False):
+            return "Emergency stop is already in progress."
+
+        try:
+            self.engaged.set()
+            begin = time.perf_counter()
+            results = [None] * len(self.transports)
+
+            threads = [threading.Thread(target=self._stop, args=(transport, results, i), daemon=True)
+                       for i, transport in enumerate(self.transports)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            seconds = time.perf_counter() - begin
+
+            for listener in self.listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    results.append(f"Cancelling of queued commands failed: {e}")
+
+            if not self.transports:
+                return "No robot to stop."
+
+            return f"Robot was stopped by emergency stop in {1000 * seconds:.0f} ms. " + " ".join(results)
+
+        finally:
+            self.lock.release()
+
+    def _stop(self, transport: t.Transport, results: list, index: int) -> None:
+        answers = []
+
+        for path in STOP_PATHS:
+            try:
+                response = transport.put(path, headers={'accept': '*/*'})
+                answers.append(f"{path}: {response.status_code}")
+            except Exception as e:
+                answers.append(f"{path}: failed ({e})")
+
+        results[index] = f"{transport.url} ({', '.join(answers)})."
+
+    def reset(self) -> None:
+        """
+        Allows robot commands again (after the user decided to continue)
+        """
+        self.engaged.clear()
+
+    def close(self) -> None:
+        for transport in self.transports:
+            transport.close()
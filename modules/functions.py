@@ -1,10 +1,14 @@
 import json
 import os
 from datetime import datetime
-import subprocess
 import importlib
 import inspect
+import threading
 import modules.robot as r
+import modules.transport as t
+import modules.pool as p
+import modules.workers as w
+import modules.estop as es
 import modules.logger as l
 
 def load_file(file_path: str) -> str:
@@ -22,19 +26,43 @@ class FunctionHandler:
     Also provides some other utility functions.
     """
 
+    # refused while the emergency stop is active
+    MOTION_FUNCTIONS = {"start", "move_to", "follow_path", "pick_and_place", "home", "suck", "belt_speed", "belt_distance",
+                        "runSavedProgram", "runProgramOnPool"}
+
     def __init__(self, debug: int, url: str):
         self.debug = debug
         self.url = url
-        self.robot_running = False
-        
-        #set up robot
-        try:
-            self.robot = r.Robot(url, "assistant")
-            self.robot_running = True #This makes the robot functions available
+        self.robot: r.Robot = None
+        self.connect_lock = threading.Lock()
+        self.robot_functions = {spec["name"] for spec in json.loads(load_file('./txt_sources/robot_func.json'))}
+
+        # Warm processes for runSavedProgram start in background now, so the first program does not wait for them
+        w.get_worker_pool()
+
+        # Pool of several robot cells (only if ROBOT_POOL_URLS is set)
+        self.pool = p.get_default_pool()
+
+        # Emergency stop with its own connections, it works while the functions below wait for the robot
+        urls = [url] + ([robot.url for robot in self.pool.robots] if self.pool is not None else [])
+        self.estop = es.EmergencyStop(urls)
+        self.estop.add_listener(w.kill_programs)
+
+        if self.pool is not None:
+            self.estop.add_listener(self.pool.cancel_pending)
 
-        except Exception as e:  
+        # The shared monitor only probes the controller with a short timeout, the Robot is connected when the controller answers
+        # (unreachable robot does not block the start and the robot functions appear when it becomes reachable)
+        self.monitor = t.get_monitor(url) if url else None
+
+        if self.monitor is not None:
+            self.on_health_check(self.monitor.available)
+            self.monitor.add_listener(self.on_health_check)
+
+        if not self.robot_running:
             if self.debug > 4:
-                l.FancyPrint(l.Role.DEBUG, f"Selhalo navázání spojení s robotem. Chyba: {e}")
+                error = self.monitor.error if self.monitor is not None else "ROBOT_URL is not set"
+                l.FancyPrint(l.Role.DEBUG, f"Selhalo navázání spojení s robotem. Chyba: {error}")
             l.FancyPrint(l.Role.SYSTEM, "Assistent není schopen pracovat s robotem. Zkontrolujte, zda je robot dostupný a zda je nastaveno správné URL v .env souboru pod klíčem ROBOT_URL.")
 
         self.functions = {
@@ -43,6 +71,10 @@ class FunctionHandler:
             "stop": self.stop,     
             "get_pose": self.get_pose,
             "move_to": self.put_pose,
+            "check_reachable": self.check_reachable,
+            "follow_path": self.follow_path,
+            "pick_and_place": self.pick_and_place,
+            "get_robot_metrics": self.get_robot_metrics,
             "home": self.put_home,
             "suck": self.suck,
             "release": self.release,
@@ -53,9 +85,59 @@ class FunctionHandler:
             "getSavedPrograms": self.get_saved_programs,
             "getSavedProgram": self.get_program,
             "delSavedProgram": self.del_program,
+            "runProgramOnPool": self.run_program_on_pool,
+            "getPoolJob": self.get_pool_job,
+            "getPoolStatus": self.get_pool_status,
         }
         
 
+    def close(self) -> None:
+        """
+        Detaches the handler from the shared health monitor and closes its emergency stop connections
+        """
+        if self.monitor is not None:
+            self.monitor.remove_listener(self.on_health_check)
+
+        self.estop.close()
+
+
+    @property
+    def robot_running(self) -> bool:
+        """
+        True if the Robot is connected and the controller answers health checks, this makes the robot functions available
+        """
+        return self.robot is not None and self.monitor.available
+
+
+    def on_health_check(self, available: bool) -> None:
+        """
+        Listener of the health monitor, connects the Robot when the controller answers for the first time
+        """
+        if available and self.robot is None:
+            self.connect()
+
+
+    def connect(self) -> bool:
+        """
+        Connects the Robot (once, the same pooled connection is used by all robot functions)
+        """
+        with self.connect_lock:
+            if self.robot is not None:
+                return True
+
+            try:
+                # metrics are recorded only with ROBOT_METRICS=1 or after the first get_robot_metrics
+                robot = r.Robot(self.url, "assistant", t.get_transport(self.url))
+                self.estop.add_listener(robot.cancel_pending)
+                self.robot = robot
+
+            except Exception as e:
+                if self.debug > 4:
+                    l.FancyPrint(l.Role.DEBUG, f"Selhalo navázání spojení s robotem. Chyba: {e}")
+
+            return self.robot is not None
+
+
     def get_all_specs(self) -> list:
         """
         returns function specs and robot function specs (if robot is awailable)
@@ -69,6 +151,11 @@ class FunctionHandler:
          
             function_specs.extend(json.loads(json_data))
 
+        if self.pool is not None:
+            json_data = load_file('./txt_sources/pool_func.json')
+
+            function_specs.extend(json.loads(json_data))
+
         return function_specs
 
 
@@ -78,12 +165,12 @@ class FunctionHandler:
         """
         info = ""
         module = importlib.import_module(module_name)
-        # Exclude classes that are unnecessary
-        exclude_classes = {"Enum", "Mode", "Quaternion"}
+        # Only classes which generated programs are meant to use (helpers like CommandBatch or StatePoller would inflate the prompt)
+        program_classes = {"Position", "Orientation", "Pose", "Robot"}
 
 
         for name, obj in inspect.getmembers(module): 
-            if inspect.isclass(obj) and name not in exclude_classes:
+            if inspect.isclass(obj) and name in program_classes:
                 info += (f"Class: {name}, Docstring: {obj.__doc__}")
 
                 for method_name, method in inspect.getmembers(obj, inspect.isfunction):
@@ -136,6 +223,12 @@ class FunctionHandler:
 
         if function_name not in self.functions:
             raise KeyError(f"Function {function_name} not found!")
+
+        if function_name in self.robot_functions and not self.robot_running:
+            return "Robot is not available, check the connection to the robot and try again later."
+
+        if self.estop.engaged.is_set() and function_name in self.MOTION_FUNCTIONS:
+            return "Emergency stop is active, the robot was stopped by the user. Do not move the robot until the user asks again."
         
         if not parameters:
             try:
@@ -174,19 +267,7 @@ class FunctionHandler:
             return "Pose missing required (position or orientation)"
     
 
-        pose = r.Pose(
-            r.Position(
-                parameters["pose"]["position"]["x"], 
-                parameters["pose"]["position"]["y"], 
-                parameters["pose"]["position"]["z"]
-            ),
-            r.Orientation(
-                parameters["pose"]["orientation"]["w"], 
-                parameters["pose"]["orientation"]["x"], 
-                parameters["pose"]["orientation"]["y"], 
-                parameters["pose"]["orientation"]["z"]            
-            )                           
-        )        
+        pose = r.Pose.from_dict(parameters["pose"])
 
 
         return self.robot.move_to(
@@ -198,6 +279,72 @@ class FunctionHandler:
         )
 
 
+    def check_reachable(self, parameters: dict) -> str:
+        if "poses" not in parameters:
+            return "Missing required parameter (poses)"
+        
+        try:
+            poses = [r.Pose.from_dict(pose) for pose in parameters["poses"]]
+        except (KeyError, TypeError, ValueError):
+            return "Every pose must contain position (x, y, z) and orientation (w, x, y, z)"
+
+        results = self.robot.check_reachable_many(poses)
+
+        return json.dumps([
+            {"index": i, "reachable": joints is not None, "joints": joints}
+            for i, joints in results.items()
+        ])
+
+
+    def follow_path(self, parameters: dict) -> str:
+        if "moveType" not in parameters:
+            return "Missing required parameter (moveType)"
+        
+        if "poses" not in parameters:
+            return "Missing required parameter (poses)"
+        
+        try:
+            poses = [r.Pose.from_dict(pose) for pose in parameters["poses"]]
+        except (KeyError, TypeError, ValueError):
+            return "Every pose must contain position (x, y, z) and orientation (w, x, y, z)"
+
+        try:
+            return self.robot.follow_path(
+                poses,
+                parameters["moveType"],
+                parameters.get("velocity", None),
+                parameters.get("acceleration", None)
+            )
+        except (ValueError, r.BatchError) as e:
+            return f"Error occurred: {e}"
+
+
+    def pick_and_place(self, parameters: dict) -> str:
+        if "jobs" not in parameters:
+            return "Missing required parameter (jobs)"
+        
+        try:
+            jobs = [(r.Pose.from_dict(job["src"]), r.Pose.from_dict(job["dst"])) for job in parameters["jobs"]]
+        except (KeyError, TypeError, ValueError):
+            return "Every job must contain src and dst pose with position (x, y, z) and orientation (w, x, y, z)"
+
+        try:
+            return self.robot.pick_and_place(jobs, parameters.get("velocity", 100), parameters.get("safe_z", None))
+        except (ValueError, r.BatchError) as e:
+            return f"Error occurred: {e}"
+
+
+    def get_robot_metrics(self) -> str:
+        """
+        returns summary of latencies of robot requests and methods, turns the recording on at the first call
+        """
+        if self.robot.metrics is None:
+            self.robot.enable_metrics()
+            return "Metrics were not recorded yet (ROBOT_METRICS is not set), recording is turned on from now on. Ask again later."
+
+        return self.robot.metrics.summary()
+
+
     def put_home(self) -> str:
         return self.robot.home()
 
@@ -333,19 +480,65 @@ class FunctionHandler:
         if "./src/" not in file_path:
             file_path = "./src/" + file_path
         
+        return w.run_program(file_path)
+
+
+    def run_program_on_pool(self, parameters: dict) -> str:
+        """
+        Queues program to be run on the first idle robot of the pool
+
+        Returns:
+            str: id of the job
+        """
+        if self.pool is None:
+            return "No robot pool is configured."
+
+        if "file_path" not in parameters:
+            return "Missing required parameter (file_path)"
+        
+        file_path = parameters["file_path"]
+
+        if "./src/" not in file_path:
+            file_path = "./src/" + file_path
+
+        if not os.path.exists(file_path):
+            return f"Program {file_path} does not exist"
+
+        future = self.pool.submit_program(file_path)
+
+        return f"Program was queued as job {future.job_id}. Use getPoolJob to get its result."
+
+
+    def get_pool_job(self, parameters: dict) -> str:
+        """
+        returns state (and result when finished) of the pool job
+        """
+        if self.pool is None:
+            return "No robot pool is configured."
+
+        if "job_id" not in parameters:
+            return "Missing required parameter (job_id)"
+
         try:
-            result = subprocess.run(["python", file_path], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                output = result.stdout
-                return f"Program was successfully run! Output:\n{output}"
-            
-            else:
-                error = result.stderr
-                return f"Program exited with errors. Error:\n{error}"
-            
-        except Exception as e:
-            return f"Error occurred: {e}"
+            job_id = int(parameters["job_id"])
+        except (TypeError, ValueError):
+            return f"Invalid job_id {parameters['job_id']!r}, it must be a number"
+
+        job = self.pool.job(job_id)
+        if job is None:
+            return f"Job {parameters['job_id']} does not exist"
+
+        return json.dumps(job.to_dict())
+
+
+    def get_pool_status(self) -> str:
+        """
+        returns status of every robot of the pool and the whole pool
+        """
+        if self.pool is None:
+            return "No robot pool is configured."
+
+        return json.dumps(self.pool.status())
 
  
     
\ No newline at end of file
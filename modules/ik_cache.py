@@ -0,0 +1,170 @@
+from dotenv import load_dotenv
+from collections import OrderedDict
+import atexit
+import json
+import os
+import threading
+
+load_dotenv()
+CACHE_PATH = os.getenv('ROBOT_IK_CACHE')                          # file for persisting the cache (None = memory only)
+CACHE_SIZE = int(os.getenv('ROBOT_IK_CACHE_SIZE', '4096'))
+TOLERANCE = float(os.getenv('ROBOT_IK_TOLERANCE', '0.0001'))      # meters
+ORI_TOLERANCE = float(os.getenv('ROBOT_IK_ORI_TOLERANCE', '0.0001'))
+
+
+class IKCache:
+    """
+    LRU cache of inverse kinematics results keyed on quantized poses.
+    Also stores negative results (IK not possible) as None.
+    """
+    def __init__(self, max_size: int = CACHE_SIZE, tolerance: float = TOLERANCE, ori_tolerance: float = ORI_TOLERANCE, path: str = None):
+        """
+        Args:
+            max_size (int, optional): Maximum number of cached poses (0 disables the cache).
+            tolerance (float, optional): Poses with position closer than tolerance (meters) share the result.
+            ori_tolerance (float, optional): Same as tolerance but for orientation (quaternion components).
+            path (str, optional): File to load the cache from and save it to at exit.
+        """
+        self.max_size = max_size
+        self.tolerance = tolerance
+        self.ori_tolerance = ori_tolerance
+        self.path = path
+        self.entries: OrderedDict[tuple, tuple[float, ...]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def key(self, pose) -> tuple[int, ...]:
+        """
+        Returns quantized pose used as a key
+        """
+        p = pose.position
+        o = pose.orientation
+
+        # q and -q are the same rotation
+        sign = -1 if (o.w, o.x, o.y, o.z) < (0, 0, 0, 0) else 1
+
+        return (
+            round(p.x / self.tolerance),
+            round(p.y / self.tolerance),
+            round(p.z / self.tolerance),
+            round(sign * o.w / self.ori_tolerance),
+            round(sign * o.x / self.ori_tolerance),
+            round(sign * o.y / self.ori_tolerance),
+            round(sign * o.z / self.ori_tolerance),
+        )
+
+    def get(self, pose) -> tuple[bool, list[float]]:
+        """
+        Returns (True, joints) if the pose is cached (joints is None if IK is not possible), (False, None) otherwise
+        """
+        if self.max_size <= 0:
+            return False, None
+
+        key = self.key(pose)
+
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            values = self.entries[key]
+
+        return True, (list(values) if values is not None else None)
+
+    def put(self, pose, joints: list[float]) -> None:
+        """
+        Stores the IK result of the pose (None if IK is not possible)
+        """
+        if self.max_size <= 0:
+            return
+
+        key = self.key(pose)
+
+        with self.lock:
+            self.entries[key] = tuple(joints) if joints is not None else None
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns hit and miss counters and the number of cached poses
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+            }
+
+    def save(self, path: str = None) -> None:
+        """
+        Saves the cache to a JSON file (defaults to the path given in constructor)
+        """
+        path = path or self.path
+        if path is None:
+            return
+
+        with self.lock:
+            data = {
+                "tolerance": self.tolerance,
+                "ori_tolerance": self.ori_tolerance,
+                "entries": [[list(key), values] for key, values in self.entries.items()],
+            }
+
+        with open(path, 'w', encoding="utf-8") as file:
+            json.dump(data, file)
+
+    def load(self, path: str = None) -> None:
+        """
+        Loads the cache from a JSON file. Missing file or file saved with different tolerances is ignored.
+        """
+        path = path or self.path
+
+        try:
+            with open(path, 'r', encoding="utf-8") as file:
+                data = json.load(file)
+
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        if data.get("tolerance") != self.tolerance or data.get("ori_tolerance") != self.ori_tolerance:
+            return
+
+        if self.max_size <= 0:
+            return
+
+        with self.lock:
+            for key, values in data["entries"][-self.max_size:]:
+                self.entries[tuple(key)] = tuple(values) if values is not None else None
+
+
+_default_cache: IKCache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> IKCache:
+    """
+    Returns IK cache shared by all robots in this process (configured by ROBOT_IK_* env variables)
+    """
+    global _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = IKCache(path=CACHE_PATH)
+
+        return _default_cache
@@ -0,0 +1,298 @@
+"""
+Local inverse and forward kinematics of the arm (same chain as the /ik endpoint of the controller).
+Used by Robot.calculate_ik in 'local' and 'hybrid' modes and by the local simulator.
+
+Usage:
+    python -m modules.kinematics record --url http://robot:5018 --output ik_samples.jsonl -n 500
+    python -m modules.kinematics validate ik_samples.jsonl
+"""
+from dotenv import load_dotenv
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import numpy as np
+
+load_dotenv()
+MODEL_PATH = os.getenv('ROBOT_KINEMATICS')     # JSON file with parameters of ArmModel (None = defaults)
+
+
+class ArmModel:
+    """
+    Kinematic model of the arm.
+    Joint 1 rotates the base, joints 2 and 3 are the arm links, joint 4 keeps the end effector level
+    and joint 5 rotates the end effector.
+    """
+    PARAMETERS = ("link_2", "link_3", "eef_offset", "eef_height", "limits")
+
+    def __init__(self, link_2: float = 0.135, link_3: float = 0.147, eef_offset: float = 0.06, eef_height: float = -0.06,
+                 limits: list[tuple[float, float]] = None):
+        """
+        Args:
+            link_2 (float, optional): Length of the upper arm in meters.
+            link_3 (float, optional): Length of the forearm in meters.
+            eef_offset (float, optional): Horizontal distance of the end effector from the wrist in meters.
+            eef_height (float, optional): Vertical distance of the end effector from the wrist in meters.
+            limits (list, optional): (min, max) of every joint in radians.
+        """
+        self.link_2 = link_2
+        self.link_3 = link_3
+        self.eef_offset = eef_offset
+        self.eef_height = eef_height
+        self.limits = [tuple(limit) for limit in limits] if limits is not None else [
+            (math.radians(-135), math.radians(135)),
+            (math.radians(-5), math.radians(90)),
+            (math.radians(-15), math.radians(90)),
+            (-math.pi, math.pi),
+            (-math.pi, math.pi),
+        ]
+
+    @classmethod
+    def load(cls, path: str) -> 'ArmModel':
+        """
+        Creates model from JSON file with the parameters (missing ones keep default values)
+        """
+        with open(path, 'r', encoding="utf-8") as file:
+            data = json.load(file)
+
+        return cls(**{name: data[name] for name in cls.PARAMETERS if name in data})
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.PARAMETERS}
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+    def solve(self, x: float, y: float, z: float, qw: float, qx: float, qy: float, qz: float) -> list[float]:
+        """
+        Returns 5 joint values in radians or None if the pose is not reachable
+        """
+        j1 = math.atan2(y, x)
+        r = math.hypot(x, y) - self.eef_offset
+        z = z - self.eef_height
+        d = math.hypot(r, z)
+
+        if d < 1e-9 or d > self.link_2 + self.link_3 or d < abs(self.link_2 - self.link_3):
+            return None
+
+        # elbow up solution, j2 is measured from vertical, j3 from horizontal
+        beta = math.acos(max(-1.0, min(1.0, (self.link_2 ** 2 + d ** 2 - self.link_3 ** 2) / (2 * self.link_2 * d))))
+        upper = math.atan2(z, r) + beta
+        j2 = math.pi / 2 - upper
+        j3 = -math.atan2(z - self.link_2 * math.sin(upper), r - self.link_2 * math.cos(upper))
+        j4 = j3 - j2
+
+        yaw = math.atan2(2 * (qw * qz + qx * qy), 1 - 2 * (qy ** 2 + qz ** 2))
+        j5 = (yaw - j1 + math.pi) % (2 * math.pi) - math.pi
+
+        joints = [j1, j2, j3, j4, j5]
+        for value, (low, high) in zip(joints, self.limits):
+            if not low <= value <= high:
+                return None
+
+        return joints
+
+    def ik(self, pose: dict) -> list[float]:
+        """
+        IK of pose in the JSON format of the controller ({"position": {...}, "orientation": {...}})
+        """
+        p = pose["position"]
+        o = pose["orientation"]
+
+        return self.solve(p["x"], p["y"], p["z"], o["w"], o["x"], o["y"], o["z"])
+
+    def ik_pose(self, pose) -> list[float]:
+        """
+        IK of modules.robot.Pose
+        """
+        p = pose.position
+        o = pose.orientation
+
+        return self.solve(p.x, p.y, p.z, o.w, o.x, o.y, o.z)
+
+    def ik_many(self, positions, orientations) -> tuple[np.ndarray, np.ndarray]:
+        """
+        IK of many poses at once (e.g. PoseArray.positions and PoseArray.orientations)
+
+        Args:
+            positions: N x 3 array of positions in meters.
+            orientations: N x 4 array of orientations [w, x, y, z].
+        Returns:
+            tuple[np.ndarray, np.ndarray]: N x 5 joint values and N booleans (True = reachable, joints of unreachable poses are NaN).
+        """
+        p = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        o = np.asarray(orientations, dtype=np.float64).reshape(-1, 4)
+
+        j1 = np.arctan2(p[:, 1], p[:, 0])
+        r = np.hypot(p[:, 0], p[:, 1]) - self.eef_offset
+        z = p[:, 2] - self.eef_height
+        d = np.hypot(r, z)
+        ok = (d >= 1e-9) & (d <= self.link_2 + self.link_3) & (d >= abs(self.link_2 - self.link_3))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = np.arccos(np.clip((self.link_2 ** 2 + d ** 2 - self.link_3 ** 2) / (2 * self.link_2 * d), -1.0, 1.0))
+        upper = np.arctan2(z, r) + beta
+        j2 = math.pi / 2 - upper
+        j3 = -np.arctan2(z - self.link_2 * np.sin(upper), r - self.link_2 * np.cos(upper))
+        j4 = j3 - j2
+
+        yaw = np.arctan2(2 * (o[:, 0] * o[:, 3] + o[:, 1] * o[:, 2]), 1 - 2 * (o[:, 2] ** 2 + o[:, 3] ** 2))
+        j5 = np.mod(yaw - j1 + math.pi, 2 * math.pi) - math.pi
+
+        joints = np.stack((j1, j2, j3, j4, j5), axis=1)
+        for i, (low, high) in enumerate(self.limits):
+            ok &= (joints[:, i] >= low) & (joints[:, i] <= high)
+
+        joints[~ok] = np.nan
+
+        return joints, ok
+
+    def fk(self, joints: list[float]) -> dict:
+        """
+        Returns pose of the end effector ({"position": {...}, "orientation": {...}}) for 5 joint values in radians.
+        The end effector always points down, so the orientation is only rotation around z axis.
+        """
+        j1, j2, j3, _, j5 = joints[:5]
+
+        upper = math.pi / 2 - j2
+        r = self.link_2 * math.cos(upper) + self.link_3 * math.cos(-j3) + self.eef_offset
+        z = self.link_2 * math.sin(upper) + self.link_3 * math.sin(-j3) + self.eef_height
+        half = (j1 + j5) / 2
+
+        return {
+            "position": {"x": r * math.cos(j1), "y": r * math.sin(j1), "z": z},
+            "orientation": {"w": 0.0, "x": math.cos(half), "y": math.sin(half), "z": 0.0},
+        }
+
+    def validate(self, samples: list[dict]) -> dict:
+        """
+        Compares the model with recorded /ik responses of the controller
+
+        Args:
+            samples (list[dict]): Items {"pose": pose in JSON format, "joints": joint values or None if IK failed}.
+        Returns:
+            dict: Number of samples, agreement on reachability and maximum joint error in radians.
+        """
+        agree = 0
+        false_reachable = 0
+        false_unreachable = 0
+        errors = []
+
+        for sample in samples:
+            local = self.ik(sample["pose"])
+            remote = sample["joints"]
+
+            if (local is None) == (remote is None):
+                agree += 1
+                if local is not None:
+                    errors.append(max(abs(a - b) for a, b in zip(local, remote)))
+            elif local is None:
+                false_unreachable += 1
+            else:
+                false_reachable += 1
+
+        return {
+            "samples": len(samples),
+            "agreement": agree / len(samples) if samples else 0.0,
+            "false_reachable": false_reachable,
+            "false_unreachable": false_unreachable,
+            "max_joint_error": max(errors) if errors else 0.0,
+            "mean_joint_error": sum(errors) / len(errors) if errors else 0.0,
+        }
+
+
+def load_samples(path: str) -> list[dict]:
+    """
+    Loads recorded /ik samples (one JSON object per line)
+    """
+    with open(path, 'r', encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class SampleRecorder:
+    """
+    Transport observer appending every PUT /ik request and its result to a JSONL file (samples for ArmModel.validate)
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, record) -> None:
+        if record.endpoint != "PUT /ik" or record.body is None or record.status == 0:
+            return
+
+        joints = None
+        if record.status == 200:
+            joints = [joint["value"] for joint in json.loads(record.text)]
+        elif "Failed to compute IK." not in record.text:
+            return
+
+        line = json.dumps({"pose": json.loads(record.body), "joints": joints})
+
+        with self.lock:
+            with open(self.path, 'a', encoding="utf-8") as file:
+                file.write(line + "\n")
+
+
+_default_model: ArmModel = None
+_default_model_lock = threading.Lock()
+
+
+def get_default_model() -> ArmModel:
+    """
+    Returns model shared by the whole process (parameters from ROBOT_KINEMATICS file if set)
+    """
+    global _default_model
+
+    with _default_model_lock:
+        if _default_model is None:
+            _default_model = ArmModel.load(MODEL_PATH) if MODEL_PATH else ArmModel()
+
+        return _default_model
+
+
+def main():
+    import modules.robot as r
+    import modules.ik_cache as ik
+
+    parser = argparse.ArgumentParser(description="Records /ik responses of the controller and validates the local model against them")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="send random poses to /ik and save the responses")
+    record.add_argument("--url", default=r.URL, help="controller url (default: ROBOT_URL)")
+    record.add_argument("--output", default="ik_samples.jsonl")
+    record.add_argument("-n", type=int, default=500, help="number of random poses")
+    record.add_argument("--seed", type=int, default=None)
+
+    validate = commands.add_parser("validate", help="compare the local model with recorded responses")
+    validate.add_argument("samples", help="JSONL file written by record")
+    validate.add_argument("--model", default=MODEL_PATH, help="JSON file with model parameters (default: ROBOT_KINEMATICS)")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        rng = random.Random(args.seed)
+        robot = r.Robot(args.url, ik_cache=ik.IKCache(max_size=0), ik_mode="remote")
+        robot.reachability = None
+        robot.transport.add_observer(SampleRecorder(args.output))
+
+        poses = []
+        for _ in range(args.n):
+            yaw = rng.uniform(-math.pi, math.pi)
+            poses.append(r.Pose(
+                r.Position(rng.uniform(-0.35, 0.35), rng.uniform(-0.35, 0.35), rng.uniform(-0.15, 0.15)),
+                r.Orientation(0, math.cos(yaw / 2), math.sin(yaw / 2), 0),
+            ))
+
+        robot.check_reachable_many(poses)
+        print(f"{args.n} samples appended to {args.output}")
+        return
+
+    model = ArmModel.load(args.model) if args.model else ArmModel()
+    print(json.dumps(model.validate(load_samples(args.samples)), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+from dotenv import load_dotenv
+from collections import Counter
+import bisect
+import json
+import math
+import os
+import threading
+
+load_dotenv()
+ENABLED = os.getenv('ROBOT_METRICS', '0') == '1'     # instrument every Robot by default
+
+# upper bounds of histogram buckets in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets
+    """
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns upper bound of the bucket containing q-th quantile (0-1), capped by the maximum
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+        }
+
+
+class EndpointStats:
+    """
+    Statistics of requests to one endpoint
+    """
+    def __init__(self):
+        self.latency = Histogram()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.statuses = Counter()     # HTTP status (0 = no response) -> count
+        self.errors = 0               # responses reported as error by check_response
+
+    def to_dict(self) -> dict:
+        return {
+            "latency": self.latency.to_dict(),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "errors": self.errors,
+        }
+
+
+class Metrics:
+    """
+    Collects per-endpoint request statistics (from Transport) and durations of Robot methods
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints: dict[str, EndpointStats] = {}     # "METHOD /path" -> stats
+        self.calls: dict[str, Histogram] = {}             # Robot method name -> wall time
+        self.checks = Histogram()                         # time spent in check_response
+
+    def _endpoint(self, name: str) -> EndpointStats:
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+
+        return self.endpoints[name]
+
+    def observe_request(self, record) -> None:
+        """
+        Transport observer, records one finished request (modules.transport.RequestRecord)
+        """
+        with self.lock:
+            stats = self._endpoint(record.endpoint)
+            stats.latency.observe(record.seconds)
+            stats.bytes_sent += record.bytes_sent
+            stats.bytes_received += record.bytes_received
+            stats.retries += record.retries
+            stats.statuses[record.status] += 1
+
+    def record_call(self, name: str, seconds: float) -> None:
+        """
+        Records wall time of a Robot method
+        """
+        with self.lock:
+            if name not in self.calls:
+                self.calls[name] = Histogram()
+
+            self.calls[name].observe(seconds)
+
+    def record_check(self, endpoint: str, error: bool, seconds: float) -> None:
+        """
+        Records result of check_response
+        """
+        with self.lock:
+            self.checks.observe(seconds)
+            if error:
+                self._endpoint(endpoint).errors += 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+            self.calls.clear()
+            self.checks = Histogram()
+
+    def snapshot(self) -> dict:
+        """
+        Returns all statistics as a dictionary
+        """
+        with self.lock:
+            return {
+                "endpoints": {name: stats.to_dict() for name, stats in self.endpoints.items()},
+                "calls": {name: hist.to_dict() for name, hist in self.calls.items()},
+                "check_response": self.checks.to_dict(),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=4)
+
+    def to_prometheus(self) -> str:
+        """
+        Returns all statistics in Prometheus text exposition format
+        """
+        lines = []
+
+        def histogram(metric: str, label: str, value: str, hist: Histogram) -> None:
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{metric}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{{label}="{value}"}} {hist.sum!r}')
+            lines.append(f'{metric}_count{{{label}="{value}"}} {hist.count}')
+
+        with self.lock:
+            lines.append("# TYPE robot_request_duration_seconds histogram")
+            for name, stats in self.endpoints.items():
+                histogram("robot_request_duration_seconds", "endpoint", name, stats.latency)
+
+            for metric, attr in (("robot_request_bytes_sent_total", "bytes_sent"),
+                                 ("robot_request_bytes_received_total", "bytes_received"),
+                                 ("robot_request_retries_total", "retries"),
+                                 ("robot_request_errors_total", "errors")):
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in self.endpoints.items():
+                    lines.append(f'{metric}{{endpoint="{name}"}} {getattr(stats, attr)}')
+
+            lines.append("# TYPE robot_requests_total counter")
+            for name, stats in self.endpoints.items():
+                for status, count in stats.statuses.items():
+                    lines.append(f'robot_requests_total{{endpoint="{name}",status="{status}"}} {count}')
+
+            lines.append("# TYPE robot_call_duration_seconds histogram")
+            for name, hist in self.calls.items():
+                histogram("robot_call_duration_seconds", "method", name, hist)
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        Returns short human readable summary (one line per endpoint and method)
+        """
+        with self.lock:
+            lines = []
+            for name, stats in sorted(self.endpoints.items()):
+                h = stats.latency
+                lines.append(
+                    f"{name}: {h.count}x, mean {1000 * h.sum / max(h.count, 1):.1f} ms, "
+                    f"p90 {1000 * h.quantile(0.9):.1f} ms, max {1000 * h.max:.1f} ms, "
+                    f"errors {stats.errors}, retries {stats.retries}"
+                )
+
+            for name, hist in sorted(self.calls.items()):
+                lines.append(f"Robot.{name}: {hist.count}x, mean {1000 * hist.sum / max(hist.count, 1):.1f} ms, max {1000 * hist.max:.1f} ms")
+
+        if not lines:
+            return "No robot requests recorded yet."
+
+        return "\n".join(lines)
+
+
+_default_metrics: Metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_metrics() -> Metrics:
+    """
+    Returns metrics shared by all robots in this process
+    """
+    global _default_metrics
+
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+
+        return _default_metrics
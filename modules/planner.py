@@ -0,0 +1,227 @@
+"""
+Planner of many pick-and-place jobs.
+Orders the jobs (nearest neighbour + 2-opt) so that the arm travels as little as possible between them
+and executes them in one batch of commands.
+"""
+import numpy as np
+
+
+def positions(poses: list) -> np.ndarray:
+    """
+    Returns N x 3 array of positions of the poses
+    """
+    return np.array([(p.position.x, p.position.y, p.position.z) for p in poses], dtype=np.float64).reshape(-1, 3)
+
+
+def nearest_neighbour(transitions: np.ndarray, first: np.ndarray) -> list[int]:
+    """
+    Returns order of the jobs starting with the nearest one and always continuing with the nearest remaining one
+    """
+    remaining = np.ones(len(first), dtype=bool)
+    order = []
+    distances = first
+
+    while remaining.any():
+        job = int(np.argmin(np.where(remaining, distances, np.inf)))
+        order.append(job)
+        remaining[job] = False
+        distances = transitions[job]
+
+    return order
+
+
+def two_opt(order: list[int], transitions: np.ndarray, first: np.ndarray, max_rounds: int = 100) -> list[int]:
+    """
+    Improves the order by reversing its segments while the travel gets shorter.
+    Transitions are asymmetric (destination -> source), so the moves inside a reversed segment change too.
+    """
+    order = list(order)
+    n = len(order)
+
+    for _ in range(max_rounds):
+        improved = False
+
+        # forward[m] / backward[m] = sum of transitions of the first m steps in the current / reversed direction
+        steps = np.array(order)
+        forward = np.concatenate(([0.0], np.cumsum(transitions[steps[:-1], steps[1:]])))
+        backward = np.concatenate(([0.0], np.cumsum(transitions[steps[1:], steps[:-1]])))
+
+        for i in range(n - 1):
+            before_i = first[order[i]] if i == 0 else transitions[order[i - 1], order[i]]
+
+            for k in range(i + 1, n):
+                # reverse order[i..k]
+                after_k = transitions[order[k], order[k + 1]] if k + 1 < n else 0.0
+                old = before_i + (forward[k] - forward[i]) + after_k
+
+                new_before = first[order[k]] if i == 0 else transitions[order[i - 1], order[k]]
+                new_after = transitions[order[i], order[k + 1]] if k + 1 < n else 0.0
+                new = new_before + (backward[k] - backward[i]) + new_after
+
+                if new < old - 1e-12:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    improved = True
+                    break
+
+            if improved:
+                break
+
+        if not improved:
+            break
+
+    return order
+
+
+def order_jobs(jobs: list[tuple], start=None, improve: bool = True) -> list[int]:
+    """
+    Returns indices of the jobs in the order with short travel of the arm between them
+
+    Args:
+        jobs (list[tuple]): Pairs (source Pose, destination Pose).
+        start (Pose, optional): Pose of the arm before the first job. Defaults to None (first job can be any).
+        improve (bool, optional): Improve nearest neighbour order by 2-opt. Defaults to True.
+    """
+    if not jobs:
+        return []
+
+    src = positions([job[0] for job in jobs])
+    dst = positions([job[1] for job in jobs])
+    transitions = np.linalg.norm(dst[:, None, :] - src[None, :, :], axis=2)
+    first = np.linalg.norm(src - positions([start])[0], axis=1) if start is not None else np.zeros(len(jobs))
+
+    order = nearest_neighbour(transitions, first)
+    if improve and len(order) > 2:
+        order = two_opt(order, transitions, first)
+
+    return order
+
+
+def lift(pose, safe_z: float):
+    """
+    Returns copy of the pose moved up to safe_z (pose above safe_z is returned unchanged)
+    """
+    lifted = pose.copy()
+    lifted.position.z = max(lifted.position.z, safe_z)
+
+    return lifted
+
+
+class PickPlacePlan:
+    """
+    Ordered pick-and-place jobs ready to be executed
+    """
+    def __init__(self, jobs: list[tuple], order: list[int], rejected: list[int], start=None):
+        """
+        Args:
+            jobs (list[tuple]): All jobs as pairs (source Pose, destination Pose).
+            order (list[int]): Indices of the reachable jobs in the order of execution.
+            rejected (list[int]): Indices of the jobs with unreachable source or destination.
+            start (Pose, optional): Pose of the arm before the first job.
+        """
+        self.jobs = jobs
+        self.order = order
+        self.rejected = rejected
+        self.start = start
+
+    def travel(self, order: list[int] = None) -> float:
+        """
+        Returns length in meters of moves between the jobs (from the start through all jobs in the order)
+        """
+        order = self.order if order is None else order
+        points = ([self.start] if self.start is not None else []) + [pose for i in order for pose in self.jobs[i]]
+        p = positions(points)
+
+        return float(np.linalg.norm(np.diff(p, axis=0), axis=1).sum()) if len(p) > 1 else 0.0
+
+    def saving(self) -> float:
+        """
+        Returns fraction (0-1) of travel saved against executing the reachable jobs in the given order
+        """
+        baseline = self.travel(sorted(self.order))
+
+        return 1 - self.travel() / baseline if baseline > 0 else 0.0
+
+    def execute(self, robot, velocity: int = 100, acceleration: int = None, safe_z: float = None, progress=None) -> str:
+        """
+        Picks and places all jobs of the plan in one batch of commands
+
+        Args:
+            robot (Robot): The robot.
+            velocity (int, optional): The velocity of the movement (1-100). Defaults to 100.
+            acceleration (int, optional): The acceleration of the movement (1-100). Defaults to None.
+            safe_z (float, optional): Height in meters for moves between poses (straight up, across and down).
+                Defaults to None (JUMP moves of the controller).
+            progress (callable, optional): Called as progress(index, total, result) after each command.
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        if not self.order:
+            return f"No job is reachable (jobs {self.rejected}), nothing was moved."
+
+        with robot.batch(progress) as batch:
+            if safe_z is not None and self.start is not None and self.order:
+                batch.move_to(lift(self.start, safe_z), "LINEAR", velocity, acceleration)
+
+            for i in self.order:
+                src, dst = self.jobs[i]
+
+                if safe_z is None:
+                    batch.move_to(src, "JUMP", velocity, acceleration)
+                    batch.suck()
+                    batch.move_to(dst, "JUMP", velocity, acceleration)
+                    batch.release()
+                    continue
+
+                for pose, gripper in ((src, batch.suck), (dst, batch.release)):
+                    batch.move_to(lift(pose, safe_z), "LINEAR", velocity, acceleration)
+                    batch.move_to(pose, "LINEAR", velocity, acceleration)
+                    gripper()
+                    batch.move_to(lift(pose, safe_z), "LINEAR", velocity, acceleration)
+
+        if not batch.ok:
+            return batch.results[-1]
+
+        msg = f"Success! Moved {len(self.order)} objects, total travel {self.travel():.3f} m ({100 * self.saving():.0f} % shorter than in the given order)."
+        if self.rejected:
+            msg += f" Skipped jobs {self.rejected} (not reachable)."
+
+        return msg
+
+
+def plan_jobs(robot, jobs: list[tuple], start=None, safe_z: float = None, improve: bool = True) -> PickPlacePlan:
+    """
+    Checks reachability of all jobs and orders the reachable ones
+
+    Args:
+        robot (Robot): The robot (used for IK of the poses).
+        jobs (list[tuple]): Pairs (source Pose, destination Pose).
+        start (Pose, optional): Pose of the arm before the first job. Defaults to the last known pose of the robot.
+        safe_z (float, optional): Height of moves between poses, the poses above them are checked as well.
+        improve (bool, optional): Improve nearest neighbour order by 2-opt. Defaults to True.
+
+    Raises:
+        ValueError: If start is not given and the pose of the robot can't be read.
+    """
+    if start is None:
+        start = robot.get_pose(fresh=False)
+
+        # in Mode.ASSISTANT get_pose returns the error message instead of raising
+        if not hasattr(start, "position"):
+            raise ValueError(f"Failed to get the pose of the robot: {start}")
+
+    poses = [pose for job in jobs for pose in job]
+    if safe_z is not None:
+        poses += [lift(pose, safe_z) for pose in poses]
+
+    reachable = robot.check_reachable_many(poses)
+
+    def unreachable(k: int) -> bool:
+        # index of the lifted pose is shifted by the number of job poses
+        return reachable[k] is None or (safe_z is not None and reachable[k + 2 * len(jobs)] is None)
+
+    rejected = [i for i in range(len(jobs)) if unreachable(2 * i) or unreachable(2 * i + 1)]
+    feasible = [i for i in range(len(jobs)) if i not in set(rejected)]
+    order = order_jobs([jobs[i] for i in feasible], start, improve)
+
+    return PickPlacePlan(jobs, [feasible[i] for i in order], rejected, start)
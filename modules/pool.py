@@ -0,0 +1,302 @@
+"""
+Pool of several identical robot cells.
+Jobs (saved programs, command batches or any function of Robot) wait in one queue and every healthy idle robot takes the next one.
+"""
+from dotenv import load_dotenv
+import concurrent.futures
+import itertools
+import os
+import queue
+import threading
+import time
+import requests
+import modules.robot as r
+import modules.transport as t
+import modules.workers as w
+
+load_dotenv()
+POOL_URLS = [url.strip() for url in os.getenv('ROBOT_POOL_URLS', '').split(",") if url.strip()]   # urls of all controllers
+HEALTH_INTERVAL = float(os.getenv('ROBOT_POOL_HEALTH_INTERVAL', '5.0'))                           # seconds between health checks
+
+
+class PoolJob:
+    """
+    Job waiting in the queue or running on a robot of the pool
+    """
+    def __init__(self, id: int, name: str, func):
+        self.id = id
+        self.name = name
+        self.func = func                # func(robot: Robot) -> result
+        self.future = concurrent.futures.Future()
+        self.url: str = None            # robot which took the job
+        self.started: float = None
+        self.finished: float = None
+
+    @property
+    def state(self) -> str:
+        if self.future.cancelled():
+            return "cancelled"
+
+        if self.future.done():
+            return "failed" if self.future.exception() is not None else "done"
+
+        return "running" if self.started is not None else "queued"
+
+    def to_dict(self) -> dict:
+        data = {"id": self.id, "name": self.name, "state": self.state, "robot": self.url}
+
+        if self.finished is not None:
+            data["seconds"] = self.finished - self.started
+            data["result"] = str(self.future.exception() or self.future.result())
+
+        return data
+
+
+class PooledRobot:
+    """
+    One controller of the pool with its health and statistics
+    """
+    def __init__(self, url: str, mode: r.Mode = r.Mode.DEFAULT):
+        self.url = url
+        self.mode = mode
+        self.robot: r.Robot = None
+        self.monitor = t.HealthMonitor(url)    # short probe, down controller does not block the check
+        self.healthy = False
+        self.error: str = None              # reason of the last failed health check
+        self.job: PoolJob = None
+        self.completed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.created = time.monotonic()
+
+    def check(self) -> bool:
+        """
+        Checks the connection to the controller (connects the Robot if it is not connected yet)
+        """
+        try:
+            if not self.monitor.check():
+                raise Exception(self.monitor.error)
+
+            if self.robot is None:
+                self.robot = r.Robot(self.url, self.mode)
+
+            self.healthy = True
+            self.error = None
+
+        except Exception as e:
+            self.healthy = False
+            self.error = str(e)
+
+        return self.healthy
+
+    def status(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "error": self.error,
+            "busy": self.job is not None,
+            "job": self.job.id if self.job is not None else None,
+            "completed": self.completed,
+            "failed": self.failed,
+            "utilization": self.busy_time / max(time.monotonic() - self.created, 1e-9),
+        }
+
+
+class RobotPool:
+    """
+    Dispatches jobs to idle robots of several identical cells
+
+    Example:
+        pool = RobotPool(["http://cell1:5018", "http://cell2:5018"]).start()
+        futures = [pool.submit_program("./src/sort.py") for _ in range(10)]
+        pool.submit(lambda robot: robot.move_object(src, dst)).result()
+    """
+    def __init__(self, urls: list[str] = None, mode: r.Mode = r.Mode.DEFAULT, health_interval: float = HEALTH_INTERVAL):
+        """
+        Args:
+            urls (list[str], optional): Urls of the controllers. Defaults to ROBOT_POOL_URLS (or ROBOT_URL).
+            mode (Mode, optional): Error handling mode of the robots. Defaults to Mode.DEFAULT.
+            health_interval (float, optional): Seconds between health checks of the controllers.
+        """
+        urls = urls or POOL_URLS or [r.URL]
+
+        self.robots = [PooledRobot(url, mode) for url in urls]
+        self.health_interval = health_interval
+        self.queue: queue.Queue[PoolJob] = queue.Queue()
+        self.jobs: dict[int, PoolJob] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> 'RobotPool':
+        """
+        Starts one worker per robot and the health checker (robots take jobs after their first health check)
+        """
+        for robot in self.robots:
+            thread = threading.Thread(target=self._work, args=(robot,), daemon=True, name=f"RobotPool {robot.url}")
+            thread.start()
+            self.threads.append(thread)
+
+        thread = threading.Thread(target=self._check_health, daemon=True, name="RobotPool health")
+        thread.start()
+        self.threads.append(thread)
+
+        return self
+
+    def close(self) -> None:
+        """
+        Stops the workers (running jobs are finished, queued jobs are cancelled)
+        """
+        self.stop_event.set()
+        self.cancel_queued()
+
+    def cancel_queued(self) -> int:
+        """
+        Cancels all queued jobs (running jobs are not affected)
+
+        Returns:
+            int: Number of cancelled jobs.
+        """
+        cancelled = 0
+
+        while True:
+            try:
+                cancelled += self.queue.get_nowait().future.cancel()
+            except queue.Empty:
+                return cancelled
+
+    def cancel_pending(self) -> None:
+        """
+        Cancels queued jobs and the rest of batches running on the robots (used by the emergency stop)
+        """
+        self.cancel_queued()
+
+        for robot in self.robots:
+            if robot.robot is not None:
+                robot.robot.cancel_pending()
+
+    def submit(self, func, name: str = None) -> concurrent.futures.Future:
+        """
+        Queues func(robot: Robot) to be run on the first idle healthy robot
+
+        Returns:
+            Future: Result of func, future.job_id is the id of the job.
+        """
+        with self.lock:
+            job = PoolJob(next(self.ids), name or getattr(func, "__name__", "job"), func)
+            self.jobs[job.id] = job
+
+        job.future.job_id = job.id
+        self.queue.put(job)
+
+        return job.future
+
+    def submit_program(self, file_path: str) -> concurrent.futures.Future:
+        """
+        Queues saved program, it is run (by workers.run_program) controlling the robot which takes the job
+        """
+        return self.submit(lambda robot: w.run_program(file_path, robot.robot_url), name=file_path)
+
+    def submit_batch(self, build, progress=None) -> concurrent.futures.Future:
+        """
+        Queues batch of commands, build(batch) adds the commands to CommandBatch of the robot which takes the job
+
+        Returns:
+            Future: Result message of each sent command.
+        """
+        def run(robot: r.Robot) -> list[str]:
+            with robot.batch(progress) as batch:
+                build(batch)
+
+            return batch.results
+
+        return self.submit(run, name="batch")
+
+    def job(self, id: int) -> PoolJob:
+        return self.jobs.get(id)
+
+    def status(self) -> dict:
+        """
+        Returns status of every robot and of the whole pool
+        """
+        robots = [robot.status() for robot in self.robots]
+
+        with self.lock:
+            states = [job.state for job in self.jobs.values()]
+
+        return {
+            "robots": robots,
+            "healthy": sum(robot["healthy"] for robot in robots),
+            "busy": sum(robot["busy"] for robot in robots),
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "done": states.count("done"),
+            "failed": states.count("failed"),
+            "utilization": sum(robot["utilization"] for robot in robots) / len(robots),
+        }
+
+    def _work(self, robot: PooledRobot) -> None:
+        while not self.stop_event.is_set():
+            if not robot.healthy:
+                self.stop_event.wait(min(self.health_interval, 0.5))
+                continue
+
+            try:
+                job = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            job.url = robot.url
+            job.started = time.monotonic()
+            robot.job = job
+
+            try:
+                job.future.set_result(job.func(robot.robot))
+                robot.completed += 1
+
+            except Exception as e:
+                job.future.set_exception(e)
+                robot.failed += 1
+
+                # job failed because of the connection, no more jobs until the robot is healthy again
+                if isinstance(e, requests.exceptions.RequestException):
+                    robot.check()
+
+            finally:
+                job.finished = time.monotonic()
+                robot.busy_time += job.finished - job.started
+                robot.job = None
+
+    def _check_health(self) -> None:
+        while True:
+            for robot in self.robots:
+                # busy robot is obviously alive and its controller may not answer during a move
+                if robot.job is None:
+                    robot.check()
+
+            if self.stop_event.wait(self.health_interval):
+                break
+
+
+_default_pool: RobotPool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> RobotPool:
+    """
+    Returns started pool of ROBOT_POOL_URLS shared by the whole process (None if ROBOT_POOL_URLS is not set)
+    """
+    global _default_pool
+
+    if not POOL_URLS:
+        return None
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = RobotPool(POOL_URLS).start()
+
+        return _default_pool
@@ -0,0 +1,338 @@
+"""
+Precomputed reachability map of the arm workspace.
+Voxel grid of positions x set of orientations sampled through calculate_ik and stored as a memory-mapped bitmap,
+so impossible poses can be rejected locally without sending /ik requests.
+
+Usage:
+    python -m modules.reachability --simulator --output reach.map        # sample the local simulator
+    python -m modules.reachability --url http://robot:5018 --resolution 0.01 --output reach.map
+    then set ROBOT_REACHABILITY_MAP=reach.map in .env file
+"""
+from dotenv import load_dotenv
+import argparse
+import datetime
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
+
+load_dotenv()
+MAP_PATH = os.getenv('ROBOT_REACHABILITY_MAP')      # file with the map (None = no map)
+
+MAGIC = b"ROBOTREACH1\n"
+ALIGNMENT = 64      # bitmap starts at offset aligned to this number of bytes
+
+BOUNDS = ((-0.35, 0.35), (-0.35, 0.35), (-0.15, 0.15))   # meters, (min, max) of x, y and z
+RESOLUTION = 0.02                                        # meters between voxels
+DOWN = (0.0, 0.0, 1.0, 0.0)                              # end effector pointing down
+
+
+def yaw_orientations(step_deg: float = 90.0, base: tuple = DOWN) -> list[tuple[float, float, float, float]]:
+    """
+    Returns orientations (w, x, y, z) made by rotating base around z axis by multiples of step_deg
+    """
+    w2, x2, y2, z2 = base
+    orientations = []
+
+    for i in range(max(1, round(360 / step_deg))):
+        half = math.radians(i * step_deg) / 2
+        w1, z1 = math.cos(half), math.sin(half)
+        orientations.append((w1 * w2 - z1 * z2, w1 * x2 - z1 * y2, w1 * y2 + z1 * x2, w1 * z2 + z1 * w2))
+
+    return orientations
+
+
+class ReachabilityMap:
+    """
+    Bitmap of reachable poses, bits[o, i, j, k] is set if the pose with orientation o and position
+    (x_min + i * resolution, y_min + j * resolution, z_min + k * resolution) has IK solution.
+    Bits along z are packed (np.packbits), the map takes nx * ny * ceil(nz / 8) bytes per orientation.
+    """
+    def __init__(self, bounds: tuple, resolution: float, orientations: list, bits: np.ndarray, ori_tolerance: float = 10.0, meta: dict = None):
+        """
+        Args:
+            bounds (tuple): ((x_min, x_max), (y_min, y_max), (z_min, z_max)) in meters.
+            resolution (float): Distance between voxels in meters.
+            orientations (list): Sampled orientations (w, x, y, z).
+            bits (np.ndarray): Packed bitmap of shape (orientations, nx, ny, ceil(nz / 8)).
+            ori_tolerance (float, optional): Maximum angle in degrees between a pose and the nearest sampled orientation.
+            meta (dict, optional): Additional information stored in the file (url, time of creation, ...).
+        """
+        self.bounds = tuple((float(lo), float(hi)) for lo, hi in bounds)
+        self.resolution = float(resolution)
+        self.shape = self.grid_shape(self.bounds, self.resolution)
+        self.orientations = np.asarray(orientations, dtype=np.float64).reshape(-1, 4)
+        self.bits = bits
+        self.ori_tolerance = float(ori_tolerance)
+        self.min_dot = math.cos(math.radians(self.ori_tolerance) / 2)
+        self.meta = meta or {}
+
+        expected = (len(self.orientations), self.shape[0], self.shape[1], (self.shape[2] + 7) // 8)
+        if tuple(bits.shape) != expected:
+            raise ValueError(f"Bitmap has shape {tuple(bits.shape)}, expected {expected}")
+
+    @staticmethod
+    def grid_shape(bounds: tuple, resolution: float) -> tuple[int, int, int]:
+        """
+        Returns number of voxels along x, y and z (at least 2, so every inside point has 8 neighbours)
+        """
+        return tuple(max(2, int(math.floor((hi - lo) / resolution + 1e-9)) + 1) for lo, hi in bounds)
+
+    @classmethod
+    def build(cls, robot, bounds: tuple = BOUNDS, resolution: float = RESOLUTION, orientations: list = None,
+              ori_tolerance: float = None, chunk: int = 1024, progress=None) -> 'ReachabilityMap':
+        """
+        Samples the workspace through robot.check_reachable_many (the controller or the local simulator)
+
+        Args:
+            robot (Robot): Connected robot used for the IK requests.
+            bounds (tuple, optional): ((x_min, x_max), (y_min, y_max), (z_min, z_max)) in meters. Defaults to BOUNDS.
+            resolution (float, optional): Distance between voxels in meters. Defaults to RESOLUTION.
+            orientations (list, optional): Orientations (w, x, y, z) to sample. Defaults to end effector pointing down rotated by 90 degrees.
+            ori_tolerance (float, optional): Maximum angle in degrees to the nearest sampled orientation. Defaults to half of the angle between yaw samples.
+            chunk (int, optional): Number of poses sent to check_reachable_many at once.
+            progress (callable, optional): Called as progress(done, total) after every chunk.
+        """
+        import modules.robot as r
+
+        if orientations is None:
+            orientations = yaw_orientations()
+        if ori_tolerance is None:
+            ori_tolerance = 180.0 / len(orientations)
+
+        shape = cls.grid_shape(bounds, resolution)
+        start = r.Pose(r.Position(bounds[0][0], bounds[1][0], bounds[2][0]), r.Orientation(1, 0, 0, 0))
+        grid = r.PoseArray.grid(start, shape, (resolution, resolution, resolution))
+        total = len(orientations) * len(grid)
+        reachable = np.zeros((len(orientations), len(grid)), dtype=bool)
+
+        # Answers of the robot's own map must not end up in the new map
+        previous = robot.reachability
+        robot.reachability = None
+
+        try:
+            for o, orientation in enumerate(orientations):
+                grid.orientations[:] = orientation
+
+                for begin in range(0, len(grid), chunk):
+                    poses = grid[begin:begin + chunk].to_poses()
+                    results = robot.check_reachable_many(poses)
+                    reachable[o, begin:begin + len(poses)] = [results[i] is not None for i in range(len(poses))]
+
+                    if progress is not None:
+                        progress(o * len(grid) + begin + len(poses), total)
+        finally:
+            robot.reachability = previous
+
+        bits = np.packbits(reachable.reshape(len(orientations), *shape), axis=-1)
+        meta = {"url": robot.robot_url, "created": datetime.datetime.now().isoformat()}
+
+        return cls(bounds, resolution, orientations, bits, ori_tolerance, meta)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the map as a JSON header followed by the raw bitmap (loaded memory-mapped by load())
+        """
+        header = json.dumps({
+            "bounds": self.bounds,
+            "resolution": self.resolution,
+            "orientations": self.orientations.tolist(),
+            "ori_tolerance": self.ori_tolerance,
+            "shape": list(self.bits.shape),
+            "meta": self.meta,
+        }).encode("utf-8")
+
+        padding = -(len(MAGIC) + len(header) + 1) % ALIGNMENT
+
+        with open(path, 'wb') as file:
+            file.write(MAGIC)
+            file.write(header + b" " * padding + b"\n")
+            file.write(np.ascontiguousarray(self.bits, dtype=np.uint8).tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> 'ReachabilityMap':
+        """
+        Loads the map saved by save(), the bitmap is memory-mapped (read only, shared by processes)
+
+        Raises:
+            ValueError: If the file is not a reachability map.
+        """
+        with open(path, 'rb') as file:
+            if file.readline() != MAGIC:
+                raise ValueError(f"{path} is not a reachability map")
+
+            header = json.loads(file.readline())
+            offset = file.tell()
+
+        bits = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=tuple(header["shape"]))
+
+        return cls(header["bounds"], header["resolution"], header["orientations"], bits, header["ori_tolerance"], header["meta"])
+
+    def nearest_orientation(self, w: float, x: float, y: float, z: float) -> int:
+        """
+        Returns index of the nearest sampled orientation or None if it is further than ori_tolerance
+        """
+        norm = math.sqrt(w * w + x * x + y * y + z * z)
+        if norm == 0:
+            return None
+
+        # q and -q are the same rotation
+        dots = np.abs(self.orientations @ (w / norm, x / norm, y / norm, z / norm))
+        index = int(np.argmax(dots))
+
+        return index if dots[index] >= self.min_dot else None
+
+    def _bit(self, o: int, i: int, j: int, k: int) -> int:
+        return (int(self.bits[o, i, j, k >> 3]) >> (7 - (k & 7))) & 1
+
+    def score(self, pose) -> float:
+        """
+        Returns trilinear interpolation (0-1) of reachability of the 8 voxels around the pose,
+        None if the pose is outside of the map or its orientation was not sampled
+        """
+        o = self.nearest_orientation(pose.orientation.w, pose.orientation.x, pose.orientation.y, pose.orientation.z)
+        if o is None:
+            return None
+
+        corner = []
+        weight = []
+        for value, (lo, _), n in zip((pose.position.x, pose.position.y, pose.position.z), self.bounds, self.shape):
+            f = (value - lo) / self.resolution
+            if f < -1e-9 or f > n - 1 + 1e-9:
+                return None
+
+            c = min(max(int(f), 0), n - 2)
+            corner.append(c)
+            weight.append(min(max(f - c, 0.0), 1.0))
+
+        (i, j, k), (fx, fy, fz) = corner, weight
+        score = 0.0
+        for di, wx in ((0, 1 - fx), (1, fx)):
+            for dj, wy in ((0, 1 - fy), (1, fy)):
+                for dk, wz in ((0, 1 - fz), (1, fz)):
+                    if wx * wy * wz > 0 and self._bit(o, i + di, j + dj, k + dk):
+                        score += wx * wy * wz
+
+        return score
+
+    def is_reachable(self, pose, threshold: float = 0.5) -> bool:
+        """
+        Returns True if the interpolated score is at least threshold, None if the map does not know the pose
+        """
+        score = self.score(pose)
+
+        return None if score is None else score >= threshold
+
+    def rejects(self, pose) -> bool:
+        """
+        Returns True only if the map is sure the pose is not reachable: the 8 voxels around it and all their neighbours
+        are unreachable for every sampled orientation within ori_tolerance.
+        Near the boundary of the reachable space or between sampled orientations the controller has to be asked.
+        """
+        q = pose.orientation
+        norm = math.sqrt(q.w * q.w + q.x * q.x + q.y * q.y + q.z * q.z)
+        if norm == 0:
+            return False
+
+        # q and -q are the same rotation
+        dots = np.abs(self.orientations @ (q.w / norm, q.x / norm, q.y / norm, q.z / norm))
+        orientations = np.flatnonzero(dots >= self.min_dot)
+        if len(orientations) == 0:
+            return False
+
+        block = []
+        for value, (lo, _), n in zip((pose.position.x, pose.position.y, pose.position.z), self.bounds, self.shape):
+            f = (value - lo) / self.resolution
+            if f < -1e-9 or f > n - 1 + 1e-9:
+                return False
+
+            c = min(max(int(f), 0), n - 2)
+            block.append((max(c - 1, 0), min(c + 3, n)))
+
+        (i0, i1), (j0, j1), (k0, k1) = block
+        voxels = np.unpackbits(self.bits[orientations, i0:i1, j0:j1, k0 >> 3:((k1 - 1) >> 3) + 1], axis=-1)
+        offset = k0 & ~7
+
+        return not voxels[..., k0 - offset:k1 - offset].any()
+
+    def stats(self) -> dict:
+        """
+        Returns size of the map and fraction of reachable voxels
+        """
+        voxels = len(self.orientations) * self.shape[0] * self.shape[1] * self.shape[2]
+        reachable = int(np.unpackbits(np.asarray(self.bits), axis=-1)[..., :self.shape[2]].sum())
+
+        return {
+            "orientations": len(self.orientations),
+            "shape": list(self.shape),
+            "voxels": voxels,
+            "reachable": reachable / voxels,
+            "bytes": int(self.bits.nbytes),
+        }
+
+
+_default_map: ReachabilityMap = None
+_default_map_lock = threading.Lock()
+
+
+def get_default_map() -> ReachabilityMap:
+    """
+    Returns map loaded from ROBOT_REACHABILITY_MAP shared by all robots in this process (None if not set)
+    """
+    global _default_map
+
+    if MAP_PATH is None:
+        return None
+
+    with _default_map_lock:
+        if _default_map is None:
+            _default_map = ReachabilityMap.load(MAP_PATH)
+
+        return _default_map
+
+
+def main():
+    import modules.robot as r
+    import modules.ik_cache as ik
+    import modules.simulator as sim
+
+    parser = argparse.ArgumentParser(description="Builds reachability map of the arm workspace")
+    parser.add_argument("--url", default=r.URL, help="controller url (default: ROBOT_URL)")
+    parser.add_argument("--simulator", action="store_true", help="sample the local simulator instead of the controller")
+    parser.add_argument("--resolution", type=float, default=RESOLUTION, help="meters between voxels")
+    parser.add_argument("--bounds", type=float, nargs=6, default=[v for axis in BOUNDS for v in axis],
+                        metavar=("X_MIN", "X_MAX", "Y_MIN", "Y_MAX", "Z_MIN", "Z_MAX"), help="sampled box in meters")
+    parser.add_argument("--yaw-step", type=float, default=90.0, help="degrees between sampled end effector rotations")
+    parser.add_argument("--output", default="reachability.map")
+    args = parser.parse_args()
+
+    simulator = None
+    url = args.url
+    if args.simulator:
+        simulator = sim.Simulator(time_scale=0)
+        url = simulator.start()
+
+    # Every pose is sent only once, caching the results would only fill the shared cache
+    robot = r.Robot(url, ik_cache=ik.IKCache(max_size=0))
+    bounds = tuple(zip(args.bounds[0::2], args.bounds[1::2]))
+    start = time.perf_counter()
+
+    def progress(done: int, total: int) -> None:
+        print(f"\r{done}/{total} poses ({100 * done / total:.0f} %)", end="", flush=True)
+
+    reach = ReachabilityMap.build(robot, bounds, args.resolution, yaw_orientations(args.yaw_step), progress=progress)
+    reach.save(args.output)
+    print()
+
+    if simulator is not None:
+        simulator.stop()
+
+    stats = reach.stats()
+    print(f"{stats['voxels']} poses sampled in {time.perf_counter() - start:.1f} s, {100 * stats['reachable']:.1f} % reachable")
+    print(f"Map saved to {args.output} ({stats['bytes']} bytes)")
+
+
+if __name__ == "__main__":
+    main()
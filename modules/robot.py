@@ -1,19 +1,43 @@
 from dotenv import load_dotenv
 from enum import Enum
+from contextlib import contextmanager
+import concurrent.futures
+import functools
 import os
 import requests
 import json
 import math
-from pyquaternion import Quaternion
+import threading
+import collections
+import copy
+import numpy as np
+import time
+import modules.transport as t
+import modules.rotation as rot
+import modules.ik_cache as ik
+import modules.reachability as reach
+import modules.kinematics as kin
+import modules.planner as pp
+import modules.tracking as bt
+import modules.telemetry as tel
+import modules.metrics as m
 
 load_dotenv()
 URL = os.getenv('ROBOT_URL')
+POSE_TTL = float(os.getenv('ROBOT_POSE_TTL', '2.0'))
+POLL_RATE = float(os.getenv('ROBOT_POLL_RATE', '0'))           # Hz of the shared state poller (0 = off)
+MAX_SAMPLE_AGE = float(os.getenv('ROBOT_MAX_SAMPLE_AGE', '0.2')) # seconds, older polled samples are not used
+BELT_SPEED_PER_UNIT = float(os.getenv('ROBOT_BELT_SPEED_PER_UNIT', '0.002'))   # m/s of the belt per unit of velocity
+IK_MODE = os.getenv('ROBOT_IK_MODE', 'remote')   # 'remote' (/ik endpoint), 'local' (modules.kinematics) or 'hybrid'
+IK_MODES = ("remote", "local", "hybrid")
 
 
 class Position:
     """
     Struct to store the position of the robot (values in meters)
     """
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: float, y: float, z: float):
         """
         Initializes the Position object with x, y and z
@@ -39,21 +63,21 @@ class Position:
         Returns:
             New position after rotation
         """
-        rad = math.radians(angle)
+        cos, sin = rot.trig(angle)
 
         if axis == "x":
             x = self.x
-            y = self.y * math.cos(rad) - self.z * math.sin(rad)
-            z = self.y * math.sin(rad) + self.z * math.cos(rad)
+            y = self.y * cos - self.z * sin
+            z = self.y * sin + self.z * cos
         
         elif axis == "y":
-            x = self.x * math.cos(rad) - self.z * math.sin(rad)
+            x = self.x * cos - self.z * sin
             y = self.y
-            z = self.x * math.sin(rad) + self.z * math.cos(rad)
+            z = self.x * sin + self.z * cos
         
         elif axis == "z":
-            x = self.x * math.cos(rad) - self.y * math.sin(rad)
-            y = self.x * math.sin(rad) + self.y * math.cos(rad)
+            x = self.x * cos - self.y * sin
+            y = self.x * sin + self.y * cos
             z = self.z
 
         else:
@@ -70,18 +94,38 @@ class Position:
             "y": self.y,
             "z": self.z
         }
+
+    def to_json(self) -> str:
+        """
+        Returns the Position object as a compact JSON string
+        """
+        return f'{{"x":{self.x!r},"y":{self.y!r},"z":{self.z!r}}}'
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not Position:
+            return NotImplemented
+
+        return self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self) -> int:
+        return hash((self.x, self.y, self.z))
+
+    def __repr__(self) -> str:
+        return f"Position(x={self.x!r}, y={self.y!r}, z={self.z!r})"
     
     def __str__(self):
         """
         Returns the Position object as a JSON string
         """
-        return json.dumps(self.to_dict(), indent=4)
+        return self.to_json()
 
 
 class Orientation:
     """
     Struct to store the orientation of the robot (values in quaternions)
     """
+    __slots__ = ("w", "x", "y", "z")
+
     def __init__(self, w: float, x: float, y: float, z: float):
         """
         Initializes the Orientation object with w, x, y and z
@@ -109,21 +153,9 @@ class Orientation:
         Returns:
             New orientation after rotation
         """
-        angle_rad = math.radians(angle_deg)
-
-        if axis == 'x':
-            rotation_quaternion = Quaternion(axis=[1, 0, 0], angle=angle_rad)
-        elif axis == 'y':
-            rotation_quaternion = Quaternion(axis=[0, 1, 0], angle=angle_rad)
-        elif axis == 'z':
-            rotation_quaternion = Quaternion(axis=[0, 0, 1], angle=angle_rad)
-        else:
-            raise ValueError("Axis must be 'x', 'y', or 'z'")
-        
-        quat = Quaternion(w=self.w, x=self.x, y=self.y, z=self.z)
-        rotated = rotation_quaternion * quat
+        w, x, y, z = rot.multiply(rot.axis_quaternion(angle_deg, axis), (self.w, self.x, self.y, self.z))
         
-        return Orientation(rotated.w, rotated.x, rotated.y, rotated.z)       
+        return Orientation(w, x, y, z)
         
     def to_dict(self) -> dict[str, float]:
         """
@@ -135,18 +167,38 @@ class Orientation:
             "y": self.y,
             "z": self.z
         }
+
+    def to_json(self) -> str:
+        """
+        Returns the Orientation object as a compact JSON string
+        """
+        return f'{{"w":{self.w!r},"x":{self.x!r},"y":{self.y!r},"z":{self.z!r}}}'
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not Orientation:
+            return NotImplemented
+
+        return self.w == other.w and self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __hash__(self) -> int:
+        return hash((self.w, self.x, self.y, self.z))
+
+    def __repr__(self) -> str:
+        return f"Orientation(w={self.w!r}, x={self.x!r}, y={self.y!r}, z={self.z!r})"
     
     def __str__(self):
         """
         Returns the Orientation object as a JSON string
         """
-        return json.dumps(self.to_dict(), indent=4)
+        return self.to_json()
 
 
 class Pose:
     """
     Struct to store position and orientation of the robot
     """
+    __slots__ = ("position", "orientation")
+
     def __init__(self, position: Position, orientation: Orientation):
         """
         Initializes the Pose object with position and orientation
@@ -164,6 +216,31 @@ class Pose:
         self.position = position
         self.orientation = orientation
         
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Pose':
+        """
+        Creates Pose from dictionary (same format as to_dict returns)
+        """
+        return cls(
+            Position(
+                data['position']['x'], 
+                data['position']['y'], 
+                data['position']['z']
+            ), 
+            Orientation(
+                data['orientation']['w'], 
+                data['orientation']['x'], 
+                data['orientation']['y'], 
+                data['orientation']['z']
+            )
+        )
+
+    def copy(self) -> 'Pose':
+        """
+        Returns independent copy of the Pose object
+        """
+        o = self.orientation
+        return Pose(Position(self.position.x, self.position.y, self.position.z), Orientation(o.w, o.x, o.y, o.z))
 
     def to_dict(self) -> dict[str, dict[str, float]]:
         """
@@ -173,12 +250,171 @@ class Pose:
             "position": self.position.to_dict(),
             "orientation": self.orientation.to_dict()
         }
+
+    def to_json(self) -> str:
+        """
+        Returns the Pose object as a compact JSON string (used as body of requests)
+        """
+        return f'{{"position":{self.position.to_json()},"orientation":{self.orientation.to_json()}}}'
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not Pose:
+            return NotImplemented
+
+        return self.position == other.position and self.orientation == other.orientation
+
+    def __hash__(self) -> int:
+        return hash((self.position, self.orientation))
+
+    def __repr__(self) -> str:
+        return f"Pose({self.position!r}, {self.orientation!r})"
     
     def __str__(self):
         """
         Returns the Pose object as a JSON string
         """
-        return json.dumps(self.to_dict(), indent=4)
+        return self.to_json()
+
+
+def quaternion_multiply(q1: np.ndarray, q2: np.ndarray) -> np.ndarray:
+    """
+    Hamilton product of quaternions stored in rows [w, x, y, z] (shapes (4,) or (N, 4) are broadcast)
+    """
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=np.float64), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=np.float64), -1, 0)
+
+    return np.stack((
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ), axis=-1)
+
+
+class PoseArray:
+    """
+    Many poses stored in NumPy arrays for fast calculations of patterns and trajectories (e.g. grid of cubes).
+    positions is N x 3 array [x, y, z] in meters, orientations is N x 4 array [w, x, y, z].
+    """
+    AXES = {"x": 0, "y": 1, "z": 2}
+
+    def __init__(self, positions, orientations=None):
+        """
+        Initializes the PoseArray object
+
+        Args:
+            positions: N x 3 array of positions in meters.
+            orientations (optional): N x 4 array of orientations (or one orientation for all poses). Defaults to [1, 0, 0, 0].
+        """
+        self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+
+        if orientations is None:
+            orientations = (1.0, 0.0, 0.0, 0.0)
+
+        self.orientations = np.array(
+            np.broadcast_to(np.asarray(orientations, dtype=np.float64), (len(self.positions), 4))
+        )
+
+    @classmethod
+    def from_poses(cls, poses: list[Pose]) -> 'PoseArray':
+        """
+        Creates PoseArray from list of Pose objects
+        """
+        return cls(
+            [(p.position.x, p.position.y, p.position.z) for p in poses],
+            [(p.orientation.w, p.orientation.x, p.orientation.y, p.orientation.z) for p in poses],
+        )
+
+    @classmethod
+    def grid(cls, start: Pose, count: tuple[int, int, int], spacing: tuple[float, float, float]) -> 'PoseArray':
+        """
+        Creates grid of poses with the orientation of start (e.g. places of cubes on a pallet)
+
+        Args:
+            start (Pose): The first pose of the grid.
+            count (tuple[int, int, int]): Number of poses along x, y and z.
+            spacing (tuple[float, float, float]): Distance between poses along x, y and z in meters.
+        """
+        idx = np.indices(count, dtype=np.float64).reshape(3, -1).T
+        p = start.position
+        o = start.orientation
+
+        return cls(idx * np.asarray(spacing, dtype=np.float64) + (p.x, p.y, p.z), (o.w, o.x, o.y, o.z))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        """
+        Returns Pose for integer index, PoseArray for slice or array index
+        """
+        if isinstance(index, (int, np.integer)):
+            p = self.positions[index]
+            o = self.orientations[index]
+            return Pose(Position(p[0], p[1], p[2]), Orientation(o[0], o[1], o[2], o[3]))
+
+        return PoseArray(self.positions[index], self.orientations[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_poses(self) -> list[Pose]:
+        """
+        Returns list of Pose objects
+        """
+        return [Pose(Position(*p), Orientation(*o)) for p, o in zip(self.positions.tolist(), self.orientations.tolist())]
+
+    def translate(self, offset) -> 'PoseArray':
+        """
+        Returns new PoseArray moved by offset ([dx, dy, dz] or N x 3 array) in meters
+        """
+        return PoseArray(self.positions + np.asarray(offset, dtype=np.float64), self.orientations)
+
+    def rotate(self, angle_deg, axis: str) -> 'PoseArray':
+        """
+        Returns new PoseArray with positions and orientations rotated around the axis (same as Position.rotate and Orientation.rotate)
+
+        Args:
+            angle_deg: The angle in degrees (one for all poses or array of N angles).
+            axis (str): The axis to rotate around ('x', 'y', 'z').
+        Raises:
+            ValueError: If the axis is invalid.
+        """
+        if axis not in self.AXES:
+            raise ValueError("Axis must be 'x', 'y', or 'z'")
+
+        rad = np.radians(np.asarray(angle_deg, dtype=np.float64))
+        cos = np.cos(rad)
+        sin = np.sin(rad)
+
+        # indices of the two coordinates changed by the rotation (x: y,z  y: x,z  z: x,y)
+        a, b = [i for i in range(3) if i != self.AXES[axis]]
+
+        positions = self.positions.copy()
+        positions[:, a] = self.positions[:, a] * cos - self.positions[:, b] * sin
+        positions[:, b] = self.positions[:, a] * sin + self.positions[:, b] * cos
+
+        half = rad / 2
+        rotation = np.zeros(np.shape(half) + (4,))
+        rotation[..., 0] = np.cos(half)
+        rotation[..., 1 + self.AXES[axis]] = np.sin(half)
+
+        return PoseArray(positions, quaternion_multiply(rotation, self.orientations))
+
+    def compose(self, quaternion) -> 'PoseArray':
+        """
+        Returns new PoseArray with orientations rotated by quaternion ([w, x, y, z] or N x 4 array), applied as quaternion * orientation
+        """
+        return PoseArray(self.positions, quaternion_multiply(quaternion, self.orientations))
+
+    def normalize(self) -> 'PoseArray':
+        """
+        Returns new PoseArray with unit length orientations
+        """
+        norm = np.linalg.norm(self.orientations, axis=1, keepdims=True)
+
+        return PoseArray(self.positions, self.orientations / np.where(norm == 0, 1, norm))
 
 
 class Mode(Enum):
@@ -190,43 +426,512 @@ class Mode(Enum):
     ASSISTANT = "assistant"
 
 
-def check_response(response: requests.Response, mode: Mode) -> tuple[str, bool]:
+def check_response(response: requests.Response, mode: Mode, metrics: m.Metrics = None) -> tuple[str, bool]:
     """
     returns message or raise error (True if error, False if not)
 
     Args:
         response (requests.Response): The response from the robot.
         mode (Mode): The mode of the robot.
+        metrics (Metrics, optional): Metrics to record the result to. Defaults to None.
     """
+    start = time.perf_counter()
 
     if response.ok:
-        if response.text == "":
-            return "Success!", False
-        
-        return response.text, False
+        msg = "Success!" if response.text == "" else response.text
+    else:
+        msg = f"Robot is not running as expected. Error: {response.text}"
+
+    if metrics is not None:
+        endpoint = ""
+        if response.request is not None:
+            endpoint = f"{response.request.method} {response.request.path_url.split('?', 1)[0]}"
+
+        metrics.record_check(endpoint, not response.ok, time.perf_counter() - start)
+
+    if response.ok:
+        return msg, False
     
     if mode == Mode.DEFAULT:
-        raise requests.exceptions.HTTPError(f"Robot is not running as expected. Error: {response.text}")
+        raise requests.exceptions.HTTPError(msg)
     
     else:
-        return (f"Robot is not running as expected. Error: {response.text}"), True
+        return msg, True
+
+
+def instrumented(func):
+    """
+    Decorator of Robot methods recording their wall time when the robot has metrics enabled
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return func(self, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self.metrics.record_call(func.__name__, time.perf_counter() - start)
+
+    return wrapper
     
 
+def move_path(moveType: str, velocity: int = None, acceleration: int = None, safe: bool = None) -> str:
+    """
+    Returns path (with query string) of the endpoint moving the arm
+    """
+    path = f"/eef/pose?moveType={moveType}"
+
+    if velocity is not None:
+        path += f"&velocity={velocity}"
+
+    if acceleration is not None:
+        path += f"&acceleration={acceleration}"
+
+    if safe is not None:
+        path += f"&safe={safe}"
+
+    return path
+
+
+class BatchError(Exception):
+    """
+    Raised when a command of a batch is invalid or fails (index is the position of the command in the batch)
+    """
+    def __init__(self, index: int, message: str, results: list[str] = None):
+        super().__init__(f"Command {index}: {message}")
+        self.index = index
+        self.message = message
+        self.results = results if results is not None else []
+
+
+class CommandBatch:
+    """
+    Collects commands and sends them to the robot one right after another (use Robot.batch())
+    """
+    MOVE_TYPES = ("JUMP", "LINEAR", "JOINTS")
+    DIRECTIONS = ("forward", "backwards")
+
+    def __init__(self, robot: 'Robot', progress=None, check_reachable: bool = True):
+        """
+        Args:
+            robot (Robot): The robot to send the commands to.
+            progress (callable, optional): Called as progress(index, total, result) after each sent command.
+            check_reachable (bool, optional): Check reachability of all move_to targets before sending. Defaults to True.
+        """
+        self.robot = robot
+        self.progress = progress
+        self.check_reachable = check_reachable
+        self.commands: list[tuple[str, str, dict]] = []     # (name, path, request kwargs)
+        self.errors: list[tuple[int, str]] = []             # (index, message) found during collecting
+        self.poses: dict[int, Pose] = {}                    # index of move_to command -> target pose
+        self.belts: dict[int, tuple] = {}                   # index of belt command -> (direction, velocity, distance or None)
+        self.results: list[str] = []
+        self.failed_index: int = None                       # index of the failed or cancelled command (None if all succeeded)
+
+    @property
+    def ok(self) -> bool:
+        """
+        True if all commands were sent and succeeded (only meaningful after send)
+        """
+        return self.failed_index is None and len(self.results) == len(self.commands)
+
+    def _add(self, name: str, path: str, error: str = None, **kwargs) -> None:
+        if error is not None:
+            self.errors.append((len(self.commands), f"{name}: {error}"))
+
+        self.commands.append((name, path, kwargs))
+
+    def move_to(self, pose: Pose, moveType: str, velocity: int = None, acceleration: int = None, safe: bool = None) -> None:
+        """
+        Adds move to the batch (parameters as Robot.move_to)
+        """
+        error = None
+        if type(pose) is not Pose:
+            error = "Pose must be of type Pose"
+        elif moveType not in self.MOVE_TYPES:
+            error = f"moveType must be one of {self.MOVE_TYPES}"
+        elif velocity is not None and not 1 <= velocity <= 100:
+            error = "velocity must be in range 1-100"
+        elif acceleration is not None and not 1 <= acceleration <= 100:
+            error = "acceleration must be in range 1-100"
+
+        data = None
+        if error is None:
+            data = pose.to_json()
+            self.poses[len(self.commands)] = pose.copy()
+
+        self._add("move_to", move_path(moveType, velocity, acceleration, safe), error,
+                  data=data, headers={'Content-Type': 'application/json'})
+
+    def suck(self) -> None:
+        """
+        Adds turning on the vacuum to the batch
+        """
+        self._add("suck", "/suck", headers={'accept': '*/*'})
+
+    def release(self) -> None:
+        """
+        Adds turning off the vacuum to the batch
+        """
+        self._add("release", "/release", headers={'accept': '*/*'})
+
+    def _check_belt(self, direction: str, velocity: int) -> str:
+        if direction not in self.DIRECTIONS:
+            return "Direction must be either 'forward' or 'backwards'"
+
+        if not 1 <= velocity <= 50:
+            return "velocity must be in range 1-50"
+
+        return None
+
+    def belt_speed(self, direction: str, velocity: int) -> None:
+        """
+        Adds starting the conveyor belt to the batch (parameters as Robot.belt_speed)
+        """
+        error = self._check_belt(direction, velocity)
+        self.belts[len(self.commands)] = (direction, velocity, None)
+        self._add("belt_speed", f"/conveyor/speed?velocity={velocity}&direction={direction}", error,
+                  headers={'accept': '*/*'})
+
+    def belt_distance(self, direction: str, velocity: int, distance: float) -> None:
+        """
+        Adds moving the conveyor belt by distance to the batch (parameters as Robot.belt_distance)
+        """
+        direction = direction.lower()
+        error = self._check_belt(direction, velocity)
+        if error is None and distance <= 0:
+            error = "distance must be positive"
+
+        self.belts[len(self.commands)] = (direction, velocity, distance)
+        self._add("belt_distance", f"/conveyor/distance?velocity={velocity}&direction={direction}&distance={distance}", error,
+                  headers={'accept': '*/*'})
+
+    def send(self) -> list[str]:
+        """
+        Validates all commands (and reachability of all move_to targets unless check_reachable is False) and sends them to the robot.
+        Stops at the first failed command.
+
+        Raises:
+            BatchError: If any command is invalid or any target is unreachable (nothing is sent) or a command fails in Mode.DEFAULT.
+
+        Returns:
+            list[str]: Result message of each sent command.
+        """
+        if self.errors:
+            index = self.errors[0][0]
+            raise BatchError(index, "Invalid batch, nothing was sent: " + "; ".join(f"[{i}] {msg}" for i, msg in self.errors))
+
+        # the arm must not stop halfway because of a target it can't reach
+        indices = list(self.poses) if self.check_reachable else []
+        try:
+            reachable = self.robot.check_reachable_many([self.poses[index] for index in indices]) if indices else {}
+        except Exception as e:
+            raise BatchError(indices[0], f"Failed to check reachability, nothing was sent: {e}")
+
+        unreachable = [index for i, index in enumerate(indices) if reachable[i] is None]
+        if unreachable:
+            raise BatchError(unreachable[0], "Unreachable target, nothing was sent: " + "; ".join(
+                f"[{index}] move_to {self.poses[index]}" for index in unreachable))
+
+        transport = self.robot.transport
+        self.results = []
+        self.failed_index = None
+        started = time.monotonic()
+
+        for index, (name, path, kwargs) in enumerate(self.commands):
+            if self.robot.cancelled >= started:
+                self.failed_index = index
+                if self.robot.mode == Mode.DEFAULT:
+                    raise BatchError(index, f"{name}: Cancelled by emergency stop", self.results)
+
+                self.results.append(f"Command {index} ({name}) cancelled by emergency stop")
+                break
+
+            if index in self.poses:
+                self.robot.invalidate_pose()
+
+            # belt_distance is answered after the travel ends, the odometer runs with the belt until then
+            if index in self.belts and self.belts[index][2] is not None:
+                self.robot.belt.set_velocity(*self.belts[index][:2])
+
+            try:
+                response = transport.put(path, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self.failed_index = index
+                if index in self.belts and self.belts[index][2] is not None:
+                    self.robot.belt.set_velocity("forward", 0)
+                raise BatchError(index, f"{name}: Failed to send command: {e}", self.results)
+
+            msg, err = check_response(response, Mode.ASSISTANT, self.robot.metrics)
+
+            if not err and index in self.poses:
+                self.robot.remember_pose(self.poses[index])
+
+            if not err and index in self.belts:
+                direction, velocity, distance = self.belts[index]
+                if distance is None:
+                    self.robot.belt.set_velocity(direction, velocity)
+                else:
+                    self.robot.belt.moved(direction, distance)
+
+            if self.progress is not None:
+                self.progress(index, len(self.commands), msg)
+
+            if err:
+                self.failed_index = index
+                if index in self.belts and self.belts[index][2] is not None:
+                    self.robot.belt.set_velocity("forward", 0)
+
+                if self.robot.mode == Mode.DEFAULT:
+                    raise BatchError(index, f"{name}: {msg}", self.results)
+
+                self.results.append(f"Command {index} ({name}) failed: {msg}")
+                break
+
+            self.results.append(msg)
+
+        return self.results
+
+
+class BeltHandle:
+    """
+    Handle of a conveyor belt command running in background (returned by Robot.belt_distance_nowait and Robot.belt_speed_nowait)
+    """
+    def __init__(self, robot: 'Robot', future: concurrent.futures.Future):
+        """
+        Args:
+            robot (Robot): The robot controlling the belt.
+            future (Future): The running request.
+        """
+        self.robot = robot
+        self.future = future
+        self.is_cancelled = False
+
+    def done(self) -> bool:
+        """
+        Returns True if the robot answered the command (belt_distance is answered after the travel ends)
+        """
+        return self.future.done()
+
+    def wait(self, timeout: float = None) -> str:
+        """
+        Waits until the belt command is done
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds. Defaults to None (no limit).
+        Raises:
+            TimeoutError: If the command is not done in time.
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        try:
+            return self.future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            raise TimeoutError("Belt command is not done yet")
+
+    def cancel(self) -> str:
+        """
+        Stops the belt (and the arm, see Robot.belt_stop), is_cancelled is set only if the robot confirmed the stop
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        self.future.cancel()
+
+        try:
+            msg = self.robot.belt_stop()
+        except requests.exceptions.RequestException as e:
+            return f"Belt was not stopped, it may still be running. Error: {e}"
+
+        self.is_cancelled = self.robot.belt.speed == 0
+
+        return msg
+
+
+class StateSample:
+    """
+    State of the robot polled by StatePoller (time is time.monotonic() when the polling started)
+    """
+    __slots__ = ("time", "pose", "joints", "started")
+
+    def __init__(self, time: float, pose: Pose, joints: list, started: bool):
+        self.time = time
+        self.pose = pose
+        self.joints = joints
+        self.started = started
+
+
+class StatePoller:
+    """
+    Background thread polling pose, joints and started state of the robot into a fixed-size ring buffer.
+    One poller can serve all Robot objects of the process (see get_poller).
+    """
+    def __init__(self, transport: t.Transport, rate: float = 10.0, size: int = 256):
+        """
+        Args:
+            transport (Transport): Connection to the robot.
+            rate (float, optional): Polls per second. Defaults to 10.
+            size (int, optional): Number of samples kept. Defaults to 256.
+        """
+        self.transport = transport
+        self.rate = rate
+        self.samples: collections.deque[StateSample] = collections.deque(maxlen=size)
+        self.listeners = []
+        self.failures = 0
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+
+    def start(self) -> 'StatePoller':
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True, name="StatePoller")
+            self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def add_listener(self, listener) -> None:
+        """
+        Registers listener(sample: StateSample) called after every poll
+        """
+        if listener not in self.listeners:
+            self.listeners = self.listeners + [listener]
+
+    def latest(self, max_age: float = None, newer_than: float = None) -> StateSample:
+        """
+        Returns the latest sample or None if there is none (or it is older than max_age seconds or newer_than time)
+        """
+        try:
+            sample = self.samples[-1]
+        except IndexError:
+            return None
+
+        if max_age is not None and time.monotonic() - sample.time > max_age:
+            return None
+
+        if newer_than is not None and sample.time < newer_than:
+            return None
+
+        return sample
+
+    def history(self) -> list[StateSample]:
+        """
+        Returns all samples in the buffer (oldest first)
+        """
+        return list(self.samples)
+
+    def poll(self) -> StateSample:
+        """
+        Reads the state of the robot once and stores it to the buffer
+        """
+        start = time.monotonic()
+
+        pose = self.transport.get("/eef/pose")
+        joints = self.transport.get("/joints")
+        started = self.transport.get("/state/started")
+
+        if not (pose.ok and joints.ok and started.ok):
+            raise requests.exceptions.HTTPError(f"Polling failed with status {pose.status_code}, {joints.status_code}, {started.status_code}")
+
+        sample = StateSample(start, Pose.from_dict(json.loads(pose.text)), json.loads(joints.text), started.text == "true\n")
+        self.samples.append(sample)
+
+        for listener in self.listeners:
+            listener(sample)
+
+        return sample
+
+    def _run(self) -> None:
+        period = 1.0 / self.rate
+
+        while not self.stop_event.is_set():
+            begin = time.monotonic()
+
+            try:
+                self.poll()
+            except Exception:
+                # robot is unreachable or busy, next poll will try again
+                self.failures += 1
+
+            self.stop_event.wait(max(0.0, period - (time.monotonic() - begin)))
+
+
+_pollers: dict[str, StatePoller] = {}
+_pollers_lock = threading.Lock()
+
+
+def get_poller(url: str = URL, rate: float = None) -> StatePoller:
+    """
+    Returns running poller shared by everyone in this process polling the given url
+
+    Args:
+        url (str, optional): Url of the robot. Defaults to ROBOT_URL from .env file.
+        rate (float, optional): Polls per second (used when the poller is created). Defaults to ROBOT_POLL_RATE or 10.
+    """
+    with _pollers_lock:
+        if url not in _pollers:
+            _pollers[url] = StatePoller(t.get_transport(url), rate or POLL_RATE or 10.0).start()
+
+        return _pollers[url]
+
+
 class Robot:
     """
     Class to control the robot
     """
 
-    def __init__(self, url: str = URL, mode: Mode = Mode.DEFAULT): 
+    def __init__(self, url: str = URL, mode: Mode = Mode.DEFAULT, transport: t.Transport = None, ik_cache: ik.IKCache = None, pose_ttl: float = POSE_TTL, metrics: m.Metrics = None, poller: StatePoller = None, reachability: reach.ReachabilityMap = None, ik_mode: str = IK_MODE, kinematics: kin.ArmModel = None): 
         """
         Initializes the Robot object and establishes a connection to the robot
+
+        Args:
+            url (str, optional): Url of the robot. Defaults to ROBOT_URL from .env file.
+            mode (Mode, optional): Error handling mode. Defaults to Mode.DEFAULT.
+            transport (Transport, optional): Connection to the robot. Defaults to pooled connection shared by the whole process.
+            ik_cache (IKCache, optional): Cache for calculate_ik. Defaults to cache shared by the whole process.
+            pose_ttl (float, optional): Seconds for which the last known pose is used by get_pose(fresh=False). Defaults to ROBOT_POSE_TTL.
+            metrics (Metrics, optional): Collects latency of requests and methods. Defaults to None (shared metrics if ROBOT_METRICS=1).
+            poller (StatePoller, optional): Source of recent state for get_pose, get_joins and started. Defaults to None (shared poller if ROBOT_POLL_RATE > 0).
+            reachability (ReachabilityMap, optional): Rejects unreachable poses in calculate_ik without a request. Defaults to map from ROBOT_REACHABILITY_MAP (None if not set).
+            ik_mode (str, optional): Where calculate_ik is computed ('remote', 'local' or 'hybrid'). Defaults to ROBOT_IK_MODE.
+                'local' uses only the local model, 'hybrid' rejects poses unreachable for the local model and asks the controller about the rest.
+            kinematics (ArmModel, optional): Local kinematic model. Defaults to model shared by the whole process (ROBOT_KINEMATICS).
         """
         self.robot_url = url
         self.mode = mode
+        self.transport = transport if transport is not None else t.get_transport(url)
+        self.ik_cache = ik_cache if ik_cache is not None else ik.get_default_cache()
+        self.pose_ttl = pose_ttl
+        self.shadow: tuple[Pose, float] = None    # (last commanded or observed pose, time.monotonic() of the update)
+        self.metrics = None
+        self.belt_executor: concurrent.futures.ThreadPoolExecutor = None     # for belt commands running in background
+        self.belt = bt.BeltOdometer(BELT_SPEED_PER_UNIT)     # belt position integrated from commanded speeds
+        self.cancelled = 0.0        # time.monotonic() of the last cancel_pending (batches sent before it stop)
+        self.poller = poller if poller is not None or POLL_RATE <= 0 else get_poller(url)
+        self.max_sample_age = MAX_SAMPLE_AGE
+        self.motion_time = 0.0      # time.monotonic() of the last motion command (older polled samples are not used)
+        self.reachability = reachability if reachability is not None else reach.get_default_map()
+        self.kinematics = kinematics if kinematics is not None else kin.get_default_model()
+
+        if ik_mode not in IK_MODES:
+            raise ValueError(f"Invalid IK mode {ik_mode}, use one of {', '.join(IK_MODES)}")
+        self.ik_mode = ik_mode
+
+        if metrics is not None or m.ENABLED:
+            self.enable_metrics(metrics)
+
+        # Every request and polled sample is recorded if ROBOT_TELEMETRY is set
+        recorder = tel.get_default_recorder()
+        if recorder is not None:
+            recorder.attach(self)
 
         # Check connection to robot
         try:
-            response = requests.get(self.robot_url + "/state/started")
+            response = self.transport.get("/state/started")
 
             if response.status_code != 200:
                 raise Exception(f"Robot is not running as expected. Status code: {response.status_code}")
@@ -235,13 +940,31 @@ class Robot:
             raise Exception(f"Failed to connect to the Robot: {e}")
             
 
+    def enable_metrics(self, metrics: m.Metrics = None) -> m.Metrics:
+        """
+        Turns on recording of latency histograms (of requests and methods) and returns the metrics
+
+        Args:
+            metrics (Metrics, optional): Where to record. Defaults to metrics shared by the whole process.
+        """
+        self.metrics = metrics if metrics is not None else m.get_default_metrics()
+        self.transport.add_observer(self.metrics.observe_request)
+
+        return self.metrics
+
+
+    @instrumented
     def started(self) -> bool:
         """
         Returns True if the robot is started, False if not
         """
-        response = requests.get(self.robot_url + "/state/started")
+        sample = self.recent_sample()
+        if sample is not None:
+            return sample.started
 
-        msg, err = check_response(response, self.mode)
+        response = self.transport.get("/state/started")
+
+        msg, err = check_response(response, self.mode, self.metrics)
 
         if err:
             return msg
@@ -252,6 +975,7 @@ class Robot:
             return False
     
 
+    @instrumented
     def start(self) -> str:
         """
         Starts the robot
@@ -274,13 +998,15 @@ class Robot:
         }
             
         json_data = json.dumps(data)
-        response = requests.put(self.robot_url + "/state/start", data=json_data, headers={'Content-Type': 'application/json'})
+        self.invalidate_pose()
+        response = self.transport.put("/state/start", data=json_data, headers={'Content-Type': 'application/json'})
     
-        msg, _ = check_response(response, self.mode)
+        msg, _ = check_response(response, self.mode, self.metrics)
 
         return msg
     
 
+    @instrumented
     def stop(self) -> str:
         """
         Stops the robot
@@ -288,49 +1014,94 @@ class Robot:
         Returns:
             str: A message indicating the result of the operation.
         """
-        response = requests.put(self.robot_url + "/state/stop")
+        self.invalidate_pose()
+        response = self.transport.put("/state/stop")
         
-        msg, _ = check_response(response, self.mode)
+        msg, err = check_response(response, self.mode, self.metrics)
+
+        if not err:
+            self.belt.set_velocity("forward", 0)
 
         return msg
     
 
-    def get_pose(self) -> Pose:
+    def cancel_pending(self) -> None:
+        """
+        Cancels queued belt commands and the rest of running batches (used by the emergency stop, it stops the robot itself)
+        """
+        self.cancelled = time.monotonic()
+        self.invalidate_pose()
+        self.belt.set_velocity("forward", 0)
+
+        executor, self.belt_executor = self.belt_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def remember_pose(self, pose: Pose) -> None:
+        """
+        Stores the pose as the last known pose of the robot
+        """
+        self.motion_time = time.monotonic()
+        self.shadow = (pose.copy(), self.motion_time)
+
+
+    def invalidate_pose(self) -> None:
+        """
+        Forgets the last known pose (e.g. after the robot was moved by hand)
+        """
+        self.motion_time = time.monotonic()
+        self.shadow = None
+
+
+    def recent_sample(self) -> StateSample:
+        """
+        Returns sample of the poller which is recent enough (not older than max_sample_age and taken after the last motion) or None
         """
+        if self.poller is None:
+            return None
+
+        return self.poller.latest(self.max_sample_age, self.motion_time)
+
+
+    @instrumented
+    def get_pose(self, fresh: bool = True) -> Pose:
+        """
+        Args:
+            fresh (bool, optional): If False, the last known pose is returned when it is not older than pose_ttl. Defaults to True.
         Returns:
             Pose: The current pose of the robot.
         """
-        response = requests.get(self.robot_url + "/eef/pose")
+        shadow = self.shadow
+        if not fresh and shadow is not None and time.monotonic() - shadow[1] <= self.pose_ttl:
+            return shadow[0].copy()
+
+        sample = self.recent_sample()
+        if sample is not None:
+            return sample.pose.copy()
 
-        text, err = check_response(response, self.mode)
+        response = self.transport.get("/eef/pose")
+
+        text, err = check_response(response, self.mode, self.metrics)
 
         if err:
+            self.invalidate_pose()
             return text
 
-        tmp = json.loads(text)
+        pose = Pose.from_dict(json.loads(text))
+        self.remember_pose(pose)
 
-        return Pose(
-            Position(
-                tmp['position']['x'], 
-                tmp['position']['y'], 
-                tmp['position']['z']
-            ), 
-            Orientation(
-                tmp['orientation']['w'], 
-                tmp['orientation']['x'], 
-                tmp['orientation']['y'], 
-                tmp['orientation']['z']
-            )
-        )
+        return pose
     
 
+    @instrumented
     def move_to(self, pose: Pose, moveType: str, velocity: int = None, acceleration: int = None, safe: bool = None) -> str:
         """
         Moves the robot to the specified pose with various movement parameters.
 
         Args:
             pose (Pose): The target pose to move the robot to.
-            moveType (str): The type of movement to perform ('JUMP', 'LINEAR', 'JOINS').
+            moveType (str): The type of movement to perform ('JUMP', 'LINEAR', 'JOINTS').
             velocity (int, optional): The velocity of the movement (1-100). Defaults to None.
             acceleration (int, optional): The acceleration of the movement (1-100). Defaults to None.
             safe (bool, optional): A flag to indicate safe movement. Defaults to None.
@@ -345,25 +1116,23 @@ class Robot:
         if type(pose) is not Pose:
             raise ValueError("Pose must be of type Pose")
 
-        full_url = f"{self.robot_url}/eef/pose?moveType={moveType}"
+        path = move_path(moveType, velocity, acceleration, safe)
 
-        if velocity is not None:
-            full_url += f"&velocity={velocity}"
+        # Position is unknown while moving and after a failed move
+        self.invalidate_pose()
 
-        if acceleration is not None:
-            full_url += f"&acceleration={acceleration}"
+        response = self.transport.put(path, data=pose.to_json(), headers={'Content-Type': 'application/json'})
 
-        if safe is not None:
-            full_url += f"&safe={safe}"
 
-        response = requests.put(full_url, json=pose.to_dict(), headers={'Content-Type': 'application/json'})
+        msg, err = check_response(response, self.mode, self.metrics)
 
-
-        msg, _ = check_response(response, self.mode)
+        if not err:
+            self.remember_pose(pose)
 
         return msg
 
 
+    @instrumented
     def home(self) -> str:
         """
         Calibrates the robot and moves to the home position
@@ -371,13 +1140,15 @@ class Robot:
         Returns:
             str: A message indicating the result of the operation.
         """
-        response = requests.put(self.robot_url + "/home", headers={'accept': '*/*'})
+        self.invalidate_pose()
+        response = self.transport.put("/home", headers={'accept': '*/*'})
 
-        msg, _ = check_response(response, self.mode)
+        msg, _ = check_response(response, self.mode, self.metrics)
 
         return msg
 
 
+    @instrumented
     def suck(self) -> str:
         """
         Turn on the vacuum. (Holds an object)
@@ -385,13 +1156,14 @@ class Robot:
         returns:
             str: A message indicating the result of the operation.
         """
-        response = requests.put(self.robot_url + "/suck", headers={'accept': '*/*'})
+        response = self.transport.put("/suck", headers={'accept': '*/*'})
 
-        msg, _ = check_response(response, self.mode)
+        msg, _ = check_response(response, self.mode, self.metrics)
 
         return msg
 
 
+    @instrumented
     def release(self) -> str:
         """
         Turn off the vacuum. (Releases an object)
@@ -399,13 +1171,14 @@ class Robot:
         Returns: 
             str: A message indicating the result of the operation.
         """
-        response = requests.put(self.robot_url + "/release", headers={'accept': '*/*'})
+        response = self.transport.put("/release", headers={'accept': '*/*'})
 
-        msg, _ = check_response(response, self.mode)
+        msg, _ = check_response(response, self.mode, self.metrics)
 
         return msg
    
 
+    @instrumented
     def belt_speed(self, direction: str, velocity: int) -> str: 
         """
         Starts the conveyor belt with the given velocity and direction
@@ -418,19 +1191,24 @@ class Robot:
             str: A message indicating the result of the operation.
         """
 
-        full_url = f"{self.robot_url}/conveyor/speed?velocity={velocity}&direction={direction}"
+        path = f"/conveyor/speed?velocity={velocity}&direction={direction}"
+
+        response = self.transport.put(path, headers={'accept': '*/*'})
 
-        response = requests.put(full_url, headers={'accept': '*/*'})
+        msg, err = check_response(response, self.mode, self.metrics)
 
-        msg, _ = check_response(response, self.mode)
+        if not err:
+            self.belt.set_velocity(direction, velocity)
 
         return msg
 
 
+    @instrumented
     def belt_distance(self, direction: str, velocity: int, distance: float) -> str:
         """
         Parameters: self, direction (forward, backwards), velocity(int 1 - 50), distance (float in meters)
         Moves the conveyor belt with the given velocity, direction and distance
+        The controller answers after the travel ends, the belt odometer runs with the belt until then.
 
         Args:
             direction (str): The direction of the conveyor belt ('forward', 'backwards').
@@ -445,15 +1223,88 @@ class Robot:
         if direction != "forward" and direction != "backwards":
             return ("Direction must be either 'forward' or 'backwards'")
 
-        full_url = f"{self.robot_url}/conveyor/distance?velocity={velocity}&direction={direction}&distance={distance}"
+        path = f"/conveyor/distance?velocity={velocity}&direction={direction}&distance={distance}"
+
+        self.belt.set_velocity(direction, velocity)
+        try:
+            response = self.transport.put(path, headers={'accept': '*/*'})
+            msg, err = check_response(response, self.mode, self.metrics)
 
-        response = requests.put(full_url, headers={'accept': '*/*'})
+        except Exception:
+            self.belt.set_velocity("forward", 0)
+            raise
 
-        msg, _ = check_response(response, self.mode)
+        if err:
+            self.belt.set_velocity("forward", 0)
+        else:
+            self.belt.moved(direction, distance)
 
         return msg
 
 
+    @instrumented
+    def belt_stop(self) -> str:
+        """
+        Stops the conveyor belt
+
+        The controller has no belt-only stop (belt velocity must be 1-50), so /state/stop is sent and it stops the arm too.
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        self.invalidate_pose()
+        response = self.transport.put("/state/stop", headers={'accept': '*/*'})
+
+        msg, err = check_response(response, self.mode, self.metrics)
+
+        if err:
+            return f"{msg} Belt was not stopped."
+
+        self.belt.set_velocity("forward", 0)
+
+        return msg
+
+
+    def _belt_submit(self, func, *args) -> concurrent.futures.Future:
+        if self.belt_executor is None:
+            # one worker keeps belt commands in order
+            self.belt_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="RobotBelt")
+
+        return self.belt_executor.submit(func, *args)
+
+
+    def belt_speed_nowait(self, direction: str, velocity: int) -> BeltHandle:
+        """
+        Starts the conveyor belt like belt_speed, but does not wait for the robot.
+        The handle is done when the belt runs, handle.cancel() stops it.
+
+        Args:
+            direction (str): The direction of the conveyor belt ('forward', 'backwards').
+            velocity (int): The velocity of the conveyor belt (1-50).
+
+        Returns:
+            BeltHandle: Handle with done(), wait() and cancel().
+        """
+        return BeltHandle(self, self._belt_submit(self.belt_speed, direction, velocity))
+
+
+    def belt_distance_nowait(self, direction: str, velocity: int, distance: float) -> BeltHandle:
+        """
+        Moves the conveyor belt like belt_distance, but does not wait for the robot.
+        Arm can be used while the belt moves, handle.wait() waits until the belt move is done.
+
+        Args:
+            direction (str): The direction of the conveyor belt ('forward', 'backwards').
+            velocity (int): The velocity of the conveyor belt (1-50).
+            distance (float): The distance to move the conveyor belt in meters.
+
+        Returns:
+            BeltHandle: Handle with done(), wait() and cancel().
+        """
+        return BeltHandle(self, self._belt_submit(self.belt_distance, direction, velocity, distance))
+
+
+    @instrumented
     def get_joins(self) -> list[float]:
         """
         Args:
@@ -461,9 +1312,13 @@ class Robot:
         Returns:
             list[float]: The current joins of the robot.
         """
-        response = requests.get(self.robot_url + "/joints") 
+        sample = self.recent_sample()
+        if sample is not None:
+            return copy.deepcopy(sample.joints)
 
-        msg, err = check_response(response, Mode.DEFAULT)
+        response = self.transport.get("/joints") 
+
+        msg, err = check_response(response, Mode.DEFAULT, self.metrics)
 
         if err:
             return msg
@@ -471,6 +1326,7 @@ class Robot:
         return json.loads(msg)
     
 
+    @instrumented
     def calculate_ik(self, pose: Pose = None) -> list[float]:
         """
         Better get_joins, returns None if IK is not possible
@@ -483,15 +1339,27 @@ class Robot:
         if pose is None:
             pose = self.get_pose()
         
+        if self.ik_mode != "remote":
+            values = self.kinematics.ik_pose(pose)
+            if self.ik_mode == "local" or values is None:
+                return values
+        
+        hit, values = self.ik_cache.get(pose)
+        if hit:
+            return values
+        
+        if self.reachability is not None and self.reachability.rejects(pose):
+            return None
         
-        data = json.dumps(pose.to_dict())
+        data = pose.to_json()
 
-        response = requests.put(self.robot_url + "/ik", data=data, headers={'Content-Type': 'application/json'})
+        response = self.transport.put("/ik", data=data, headers={'Content-Type': 'application/json'})
 
-        msg, err = check_response(response, Mode.ASSISTANT)
+        msg, err = check_response(response, Mode.ASSISTANT, self.metrics)
 
         if err:
             if "Failed to compute IK." in msg:
+                self.ik_cache.put(pose, None)
                 return None
             
             raise Exception(f"Robot is not running as expected. Error: {msg['message']}")
@@ -502,9 +1370,149 @@ class Robot:
         for joint in data:
             values.append(joint["value"])
 
+        self.ik_cache.put(pose, values)
+
         return values
 
 
+    @contextmanager
+    def batch(self, progress=None, check_reachable: bool = True):
+        """
+        Collects move_to, suck, release and belt_* commands and sends them together at the end of the block.
+        Results are stored in batch.results (one per command), batch.ok is False if a command failed (batch.failed_index).
+
+        Args:
+            progress (callable, optional): Called as progress(index, total, result) after each sent command.
+            check_reachable (bool, optional): Check reachability of all move_to targets before sending. Defaults to True.
+
+        Example:
+            with r.batch() as b:
+                b.move_to(pose, "JUMP")
+                b.suck()
+        """
+        batch = CommandBatch(self, progress, check_reachable)
+        yield batch
+        batch.send()
+
+
+    @instrumented
+    def check_reachable_many(self, poses: list[Pose], max_workers: int = 8) -> dict[int, list[float]]:
+        """
+        Checks IK of many poses at once (requests run concurrently, each distinct pose is sent only once)
+
+        Args:
+            poses (list[Pose]): The poses to check.
+            max_workers (int, optional): Maximum number of requests running at the same time. Defaults to 8.
+        Returns:
+            dict[int, list[float]]: Index of the pose -> calculated joins (None if the pose is not reachable).
+        """
+        for pose in poses:
+            if type(pose) is not Pose:
+                raise ValueError("Pose must be of type Pose")
+
+        if self.ik_mode == "local":
+            array = PoseArray.from_poses(poses)
+            joints, ok = self.kinematics.ik_many(array.positions, array.orientations)
+            return {i: joints[i].tolist() if ok[i] else None for i in range(len(poses))}
+
+        # Poses which are the same for the IK cache are calculated only once
+        unique: dict[tuple, Pose] = {}
+        for pose in poses:
+            unique.setdefault(self.ik_cache.key(pose), pose)
+
+        if len(unique) <= 1:
+            results = {key: self.calculate_ik(pose) for key, pose in unique.items()}
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+                futures = {key: executor.submit(self.calculate_ik, pose) for key, pose in unique.items()}
+                results = {key: future.result() for key, future in futures.items()}
+
+        return {i: results[self.ik_cache.key(pose)] for i, pose in enumerate(poses)}
+
+
+    @staticmethod
+    def simplify_path(poses: list[Pose], drop_collinear: bool = True, tolerance: float = 1e-4) -> list[int]:
+        """
+        Returns indices of waypoints left after dropping duplicate and (optionally) collinear waypoints
+
+        Args:
+            poses (list[Pose]): The waypoints.
+            drop_collinear (bool, optional): Drop waypoints lying on a straight line between their neighbours (with the same orientation). Defaults to True.
+            tolerance (float, optional): Distance in meters under which points are the same or on the line. Defaults to 1e-4.
+        """
+        if not poses:
+            return []
+
+        path = PoseArray.from_poses(poses)
+        kept = [0]
+
+        for i in range(1, len(path)):
+            prev = kept[-1]
+            if np.linalg.norm(path.positions[i] - path.positions[prev]) <= tolerance and \
+                    np.allclose(path.orientations[i], path.orientations[prev], atol=tolerance):
+                continue
+
+            # kept[-1] is dropped when it lies on the segment between kept[-2] and i
+            if drop_collinear and len(kept) > 1:
+                a = path.positions[kept[-2]]
+                b = path.positions[prev]
+                c = path.positions[i]
+                ac = c - a
+                length = np.linalg.norm(ac)
+                same_ori = np.allclose(path.orientations[kept[-2]], path.orientations[prev], atol=tolerance) and \
+                    np.allclose(path.orientations[prev], path.orientations[i], atol=tolerance)
+
+                if same_ori and length > 0 and np.linalg.norm(np.cross(b - a, ac)) / length <= tolerance and \
+                        0 <= np.dot(b - a, ac) <= length ** 2:
+                    kept.pop()
+
+            kept.append(i)
+
+        return kept
+
+
+    @instrumented
+    def follow_path(self, poses: list[Pose], moveType: str, velocity: int = None, acceleration: int = None, progress=None) -> str:
+        """
+        Moves the robot through the waypoints one right after another.
+        Checks reachability of the whole path first and drops duplicate waypoints (and collinear ones for LINEAR moves).
+
+        Args:
+            poses (list[Pose]): The waypoints.
+            moveType (str): The type of movement to perform ('JUMP', 'LINEAR', 'JOINTS').
+            velocity (int, optional): The velocity of the movement (1-100). Defaults to None.
+            acceleration (int, optional): The acceleration of the movement (1-100). Defaults to None.
+            progress (callable, optional): Called as progress(index, total, result) after each move.
+
+        Raises:
+            ValueError: If any waypoint is not of type Pose or is not reachable.
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        for pose in poses:
+            if type(pose) is not Pose:
+                raise ValueError("Pose must be of type Pose")
+
+        # Only LINEAR moves go straight, other move types can't skip points on a line
+        kept = self.simplify_path(poses, drop_collinear=(moveType == "LINEAR"))
+
+        reachable = self.check_reachable_many([poses[i] for i in kept])
+        unreachable = [kept[i] for i, joints in reachable.items() if joints is None]
+        if unreachable:
+            raise ValueError(f"Waypoints {unreachable} are not reachable")
+
+        with self.batch(progress) as batch:
+            for i in kept:
+                batch.move_to(poses[i], moveType, velocity, acceleration)
+
+        if not batch.ok:
+            return batch.results[-1]
+
+        return f"Success! Moved through {len(kept)} waypoints ({len(poses) - len(kept)} skipped)."
+
+
+    @instrumented
     def move_object(self, src_pose: Pose, dst_pose: Pose, velocity: int = 100, rtrn_to_origin: bool = False) -> str:
         """
         Moves an object from one pose to another
@@ -520,9 +1528,9 @@ class Robot:
         Returns:
             str: A message indicating the result of the operation.
         """
-        origin = self.get_pose()
+        origin = self.get_pose(fresh=False)
         
-        if self.calculate_ik(src_pose) is None or self.calculate_ik(dst_pose) is None:
+        if None in self.check_reachable_many([src_pose, dst_pose]).values():
             raise ValueError("Invalid poses")
                 
         self.move_to(src_pose, "LINEAR", velocity)
@@ -535,6 +1543,34 @@ class Robot:
         return "Success!"
     
 
+    @instrumented
+    def pick_and_place(self, jobs: list[tuple[Pose, Pose]], velocity: int = 100, safe_z: float = None, progress=None) -> str:
+        """
+        Moves many objects (picks each at its source pose and releases it at its destination pose).
+        Jobs are reordered so that the arm travels as little as possible between them, jobs with unreachable poses are skipped.
+
+        Args:
+            jobs (list[tuple[Pose, Pose]]): Pairs (source pose, destination pose) of the objects.
+            velocity (int, optional): The velocity of the movement (1-100). Defaults to 100.
+            safe_z (float, optional): Height in meters for moves between poses (straight up, across and down). Defaults to None (JUMP moves).
+            progress (callable, optional): Called as progress(index, total, result) after each command.
+
+        Raises:
+            ValueError: If any pose is not of type Pose or the pose of the robot can't be read.
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        for job in jobs:
+            if len(job) != 2 or type(job[0]) is not Pose or type(job[1]) is not Pose:
+                raise ValueError("Every job must be a pair of poses (source, destination)")
+
+        plan = pp.plan_jobs(self, jobs, safe_z=safe_z)
+
+        return plan.execute(self, velocity, safe_z=safe_z, progress=progress)
+
+
+    @instrumented
     def rotate_arm_degrees(self, angle_deg: float, velocity: int = 100, maintain_ori: bool = False) -> str:
         """
         Rotates the arm to the specified angle (z-axis rotation)
@@ -547,13 +1583,13 @@ class Robot:
         Returns:
             str: A message indicating the result of the operation.
         """
-        pose = self.get_pose()
+        pose = self.get_pose(fresh=False)
         
-        pose.position.rotate(angle_deg, "z")
+        pose.position = pose.position.rotate(angle_deg, "z")
         
         
         if not maintain_ori or self.calculate_ik(pose) is None:
-            pose.orientation.rotate(angle_deg, "z")
+            pose.orientation = pose.orientation.rotate(angle_deg, "z")
         
         return self.move_to(pose, "LINEAR", velocity)
 
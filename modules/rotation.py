@@ -0,0 +1,110 @@
+"""
+Fast rotations around x, y and z axes used by Position.rotate and Orientation.rotate.
+Quaternions are tuples (w, x, y, z), sin and cos of every angle are computed only once.
+"""
+import functools
+import math
+
+AXES = ("x", "y", "z")
+IDENTITY = (1.0, 0.0, 0.0, 0.0)
+
+
+@functools.lru_cache(maxsize=4096)
+def trig(angle_deg: float) -> tuple[float, float]:
+    """
+    Returns (cos, sin) of the angle in degrees
+    """
+    rad = math.radians(angle_deg)
+
+    return math.cos(rad), math.sin(rad)
+
+
+@functools.lru_cache(maxsize=4096)
+def axis_quaternion(angle_deg: float, axis: str) -> tuple[float, float, float, float]:
+    """
+    Returns quaternion of rotation by angle in degrees around the axis ('x', 'y', 'z')
+
+    Raises:
+        ValueError: If the axis is invalid.
+    """
+    if axis not in AXES:
+        raise ValueError("Axis must be 'x', 'y', or 'z'")
+
+    cos, sin = trig(angle_deg / 2)
+
+    if axis == "x":
+        return (cos, sin, 0.0, 0.0)
+    if axis == "y":
+        return (cos, 0.0, sin, 0.0)
+
+    return (cos, 0.0, 0.0, sin)
+
+
+def multiply(q1: tuple, q2: tuple) -> tuple[float, float, float, float]:
+    """
+    Hamilton product q1 * q2
+    """
+    w1, x1, y1, z1 = q1
+    w2, x2, y2, z2 = q2
+
+    return (
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    )
+
+
+def rotate_vector(q: tuple, x: float, y: float, z: float) -> tuple[float, float, float]:
+    """
+    Rotates vector by unit quaternion (q * v * q^-1)
+    """
+    w, qx, qy, qz = q
+
+    # t = 2 * cross(q.xyz, v), v' = v + w * t + cross(q.xyz, t)
+    tx = 2 * (qy * z - qz * y)
+    ty = 2 * (qz * x - qx * z)
+    tz = 2 * (qx * y - qy * x)
+
+    return (
+        x + w * tx + qy * tz - qz * ty,
+        y + w * ty + qz * tx - qx * tz,
+        z + w * tz + qx * ty - qy * tx,
+    )
+
+
+class RotationAccumulator:
+    """
+    Composes several rotations and applies them at once.
+    Positions are rotated the same way as Position.rotate (which turns the y axis the opposite way than orientations).
+
+    Example:
+        acc = RotationAccumulator().rotate(90, "z").rotate(10, "x")
+        pose = Pose(acc.apply_position(pose.position), acc.apply_orientation(pose.orientation))
+    """
+    __slots__ = ("orientation_q", "position_q")
+
+    def __init__(self):
+        self.orientation_q = IDENTITY
+        self.position_q = IDENTITY
+
+    def rotate(self, angle_deg: float, axis: str) -> 'RotationAccumulator':
+        """
+        Adds rotation applied after the rotations added before
+        """
+        self.orientation_q = multiply(axis_quaternion(angle_deg, axis), self.orientation_q)
+        self.position_q = multiply(axis_quaternion(-angle_deg if axis == "y" else angle_deg, axis), self.position_q)
+
+        return self
+
+    def apply_position(self, position):
+        """
+        Returns new Position rotated by all added rotations
+        """
+        return type(position)(*rotate_vector(self.position_q, position.x, position.y, position.z))
+
+    def apply_orientation(self, orientation):
+        """
+        Returns new Orientation rotated by all added rotations
+        """
+        return type(orientation)(*multiply(self.orientation_q, (orientation.w, orientation.x, orientation.y, orientation.z)))
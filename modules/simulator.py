@@ -0,0 +1,315 @@
+"""
+Local simulator of the robot controller REST API (arm + conveyor belt).
+Used for benchmarks and testing without the real robot.
+
+Usage:
+    python -m modules.simulator --port 5018 --latency 0.005 --failure-rate 0.01
+    then set ROBOT_URL=http://localhost:5018 in .env file
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from collections import Counter
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import modules.kinematics as kin
+
+MAX_SPEED = 0.3             # m/s of the arm at velocity 100
+MAX_ACCELERATION = 1.0      # m/s^2 of the arm at acceleration 100
+JUMP_HEIGHT = 0.05          # m, how high JUMP moves lift the arm
+SETTLE_TIME = 0.05          # s, added to every move
+BELT_SPEED_PER_UNIT = 0.002 # m/s of the belt per unit of velocity (1-50)
+
+HOME_POSE = {
+    "position": {"x": 0.2, "y": 0.0, "z": 0.05},
+    "orientation": {"w": 0.0, "x": 0.0, "y": 1.0, "z": 0.0},
+}
+
+
+def motion_time(distance: float, velocity: float, acceleration: float) -> float:
+    """
+    Returns duration of a move with trapezoidal velocity profile
+
+    Args:
+        distance (float): Length of the move in meters.
+        velocity (float): Velocity in percentage (1-100).
+        acceleration (float): Acceleration in percentage (1-100).
+    """
+    v = MAX_SPEED * velocity / 100
+    a = MAX_ACCELERATION * acceleration / 100
+
+    if distance <= v * v / a:
+        return 2 * math.sqrt(distance / a)
+
+    return distance / v + v / a
+
+
+class Simulator:
+    """
+    HTTP server implementing the endpoints used by modules.robot.Robot
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, failure_rate: float = 0.0,
+                 time_scale: float = 1.0, model: kin.ArmModel = None, seed: int = None):
+        """
+        Args:
+            host (str, optional): Address to listen on.
+            port (int, optional): Port to listen on (0 = any free port).
+            latency (float, optional): Seconds added to every request (network latency).
+            failure_rate (float, optional): Probability (0-1) that a request fails with status 500.
+            time_scale (float, optional): Multiplier of simulated motion durations (0 = moves are instant).
+            model (ArmModel, optional): Kinematic model used for IK. Defaults to model shared with Robot (ROBOT_KINEMATICS).
+            seed (int, optional): Seed of the failure injection.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.time_scale = time_scale
+        self.model = model if model is not None else kin.get_default_model()
+        self.random = random.Random(seed)
+
+        self.started = True
+        self.pose = json.loads(json.dumps(HOME_POSE))
+        self.joints = self.model.ik(self.pose)
+        self.suction = False
+        self.belt_velocity = 0.0    # m/s, negative = backwards
+        self.belt_position = 0.0    # m
+        self.belt_time = time.monotonic()
+        self.belt_command = 0       # incremented by every belt command, interrupts running belt_distance
+
+        self.requests = Counter()   # "METHOD /path" -> number of requests
+        self.lock = threading.Lock()
+        self.arm_lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        """
+        Starts the server in a background thread and returns its url
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="Simulator")
+        self.thread.start()
+
+        return self.url
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _update_belt(self) -> None:
+        now = time.monotonic()
+        self.belt_position += self.belt_velocity * (now - self.belt_time)
+        self.belt_time = now
+
+    def handle(self, method: str, path: str, query: dict, body: str) -> tuple[int, str]:
+        """
+        Handles one request and returns (status code, body)
+        """
+        with self.lock:
+            self.requests[f"{method} {path}"] += 1
+
+        # network latency is not affected by time_scale
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if self.failure_rate > 0 and self.random.random() < self.failure_rate:
+            return 500, json.dumps({"message": "Injected failure."})
+
+        route = (method, path)
+
+        if route == ("GET", "/state/started"):
+            return 200, "true\n" if self.started else "false\n"
+
+        if route == ("PUT", "/state/start"):
+            self.started = True
+            return 200, ""
+
+        if route == ("PUT", "/state/stop"):
+            with self.lock:
+                self.started = False
+                self.suction = False
+                self._update_belt()
+                self.belt_velocity = 0.0
+                self.belt_command += 1
+            return 200, ""
+
+        if route == ("GET", "/eef/pose"):
+            return 200, json.dumps(self.pose)
+
+        if route == ("GET", "/joints"):
+            return 200, json.dumps([{"name": f"magician_joint_{i + 1}", "value": v} for i, v in enumerate(self.joints)])
+
+        if route == ("PUT", "/ik"):
+            joints = self.model.ik(json.loads(body))
+            if joints is None:
+                return 500, json.dumps({"message": "Failed to compute IK."})
+
+            return 200, json.dumps([{"name": f"magician_joint_{i + 1}", "value": v} for i, v in enumerate(joints)])
+
+        if not self.started:
+            return 400, json.dumps({"message": "Robot is not started."})
+
+        if route == ("PUT", "/eef/pose"):
+            return self._move(json.loads(body), query)
+
+        if route == ("PUT", "/home"):
+            with self.arm_lock:
+                self._sleep(2.0)
+                self.pose = json.loads(json.dumps(HOME_POSE))
+                self.joints = self.model.ik(self.pose)
+            return 200, ""
+
+        if route == ("PUT", "/suck"):
+            self.suction = True
+            return 200, ""
+
+        if route == ("PUT", "/release"):
+            self.suction = False
+            return 200, ""
+
+        if route in (("PUT", "/conveyor/speed"), ("PUT", "/conveyor/distance")):
+            return self._belt(path, query)
+
+        return 404, json.dumps({"message": f"Unknown endpoint {method} {path}"})
+
+    def _move(self, target: dict, query: dict) -> tuple[int, str]:
+        move_type = query.get("moveType", "JUMP")
+        if move_type not in ("JUMP", "LINEAR", "JOINTS"):
+            return 400, json.dumps({"message": f"Invalid moveType {move_type}."})
+
+        joints = self.model.ik(target)
+        if joints is None:
+            return 500, json.dumps({"message": "Failed to compute IK."})
+
+        velocity = float(query.get("velocity", 50))
+        acceleration = float(query.get("acceleration", 50))
+
+        with self.arm_lock:
+            a = self.pose["position"]
+            b = target["position"]
+            distance = math.dist((a["x"], a["y"], a["z"]), (b["x"], b["y"], b["z"]))
+
+            if move_type == "JUMP":
+                # up, across and down
+                duration = 2 * motion_time(JUMP_HEIGHT, velocity, acceleration) + motion_time(distance, velocity, acceleration)
+            elif move_type == "JOINTS":
+                # joint moves take shorter time than straight line (approximation)
+                duration = motion_time(0.8 * distance, velocity, acceleration)
+            else:
+                duration = motion_time(distance, velocity, acceleration)
+
+            self._sleep(duration + SETTLE_TIME)
+            self.pose = target
+            self.joints = joints
+
+        return 200, ""
+
+    def _belt(self, path: str, query: dict) -> tuple[int, str]:
+        direction = query.get("direction", "forward")
+        if direction not in ("forward", "backwards"):
+            return 400, json.dumps({"message": f"Invalid direction {direction}."})
+
+        velocity = float(query.get("velocity", 0))
+        sign = 1 if direction == "forward" else -1
+
+        if path == "/conveyor/speed":
+            with self.lock:
+                self._update_belt()
+                self.belt_velocity = sign * velocity * BELT_SPEED_PER_UNIT
+                self.belt_command += 1
+            return 200, ""
+
+        distance = float(query.get("distance", 0))
+        if velocity <= 0:
+            return 400, json.dumps({"message": "Velocity must be positive."})
+
+        with self.lock:
+            self.belt_command += 1
+            command = self.belt_command
+            start = self.belt_position
+
+        # sleeps in small steps so the move can be interrupted by another belt command or stop
+        end = time.monotonic() + (distance / (velocity * BELT_SPEED_PER_UNIT)) * self.time_scale
+        while time.monotonic() < end and self.belt_command == command:
+            time.sleep(min(0.01, max(0.0, end - time.monotonic())))
+
+        with self.lock:
+            if self.belt_command == command:
+                self.belt_position = start + sign * distance
+                self.belt_time = time.monotonic()
+
+        return 200, ""
+
+    def _handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+            wbufsize = -1                   # headers and body in one packet (avoids Nagle + delayed ACK stalls)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8") if length else ""
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+                try:
+                    status, text = simulator.handle(method, url.path, query, body)
+                except (ValueError, KeyError, TypeError) as e:
+                    status, text = 400, json.dumps({"message": f"Invalid request: {e}"})
+
+                data = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local simulator of the robot controller")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5018)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability (0-1) of a failed request")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplier of motion durations (0 = instant)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = Simulator(args.host, args.port, args.latency, args.failure_rate, args.time_scale, seed=args.seed)
+    print(f"Simulator running on {simulator.url}")
+
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
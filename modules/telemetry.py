@@ -0,0 +1,474 @@
+"""
+Append-only telemetry of the robot stored in fixed-width memory-mapped column files.
+Records every request sent through the Transport of a Robot (commands) and every sample of the StatePoller (samples).
+Columns are read back as NumPy arrays without parsing.
+
+Every recording process writes its own segment of files (no locking between processes, e.g. warm workers),
+the log merges the segments by time.
+
+Layout of the directory:
+    meta.json                           schema and fixed table of endpoints
+    commands.<segment>.count            number of rows (8 bytes, updated on every append)
+    commands.<segment>.<column>.bin     one raw file per column
+"""
+from dotenv import load_dotenv
+import glob
+import json
+import os
+import threading
+import time
+import numpy as np
+
+load_dotenv()
+TELEMETRY_PATH = os.getenv('ROBOT_TELEMETRY')      # directory of the telemetry (None = not recorded)
+
+CHUNK = 16384       # rows added to the files when they are full
+DECIMALS = 6        # floats of recorded JSON bodies are rounded to micrometers
+
+# fixed table of endpoints, the index is stored in the "endpoint" column (same meaning in every process)
+ENDPOINTS = (
+    "GET /state/started", "PUT /state/start", "PUT /state/stop",
+    "GET /eef/pose", "PUT /eef/pose", "PUT /home", "GET /joints", "PUT /ik",
+    "PUT /suck", "PUT /release", "PUT /conveyor/speed", "PUT /conveyor/distance",
+    # any other endpoint, its path is in the "path" column
+    "GET ?", "PUT ?", "POST ?", "DELETE ?",
+)
+ENDPOINT_INDEX = {name: i for i, name in enumerate(ENDPOINTS)}
+
+# name -> (dtype, shape of one value)
+COMMANDS = {
+    "time": ("<f8", ()),                # time.time() when the request was sent
+    "endpoint": ("<u2", ()),            # index to ENDPOINTS ("METHOD /path")
+    "status": ("<i2", ()),              # HTTP status, 0 = no response
+    "seconds": ("<f4", ()),             # latency
+    "bytes_sent": ("<u4", ()),
+    "bytes_received": ("<u4", ()),
+    "retries": ("u1", ()),
+    "truncated": ("?", ()),             # path or body did not fit (request can't be replayed)
+    "path": ("S96", ()),                # including query string
+    "body": ("S256", ()),               # compact JSON with rounded floats
+    "result": ("S64", ()),              # beginning of the response
+}
+SAMPLES = {
+    "time": ("<f8", ()),                # time.time() when the polling started
+    "pose": ("<f8", (7,)),              # x, y, z, w, qx, qy, qz
+    "joints": ("<f8", (5,)),
+    "started": ("?", ()),
+}
+STREAMS = {"commands": COMMANDS, "samples": SAMPLES}
+
+
+class ColumnStore:
+    """
+    Rows of one segment of a stream stored column by column in memory-mapped files (written by one process only)
+    """
+    def __init__(self, directory: str, name: str, columns: dict, writable: bool = False):
+        """
+        Args:
+            directory (str): Directory of the telemetry.
+            name (str): Name of the stream and the segment ('commands.<segment>').
+            columns (dict): Column name -> (dtype, shape of one value).
+            writable (bool, optional): Open for appending. Defaults to False (read only).
+        """
+        self.directory = directory
+        self.name = name
+        self.columns = columns
+        self.writable = writable
+        self.lock = threading.Lock()
+        self.maps: dict[str, np.memmap] = {}
+
+        count_path = os.path.join(directory, f"{name}.count")
+        if writable and not os.path.exists(count_path):
+            with open(count_path, 'wb') as file:
+                file.write(bytes(8))
+
+        self.counter = np.memmap(count_path, dtype="<u8", mode="r+" if writable else "r", shape=(1,))
+        self.capacity = 0
+        self._map(max(int(self.counter[0]), 1) if not writable else int(self.counter[0]) + CHUNK)
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.directory, f"{self.name}.{column}.bin")
+
+    def _map(self, capacity: int) -> None:
+        """
+        Maps all columns with room for capacity rows (files are extended when writable)
+        """
+        for column, (dtype, shape) in self.columns.items():
+            path = self._path(column)
+            row_size = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+
+            if self.writable:
+                with open(path, 'ab') as file:
+                    if file.tell() < capacity * row_size:
+                        file.truncate(capacity * row_size)
+            elif not os.path.exists(path) or os.path.getsize(path) < row_size:
+                self.maps[column] = np.zeros((0, *shape), dtype=dtype)
+                continue
+            else:
+                capacity = min(capacity, os.path.getsize(path) // row_size)
+
+            self.maps[column] = np.memmap(path, dtype=dtype, mode="r+" if self.writable else "r", shape=(capacity, *shape))
+
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return int(self.counter[0])
+
+    def append(self, row: dict) -> None:
+        """
+        Appends one row (missing columns are zero)
+        """
+        with self.lock:
+            index = int(self.counter[0])
+
+            if index >= self.capacity:
+                self.flush()
+                self._map(self.capacity + max(CHUNK, self.capacity // 2))
+
+            for column, value in row.items():
+                self.maps[column][index] = value
+
+            # count is written last, readers never see half written row
+            self.counter[0] = index + 1
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """
+        Returns all columns as arrays (views of the files) with the current number of rows
+        """
+        count = len(self)
+        if count > self.capacity:
+            self._map(count)
+
+        return {column: values[:count] for column, values in self.maps.items()}
+
+    def flush(self) -> None:
+        for values in self.maps.values():
+            if isinstance(values, np.memmap):
+                values.flush()
+        self.counter.flush()
+
+
+def _text(value: str, width: int) -> tuple[bytes, bool]:
+    data = (value or "").encode("utf-8")
+
+    return data[:width], len(data) > width
+
+
+def _round(value):
+    if isinstance(value, float):
+        return round(value, DECIMALS)
+
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+
+    if isinstance(value, list):
+        return [_round(item) for item in value]
+
+    return value
+
+
+def compact_body(body: str) -> str:
+    """
+    Returns JSON body without spaces and with floats rounded to DECIMALS (other bodies are returned unchanged)
+    """
+    if not body:
+        return body
+
+    try:
+        return json.dumps(_round(json.loads(body)), separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+def endpoint_index(name: str) -> int:
+    """
+    Returns index of the endpoint ('PUT /eef/pose') in ENDPOINTS ('<METHOD> ?' for unknown endpoints)
+    """
+    index = ENDPOINT_INDEX.get(name)
+    if index is None:
+        index = ENDPOINT_INDEX.get(name.split(" ", 1)[0] + " ?", ENDPOINT_INDEX["GET ?"])
+
+    return index
+
+
+def segments(directory: str, stream: str) -> list[str]:
+    """
+    Returns names of all segments of the stream in the directory
+    """
+    paths = glob.glob(os.path.join(glob.escape(directory), f"{stream}.*.count"))
+
+    return sorted(os.path.basename(path)[len(stream) + 1:-len(".count")] for path in paths)
+
+
+class TelemetryRecorder:
+    """
+    Records requests of robots (transport observer) and samples of the state poller (poller listener)
+
+    Example:
+        recorder = TelemetryRecorder("telemetry/shift_1")
+        recorder.attach(robot)
+    """
+    def __init__(self, directory: str, methods: tuple[str, ...] = None):
+        """
+        Args:
+            directory (str): Directory of the telemetry (created if it does not exist, existing telemetry is appended to).
+            methods (tuple[str, ...], optional): Record only requests with these methods (e.g. ('PUT',) for commands only). Defaults to all.
+        """
+        self.directory = directory
+        self.methods = methods
+        self.segment = f"{os.getpid()}-{time.time_ns()}"      # unique for this recorder, other processes use their own
+        self.meta = {
+            "streams": {name: {column: [dtype, list(shape)] for column, (dtype, shape) in columns.items()}
+                        for name, columns in STREAMS.items()},
+            "endpoints": list(ENDPOINTS),
+        }
+
+        # files of a stream are created by its first row, so processes which record nothing (e.g. idle workers) leave none
+        self.stores: dict[str, ColumnStore] = {}
+        self.lock = threading.Lock()
+
+    def _store(self, stream: str) -> ColumnStore:
+        store = self.stores.get(stream)
+        if store is not None:
+            return store
+
+        with self.lock:
+            if not self.stores:
+                self._write_meta()
+
+            if stream not in self.stores:
+                self.stores[stream] = ColumnStore(self.directory, f"{stream}.{self.segment}", STREAMS[stream], writable=True)
+
+            return self.stores[stream]
+
+    def _write_meta(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        # meta is the same for every process, written to a temporary file and replaced at once
+        meta_path = os.path.join(self.directory, "meta.json")
+        temp_path = f"{meta_path}.{self.segment}"
+        with open(temp_path, 'w', encoding="utf-8") as file:
+            json.dump(self.meta, file, indent=4)
+        os.replace(temp_path, meta_path)
+
+    def attach(self, robot) -> 'TelemetryRecorder':
+        """
+        Starts recording requests of the robot's transport and samples of its poller
+        """
+        robot.transport.add_observer(self.record_request)
+
+        if robot.poller is not None:
+            robot.poller.add_listener(self.record_sample)
+
+        return self
+
+    def detach(self, robot) -> None:
+        robot.transport.remove_observer(self.record_request)
+
+        if robot.poller is not None:
+            robot.poller.listeners = [listener for listener in robot.poller.listeners if listener != self.record_sample]
+
+    def record_request(self, record) -> None:
+        """
+        Transport observer, appends one finished request (modules.transport.RequestRecord)
+        """
+        if self.methods is not None and record.method not in self.methods:
+            return
+
+        path, long_path = _text(record.path, 96)
+        body, long_body = _text(compact_body(record.body), 256)
+        result, _ = _text(record.text, 64)
+
+        self._store("commands").append({
+            "time": record.time,
+            "endpoint": endpoint_index(record.endpoint),
+            "status": record.status,
+            "seconds": record.seconds,
+            "bytes_sent": record.bytes_sent,
+            "bytes_received": record.bytes_received,
+            "retries": min(record.retries, 255),
+            "truncated": long_path or long_body,
+            "path": path,
+            "body": body,
+            "result": result,
+        })
+
+    def record_sample(self, sample) -> None:
+        """
+        Poller listener, appends one polled state (modules.robot.StateSample)
+        """
+        p = sample.pose.position
+        o = sample.pose.orientation
+        joints = [joint["value"] if isinstance(joint, dict) else joint for joint in sample.joints][:5]
+
+        self._store("samples").append({
+            # sample time is time.monotonic()
+            "time": time.time() - (time.monotonic() - sample.time),
+            "pose": (p.x, p.y, p.z, o.w, o.x, o.y, o.z),
+            "joints": joints + [0.0] * (5 - len(joints)),
+            "started": sample.started,
+        })
+
+    def flush(self) -> None:
+        for store in list(self.stores.values()):
+            store.flush()
+
+
+class TelemetryLog:
+    """
+    Read only access to recorded telemetry (can be opened while the recorder still appends)
+
+    Example:
+        log = TelemetryLog("telemetry/shift_1")
+        moves = log.commands(endpoint="PUT /eef/pose")
+        print(moves["seconds"].mean())
+    """
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json"), 'r', encoding="utf-8") as file:
+            self.meta = json.load(file)
+
+        self.directory = directory
+        self.endpoints: list[str] = self.meta["endpoints"]
+
+    def _arrays(self, name: str) -> dict[str, np.ndarray]:
+        """
+        Returns all rows of all segments of the stream ordered by time (segments are looked up again, new processes add them)
+        """
+        parts = [ColumnStore(self.directory, f"{name}.{segment}", STREAMS[name]).arrays() for segment in segments(self.directory, name)]
+        parts = [arrays for arrays in parts if len(arrays["time"])]
+
+        if not parts:
+            return {column: np.zeros((0, *shape), dtype=dtype) for column, (dtype, shape) in STREAMS[name].items()}
+
+        if len(parts) == 1:
+            return parts[0]
+
+        arrays = {column: np.concatenate([part[column] for part in parts]) for column in STREAMS[name]}
+        order = np.argsort(arrays["time"], kind="stable")
+
+        return {column: values[order] for column, values in arrays.items()}
+
+    def _slice(self, name: str, start: float = None, end: float = None) -> dict[str, np.ndarray]:
+        arrays = self._arrays(name)
+        times = arrays["time"]
+
+        # rows of one segment are appended in time order (up to small reordering of concurrent requests)
+        begin = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        stop = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+
+        return {column: values[begin:stop] for column, values in arrays.items()}
+
+    def commands(self, start: float = None, end: float = None, endpoint: str = None) -> dict[str, np.ndarray]:
+        """
+        Returns columns of recorded requests between start and end (time.time()), optionally of one endpoint ('PUT /eef/pose')
+        """
+        arrays = self._slice("commands", start, end)
+
+        if endpoint is not None:
+            if endpoint not in self.endpoints:
+                return {column: values[:0] for column, values in arrays.items()}
+
+            mask = arrays["endpoint"] == self.endpoints.index(endpoint)
+            arrays = {column: values[mask] for column, values in arrays.items()}
+
+        return arrays
+
+    def samples(self, start: float = None, end: float = None) -> dict[str, np.ndarray]:
+        """
+        Returns columns of polled samples between start and end (time.time())
+        """
+        return self._slice("samples", start, end)
+
+    def endpoint_names(self, arrays: dict[str, np.ndarray]) -> list[str]:
+        return [self.endpoints[i] for i in arrays["endpoint"]]
+
+    def summary(self, start: float = None, end: float = None) -> dict[str, dict]:
+        """
+        Returns number of requests, mean and max latency and errors per endpoint
+        """
+        arrays = self.commands(start, end)
+        summary = {}
+
+        for i, name in enumerate(self.endpoints):
+            mask = arrays["endpoint"] == i
+            if not mask.any():
+                continue
+
+            seconds = arrays["seconds"][mask]
+            status = arrays["status"][mask]
+            summary[name] = {
+                "count": int(mask.sum()),
+                "mean_ms": float(1000 * seconds.mean()),
+                "max_ms": float(1000 * seconds.max()),
+                "errors": int(((status == 0) | (status >= 400)).sum()),
+            }
+
+        return summary
+
+    def replay(self, robot=None, speed: float = 1.0, start: float = None, end: float = None, methods: tuple[str, ...] = ("PUT",), callback=None) -> int:
+        """
+        Sends recorded requests again with the original spacing (e.g. to reproduce a cycle on the simulator)
+
+        Args:
+            robot (Robot, optional): Robot to send the requests to. Defaults to None (only callback is called).
+            speed (float, optional): Multiplier of the original pace (0 = as fast as possible). Defaults to 1.0.
+            start (float, optional): Replay requests sent after start (time.time()).
+            end (float, optional): Replay requests sent before end (time.time()).
+            methods (tuple[str, ...], optional): Methods of the replayed requests. Defaults to ('PUT',).
+            callback (callable, optional): Called as callback(endpoint, path, body, response) for every request.
+
+        Returns:
+            int: Number of replayed requests.
+        """
+        arrays = self.commands(start, end)
+        first = None
+        began = time.monotonic()
+        count = 0
+
+        for i in range(len(arrays["time"])):
+            endpoint = self.endpoints[arrays["endpoint"][i]]
+            method = endpoint.split(" ", 1)[0]
+
+            if method not in methods or arrays["truncated"][i]:
+                continue
+
+            first = arrays["time"][i] if first is None else first
+            if speed > 0:
+                delay = (arrays["time"][i] - first) / speed - (time.monotonic() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+            path = arrays["path"][i].decode("utf-8")
+            body = arrays["body"][i].decode("utf-8") or None
+            response = None
+
+            if robot is not None:
+                headers = {'Content-Type': 'application/json'} if body else {'accept': '*/*'}
+                response = robot.transport.request(method, path, data=body, headers=headers)
+
+            if callback is not None:
+                callback(endpoint, path, body, response)
+
+            count += 1
+
+        return count
+
+
+_default_recorder: TelemetryRecorder = None
+_default_recorder_lock = threading.Lock()
+
+
+def get_default_recorder() -> TelemetryRecorder:
+    """
+    Returns recorder writing to ROBOT_TELEMETRY shared by the whole process (None if ROBOT_TELEMETRY is not set)
+    """
+    global _default_recorder
+
+    if TELEMETRY_PATH is None:
+        return None
+
+    with _default_recorder_lock:
+        if _default_recorder is None:
+            _default_recorder = TelemetryRecorder(TELEMETRY_PATH)
+
+        return _default_recorder
@@ -0,0 +1,307 @@
+"""
+Conveyor belt tracking, picking of parts from the running belt.
+Position of the belt is integrated from the commanded belt speed (BeltOdometer of the Robot),
+parts measured at one belt position are projected forward and the arm is sent where the part will be when the arm gets there.
+"""
+from dotenv import load_dotenv
+from collections import deque
+import itertools
+import math
+import os
+import threading
+import time
+
+load_dotenv()
+ARM_SPEED = float(os.getenv('ROBOT_ARM_SPEED', '0.3'))          # m/s of the arm at velocity 100 (for interception)
+PICK_LEAD = float(os.getenv('ROBOT_PICK_LEAD', '0.05'))         # seconds added to every interception (latency, settling)
+BELT_AXIS = (0.0, 1.0, 0.0)                                     # direction of forward belt motion in robot coordinates
+
+
+class BeltOdometer:
+    """
+    Position of the conveyor belt in meters integrated from the commanded speeds (updated by Robot belt methods)
+    """
+    def __init__(self, speed_per_unit: float):
+        """
+        Args:
+            speed_per_unit (float): m/s of the belt per unit of velocity (1-50) of belt commands.
+        """
+        self.speed_per_unit = speed_per_unit
+        self.lock = threading.Lock()
+        self.position = 0.0         # m at self.time
+        self.speed = 0.0            # m/s since self.time, negative = backwards
+        self.time = time.monotonic()
+
+    def set_velocity(self, direction: str, velocity: float, at: float = None) -> None:
+        """
+        Records that the belt runs with velocity (0 = stopped) from time at (time.monotonic(), defaults to now)
+        """
+        at = time.monotonic() if at is None else at
+        sign = -1 if direction == "backwards" else 1
+
+        with self.lock:
+            self.position += self.speed * (at - self.time)
+            self.speed = sign * velocity * self.speed_per_unit
+            self.time = at
+
+    def moved(self, direction: str, distance: float) -> None:
+        """
+        Records finished belt_distance command (belt moved by distance from the position at the last set_velocity and stopped).
+        The controller answers belt_distance after the travel ends, set_velocity is called when the command is sent.
+        """
+        sign = -1 if direction == "backwards" else 1
+
+        with self.lock:
+            self.position += sign * distance
+            self.speed = 0.0
+            self.time = time.monotonic()
+
+    def position_at(self, at: float = None) -> float:
+        """
+        Returns position of the belt at time at (time.monotonic(), defaults to now, can be in the future)
+        """
+        at = time.monotonic() if at is None else at
+
+        with self.lock:
+            return self.position + self.speed * (at - self.time)
+
+
+class TrackedPart:
+    """
+    Part lying on the belt measured at a known belt position
+    """
+    __slots__ = ("id", "pose", "belt_position", "time")
+
+    def __init__(self, id: int, pose, belt_position: float, time: float):
+        self.id = id
+        self.pose = pose                        # pose of the part when it was measured
+        self.belt_position = belt_position      # odometer position when the part was measured
+        self.time = time                        # time.monotonic() of the measurement
+
+    def __repr__(self) -> str:
+        return f"TrackedPart({self.id}, {self.pose!r})"
+
+
+class BeltTracker:
+    """
+    Picks parts from the running belt without stopping it.
+
+    Example:
+        tracker = BeltTracker(robot)
+        robot.belt_speed("forward", 20)
+        tracker.add_part(pose_from_camera, measured_at)
+        tracker.pick(tracker.next_part(), drop_pose)
+    """
+    def __init__(self, robot, axis: tuple[float, float, float] = BELT_AXIS, arm_speed: float = ARM_SPEED, lead: float = PICK_LEAD):
+        """
+        Args:
+            robot (Robot): The robot controlling the arm and the belt.
+            axis (tuple, optional): Direction of forward belt motion in robot coordinates. Defaults to BELT_AXIS.
+            arm_speed (float, optional): m/s of the arm at velocity 100. Defaults to ROBOT_ARM_SPEED.
+            lead (float, optional): Seconds added to every interception. Defaults to ROBOT_PICK_LEAD.
+        """
+        norm = math.sqrt(sum(a * a for a in axis))
+        self.robot = robot
+        self.axis = tuple(a / norm for a in axis)
+        self.arm_speed = arm_speed
+        self.lead = lead
+        self.parts: deque[TrackedPart] = deque()
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.feeding: threading.Thread = None
+
+    def add_part(self, pose, measured_at: float = None) -> TrackedPart:
+        """
+        Adds part measured on the belt
+
+        Args:
+            pose (Pose): Pose of the part at the time of the measurement.
+            measured_at (float, optional): time.monotonic() of the measurement. Defaults to now.
+        """
+        measured_at = time.monotonic() if measured_at is None else measured_at
+        part = TrackedPart(next(self.ids), pose.copy(), self.robot.belt.position_at(measured_at), measured_at)
+
+        with self.lock:
+            self.parts.append(part)
+
+        return part
+
+    def pending(self) -> list[TrackedPart]:
+        with self.lock:
+            return list(self.parts)
+
+    def predict(self, part: TrackedPart, at: float = None):
+        """
+        Returns pose of the part at time at (time.monotonic(), defaults to now)
+        """
+        shift = self.robot.belt.position_at(at) - part.belt_position
+        pose = part.pose.copy()
+        pose.position.x += self.axis[0] * shift
+        pose.position.y += self.axis[1] * shift
+        pose.position.z += self.axis[2] * shift
+
+        return pose
+
+    def travel_time(self, a, b, velocity: int = 100) -> float:
+        """
+        Returns estimated time of the arm move from pose a to pose b
+        """
+        distance = math.dist((a.position.x, a.position.y, a.position.z), (b.position.x, b.position.y, b.position.z))
+
+        return distance / (self.arm_speed * velocity / 100) + self.lead
+
+    def intercept(self, part: TrackedPart, velocity: int = 100, start=None) -> tuple:
+        """
+        Returns (pose, time.monotonic() of arrival) where the arm meets the part
+
+        Args:
+            part (TrackedPart): The part.
+            velocity (int, optional): The velocity of the arm (1-100). Defaults to 100.
+            start (Pose, optional): Pose of the arm. Defaults to the last known pose of the robot.
+        """
+        start = self.robot.get_pose(fresh=False) if start is None else start
+        now = time.monotonic()
+        arrival = now
+        target = self.predict(part, now)
+
+        # target moves while the arm travels, a few iterations converge for belt slower than the arm
+        for _ in range(4):
+            arrival = now + self.travel_time(start, target, velocity)
+            target = self.predict(part, arrival)
+
+        return target, arrival
+
+    def next_part(self, velocity: int = 100) -> TrackedPart:
+        """
+        Returns part which is reachable now and would leave the workspace first (None if there is none).
+        Parts which already left the workspace are forgotten.
+        """
+        start = self.robot.get_pose(fresh=False)
+        best = None
+
+        for part in self.pending():
+            target, _ = self.intercept(part, velocity, start)
+
+            if self.robot.calculate_ik(target) is None:
+                # moving away from the arm, it will not come back
+                if self._leaving(part):
+                    self.forget(part)
+                continue
+
+            progress = sum(a * p for a, p in zip(self.axis, (target.position.x, target.position.y, target.position.z)))
+            if best is None or progress > best[0]:
+                best = (progress, part)
+
+        return best[1] if best is not None else None
+
+    def _leaving(self, part: TrackedPart) -> bool:
+        # part is downstream of the arm base and the belt carries it further away
+        pose = self.predict(part)
+        progress = sum(a * p for a, p in zip(self.axis, (pose.position.x, pose.position.y, pose.position.z)))
+
+        return progress * self.robot.belt.speed > 0
+
+    def forget(self, part: TrackedPart) -> None:
+        with self.lock:
+            if part in self.parts:
+                self.parts.remove(part)
+
+    def pick(self, part: TrackedPart, dst, velocity: int = 100) -> str:
+        """
+        Picks the part from the running belt and places it at dst
+
+        Args:
+            part (TrackedPart): The part.
+            dst (Pose or callable): Destination pose or function part -> destination pose.
+            velocity (int, optional): The velocity of the arm (1-100). Defaults to 100.
+
+        Returns:
+            str: A message indicating the result of the operation.
+        """
+        target, _ = self.intercept(part, velocity)
+        self.forget(part)
+
+        # the belt moves during every extra request, so the batch does not check reachability again
+        # (next_part checked the interception, a target missed meanwhile fails the first move and nothing is picked)
+        with self.robot.batch(check_reachable=False) as batch:
+            batch.move_to(target, "LINEAR", velocity)
+            batch.suck()
+            batch.move_to(dst(part) if callable(dst) else dst, "JUMP", velocity)
+            batch.release()
+
+        if not batch.ok:
+            return batch.results[-1]
+
+        return "Success!"
+
+    def feed(self, stream) -> threading.Thread:
+        """
+        Adds parts from the stream in a background thread (e.g. positions from a camera)
+
+        Args:
+            stream (iterable): Yields Pose (measured now) or (Pose, time.monotonic() of the measurement).
+        """
+        def consume():
+            for item in stream:
+                if isinstance(item, tuple):
+                    self.add_part(*item)
+                else:
+                    self.add_part(item)
+
+        self.feeding = threading.Thread(target=consume, daemon=True, name="BeltTrackerFeed")
+        self.feeding.start()
+
+        return self.feeding
+
+    def run(self, dst, velocity: int = 100, idle_timeout: float = 5.0, poll: float = 0.01) -> list[str]:
+        """
+        Picks parts until the feed ends and no part is left (or no part appears for idle_timeout seconds)
+
+        Returns:
+            list[str]: Result of every pick.
+        """
+        results = []
+        idle_since = time.monotonic()
+
+        while True:
+            part = self.next_part(velocity)
+
+            if part is not None:
+                results.append(self.pick(part, dst, velocity))
+                idle_since = time.monotonic()
+                continue
+
+            feeding = self.feeding is not None and self.feeding.is_alive()
+            if (not feeding and not self.pending()) or time.monotonic() - idle_since > idle_timeout:
+                return results
+
+            time.sleep(poll)
+
+
+def calibrate_belt(robot, velocity: int = 20, distances: tuple[float, float] = (0.05, 0.15), direction: str = "forward") -> float:
+    """
+    Measures m/s of the belt per unit of velocity by timing two belt_distance moves (answered after the travel ends,
+    the difference cancels latency and acceleration of the belt) and sets it to robot.belt
+
+    Args:
+        robot (Robot): The robot controlling the belt.
+        velocity (int, optional): Velocity of the belt (1-50) used for the measurement. Defaults to 20.
+        distances (tuple[float, float], optional): Distances of the two moves in meters.
+        direction (str, optional): Direction of the moves. Defaults to 'forward'.
+
+    Returns:
+        float: Measured m/s per unit of velocity.
+    """
+    durations = []
+    for distance in distances:
+        start = time.perf_counter()
+        robot.belt_distance(direction, velocity, distance)
+        durations.append(time.perf_counter() - start)
+
+    if durations[1] <= durations[0]:
+        raise ValueError("Belt moves took the same time, use longer distances")
+
+    speed_per_unit = (distances[1] - distances[0]) / (durations[1] - durations[0]) / velocity
+    robot.belt.speed_per_unit = speed_per_unit
+
+    return speed_per_unit
@@ -0,0 +1,306 @@
+from dotenv import load_dotenv
+import json
+import os
+import threading
+import time
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+CONNECT_TIMEOUT = float(os.getenv('ROBOT_CONNECT_TIMEOUT', '3.05'))   # seconds
+READ_TIMEOUT = float(os.getenv('ROBOT_READ_TIMEOUT', '120'))          # seconds (moves and homing block until done)
+RETRIES = int(os.getenv('ROBOT_RETRIES', '3'))                        # only for idempotent GET requests
+BACKOFF = float(os.getenv('ROBOT_BACKOFF', '0.1'))                    # seconds, doubled on every retry
+POOL_SIZE = int(os.getenv('ROBOT_POOL_SIZE', '10'))
+PROBE_TIMEOUT = float(os.getenv('ROBOT_PROBE_TIMEOUT', '0.5'))       # seconds, health checks of HealthMonitor
+HEALTH_INTERVAL = float(os.getenv('ROBOT_HEALTH_INTERVAL', '2.0'))    # seconds between health checks of HealthMonitor
+
+
+class RequestRecord:
+    """
+    Information about one finished request passed to transport observers
+    """
+    __slots__ = ("time", "method", "path", "body", "seconds", "status", "bytes_sent", "bytes_received", "retries", "text")
+
+    def __init__(self, start: float, method: str, path: str, kwargs: dict, seconds: float,
+                 response: requests.Response = None, error: Exception = None):
+        body = kwargs.get("data")
+        if body is None and kwargs.get("json") is not None:
+            body = json.dumps(kwargs["json"])
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+
+        self.time = start                   # time.time() when the request was sent
+        self.method = method
+        self.path = path                    # including query string
+        self.body = body
+        self.seconds = seconds
+        self.bytes_sent = len(body.encode("utf-8")) if body else 0
+
+        if response is not None:
+            history = getattr(getattr(response.raw, "retries", None), "history", None)
+            self.status = response.status_code
+            self.bytes_received = len(response.content)
+            self.retries = len(history) if history else 0
+            self.text = response.text
+        else:
+            self.status = 0                 # no response
+            self.bytes_received = 0
+            self.retries = 0
+            self.text = str(error)
+
+    @property
+    def endpoint(self) -> str:
+        """
+        Method and path without query string (e.g. 'PUT /eef/pose')
+        """
+        return f"{self.method} {self.path.split('?', 1)[0]}"
+
+
+class Transport:
+    """
+    Base class for the connection between Robot and the robot controller.
+    Subclasses only need to implement send().
+    """
+    def __init__(self, url: str):
+        """
+        Initializes the Transport object with the base url of the controller
+
+        Args:
+            url (str): Base url of the robot controller.
+        """
+        if url is None:
+            raise ValueError("Robot URL is not set (ROBOT_URL)")
+
+        self.url = url.rstrip("/")
+        self.observers = []
+
+    def add_observer(self, observer) -> None:
+        """
+        Registers observer(record: RequestRecord) called after every request (used for metrics and telemetry)
+        """
+        if observer not in self.observers:
+            self.observers = self.observers + [observer]
+
+    def remove_observer(self, observer) -> None:
+        self.observers = [o for o in self.observers if o != observer]
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Sends request to the controller and notifies observers
+
+        Args:
+            method (str): HTTP method ('GET', 'PUT').
+            path (str): Path of the endpoint including query string (e.g. '/eef/pose?moveType=JUMP').
+            **kwargs: Keyword arguments passed to requests (data, json, headers, ...).
+
+        Returns:
+            requests.Response: The response from the controller.
+        """
+        observers = self.observers
+        if not observers:
+            return self.send(method, path, **kwargs)
+
+        start = time.time()
+        begin = time.perf_counter()
+        response = None
+        error = None
+
+        try:
+            response = self.send(method, path, **kwargs)
+            return response
+
+        except Exception as e:
+            error = e
+            raise
+
+        finally:
+            record = RequestRecord(start, method, path, kwargs, time.perf_counter() - begin, response, error)
+            for observer in observers:
+                try:
+                    observer(record)
+                except Exception:
+                    # Broken observer must not stop the robot
+                    pass
+
+    def send(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Sends request to the controller (implemented by subclasses)
+        """
+        raise NotImplementedError
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+class HttpTransport(Transport):
+    """
+    Transport with persistent keep-alive connection pool, timeouts and retries of GET requests
+    """
+    def __init__(self, url: str, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 retries: int = RETRIES, backoff: float = BACKOFF, pool_size: int = POOL_SIZE):
+        """
+        Args:
+            url (str): Base url of the robot controller.
+            connect_timeout (float, optional): Timeout in seconds for establishing the connection.
+            read_timeout (float, optional): Timeout in seconds for waiting on the response.
+            retries (int, optional): Maximum number of retries of GET requests.
+            backoff (float, optional): Backoff factor in seconds between retries.
+            pool_size (int, optional): Maximum number of kept-alive connections.
+        """
+        super().__init__(url)
+        self.timeout = (connect_timeout, read_timeout)
+
+        # PUT requests move the robot, so only GET is retried after the request was sent
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def send(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+
+        return self.session.request(method, self.url + path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_transports: dict[str, Transport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(url: str) -> Transport:
+    """
+    Returns transport shared by everyone in this process talking to the given url
+
+    Args:
+        url (str): Base url of the robot controller.
+    """
+    with _transports_lock:
+        if url not in _transports:
+            _transports[url] = HttpTransport(url)
+
+        return _transports[url]
+
+
+class HealthMonitor:
+    """
+    Checks in background whether the controller answers, with short timeouts on its own connection
+    (an unreachable controller never blocks the caller for longer than the probe timeout)
+    """
+    def __init__(self, url: str, interval: float = HEALTH_INTERVAL, timeout: float = PROBE_TIMEOUT):
+        """
+        Args:
+            url (str): Base url of the robot controller.
+            interval (float, optional): Seconds between health checks. Defaults to ROBOT_HEALTH_INTERVAL.
+            timeout (float, optional): Timeout in seconds of one health check. Defaults to ROBOT_PROBE_TIMEOUT.
+        """
+        self.transport = HttpTransport(url, timeout, timeout, retries=0, pool_size=1)
+        self.interval = interval
+        self.available = False
+        self.error: str = None          # reason of the last failed health check
+        self.checked = 0.0              # time.monotonic() of the last health check
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread = None
+        self.listeners = []
+
+    def add_listener(self, listener) -> None:
+        """
+        Registers listener(available: bool) called after every background health check.
+        Bound methods are held weakly, the listener of a deleted object (e.g. handler of a closed session) is dropped.
+        """
+        if listener not in self._live_listeners():
+            ref = weakref.WeakMethod(listener) if hasattr(listener, "__self__") else listener
+            self.listeners = self.listeners + [ref]
+
+    def remove_listener(self, listener) -> None:
+        self.listeners = [ref for ref in self.listeners if _resolve(ref) not in (None, listener)]
+
+    def _live_listeners(self) -> list:
+        listeners = [_resolve(ref) for ref in self.listeners]
+
+        if None in listeners:
+            self.listeners = [ref for ref in self.listeners if _resolve(ref) is not None]
+
+        return [listener for listener in listeners if listener is not None]
+
+    def check(self) -> bool:
+        """
+        Sends one health check and returns whether the controller answered
+        """
+        try:
+            response = self.transport.get("/state/started")
+            self.error = None if response.status_code == 200 else f"Status code: {response.status_code}"
+
+        except requests.exceptions.RequestException as e:
+            self.error = str(e)
+
+        self.available = self.error is None
+        self.checked = time.monotonic()
+
+        return self.available
+
+    def start(self) -> 'HealthMonitor':
+        """
+        Checks the controller once and keeps checking it in background
+        """
+        if self.thread is None:
+            self.check()
+            self.thread = threading.Thread(target=self._run, daemon=True, name=f"HealthMonitor {self.transport.url}")
+            self.thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def _run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            available = self.check()
+
+            for listener in self._live_listeners():
+                try:
+                    listener(available)
+                except Exception:
+                    # Broken listener must not stop the health checks
+                    pass
+
+
+def _resolve(ref):
+    # listener stored by HealthMonitor.add_listener, None if its object was deleted
+    return ref() if isinstance(ref, weakref.WeakMethod) else ref
+
+
+_monitors: dict[str, HealthMonitor] = {}
+_monitors_lock = threading.Lock()
+
+
+def get_monitor(url: str) -> HealthMonitor:
+    """
+    Returns started health monitor shared by everyone in this process talking to the given url
+
+    Args:
+        url (str): Base url of the robot controller.
+    """
+    with _monitors_lock:
+        if url not in _monitors:
+            _monitors[url] = HealthMonitor(url).start()
+
+        return _monitors[url]
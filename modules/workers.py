@@ -0,0 +1,392 @@
+"""
+Pool of warm Python processes for running saved programs.
+Worker has already imported modules.robot and opened the connection to the controller, so a program starts in milliseconds
+instead of waiting for a new interpreter. Every worker runs at most ROBOT_WORKER_MAX_RUNS programs and is replaced by a fresh one.
+"""
+from dotenv import load_dotenv
+import contextlib
+import io
+import json
+import os
+import queue
+import runpy
+import subprocess
+import sys
+import threading
+import traceback
+
+load_dotenv()
+WORKERS = int(os.getenv('ROBOT_WORKERS', '2'))                         # warm processes per controller (0 = new interpreter for every program)
+MAX_RUNS = int(os.getenv('ROBOT_WORKER_MAX_RUNS', '1'))                # programs run by one worker (more = fewer startups, but shared module state)
+PROGRAM_TIMEOUT = float(os.getenv('ROBOT_PROGRAM_TIMEOUT', '600'))     # seconds, program is killed after it (0 = no limit)
+STARTUP_TIMEOUT = 30.0                                                 # seconds for a worker to import the modules
+
+
+class Worker:
+    """
+    One warm process, programs are sent as JSON lines on its stdin and results come back on its stdout
+    """
+    def __init__(self, url: str = None):
+        """
+        Args:
+            url (str, optional): Url of the robot the programs control. Defaults to ROBOT_URL of this process.
+        """
+        env = dict(os.environ)
+        if url is not None:
+            env["ROBOT_URL"] = url
+
+        self.process = subprocess.Popen([sys.executable, "-m", "modules.workers"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True, encoding="utf-8", env=env)
+        self.answers: queue.Queue[dict] = queue.Queue()
+        self.runs = 0
+
+        threading.Thread(target=self._read, daemon=True, name="Worker reader").start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            self.answers.put(json.loads(line))
+
+        # process ended (killed or crashed)
+        self.answers.put(None)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def wait_ready(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """
+        Waits until the worker imported the modules and connected to the controller
+        """
+        try:
+            answer = self.answers.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+        return answer is not None and answer.get("ready", False)
+
+    def run(self, file_path: str, timeout: float = None) -> subprocess.CompletedProcess:
+        """
+        Runs the program in the worker
+
+        Raises:
+            subprocess.TimeoutExpired: If the program runs longer than timeout seconds (the worker is killed).
+        """
+        self.runs += 1
+        self.process.stdin.write(json.dumps({"path": file_path}) + "\n")
+        self.process.stdin.flush()
+
+        try:
+            answer = self.answers.get(timeout=timeout)
+        except queue.Empty:
+            self.kill()
+            raise subprocess.TimeoutExpired(file_path, timeout)
+
+        if answer is None:
+            # killed by kill_programs (negative return code) or crashed
+            returncode = self.process.wait()
+            return subprocess.CompletedProcess(file_path, returncode, "", f"Worker process exited with code {returncode}")
+
+        return subprocess.CompletedProcess(file_path, answer["returncode"], answer["stdout"], answer["stderr"])
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+        except OSError:
+            # already finished
+            pass
+
+
+class WorkerPool:
+    """
+    Keeps warm workers ready and runs programs in them
+
+    Example:
+        workers = WorkerPool(size=2)
+        result = workers.run("./src/program.py", timeout=60)
+        print(result.returncode, result.stdout)
+    """
+    def __init__(self, url: str = None, size: int = WORKERS, max_runs: int = MAX_RUNS, timeout: float = PROGRAM_TIMEOUT):
+        """
+        Args:
+            url (str, optional): Url of the robot the programs control. Defaults to ROBOT_URL of this process.
+            size (int, optional): Number of warm workers. Defaults to ROBOT_WORKERS.
+            max_runs (int, optional): Programs run by one worker before it is replaced. Defaults to ROBOT_WORKER_MAX_RUNS.
+            timeout (float, optional): Default timeout of a program in seconds (0 = no limit). Defaults to ROBOT_PROGRAM_TIMEOUT.
+        """
+        self.url = url
+        self.max_runs = max(1, max_runs)
+        self.timeout = timeout
+        self.idle: queue.Queue[Worker] = queue.Queue()
+        self.running: set[Worker] = set()
+        self.lock = threading.Lock()
+        self.closed = False
+
+        for _ in range(size):
+            self._spawn()
+
+    def _spawn(self) -> None:
+        # worker is started in background and becomes idle when it is ready
+        def start():
+            worker = Worker(self.url)
+
+            if worker.wait_ready() and not self.closed:
+                self.idle.put(worker)
+            else:
+                worker.kill()
+
+        threading.Thread(target=start, daemon=True, name="Worker start").start()
+
+    def _take(self) -> Worker:
+        # all workers busy or still starting, the caller starts a new interpreter instead of waiting
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return None
+
+            if worker.alive:
+                return worker
+
+            self._spawn()
+
+    def run(self, file_path: str, timeout: float = None) -> subprocess.CompletedProcess:
+        """
+        Runs the program in a warm worker
+
+        Args:
+            file_path (str): Path of the program.
+            timeout (float, optional): Seconds after which the program is killed. Defaults to the timeout of the pool.
+
+        Raises:
+            subprocess.TimeoutExpired: If the program runs longer than timeout.
+
+        Returns:
+            CompletedProcess: Return code and output of the program, None if no worker is ready now.
+        """
+        timeout = self.timeout if timeout is None else timeout
+
+        worker = self._take()
+        if worker is None:
+            return None
+
+        with self.lock:
+            self.running.add(worker)
+
+        try:
+            return worker.run(file_path, timeout or None)
+
+        finally:
+            with self.lock:
+                self.running.discard(worker)
+
+            if worker.alive and worker.runs < self.max_runs and not self.closed:
+                self.idle.put(worker)
+            else:
+                worker.kill()
+                if not self.closed:
+                    self._spawn()
+
+    def kill_running(self) -> int:
+        """
+        Kills workers which run a program (they are replaced by fresh ones)
+
+        Returns:
+            int: Number of killed programs.
+        """
+        with self.lock:
+            running = list(self.running)
+
+        for worker in running:
+            worker.kill()
+
+        return len(running)
+
+    def close(self) -> None:
+        self.closed = True
+
+        while True:
+            try:
+                self.idle.get_nowait().kill()
+            except queue.Empty:
+                break
+
+        self.kill_running()
+
+
+_pools: dict[str, WorkerPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_worker_pool(url: str = None) -> WorkerPool:
+    """
+    Returns pool of warm workers shared by the whole process for the given url (None if ROBOT_WORKERS is 0)
+
+    Args:
+        url (str, optional): Url of the robot the programs control. Defaults to ROBOT_URL of this process.
+    """
+    if WORKERS <= 0:
+        return None
+
+    with _pools_lock:
+        if url not in _pools:
+            _pools[url] = WorkerPool(url)
+
+        return _pools[url]
+
+
+_programs: set[subprocess.Popen] = set()     # programs started by run_program which are still running
+_programs_lock = threading.Lock()
+
+
+def run_program(file_path: str, url: str = None, timeout: float = PROGRAM_TIMEOUT) -> str:
+    """
+    Runs saved program in a warm worker (or as new subprocess if ROBOT_WORKERS is 0) with ROBOT_URL set to url and returns its result.
+    The program can be killed by kill_programs (e.g. by the emergency stop).
+
+    Args:
+        file_path (str): Path of the program.
+        url (str, optional): Url of the robot the program controls. Defaults to ROBOT_URL of this process.
+        timeout (float, optional): Seconds after which the program is killed (0 = no limit). Defaults to ROBOT_PROGRAM_TIMEOUT.
+    """
+    try:
+        workers = get_worker_pool(url)
+        result = workers.run(file_path, timeout) if workers is not None else None
+
+        # no worker is ready (all busy or still starting)
+        if result is None:
+            result = _run_subprocess(file_path, url, timeout)
+
+        if result.returncode == 0:
+            return f"Program was successfully run! Output:\n{result.stdout}"
+
+        if result.returncode < 0:
+            return f"Program was killed (signal {-result.returncode}). Output:\n{result.stdout}"
+
+        return f"Program exited with errors. Error:\n{result.stderr}"
+
+    except subprocess.TimeoutExpired:
+        return f"Program was killed after {timeout} s (timeout)."
+
+    except Exception as e:
+        return f"Error occurred: {e}"
+
+
+def _run_subprocess(file_path: str, url: str = None, timeout: float = None) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    if url is not None:
+        env["ROBOT_URL"] = url
+
+    process = subprocess.Popen([sys.executable, file_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+
+    with _programs_lock:
+        _programs.add(process)
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout or None)
+
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise
+
+    finally:
+        with _programs_lock:
+            _programs.discard(process)
+
+    return subprocess.CompletedProcess(file_path, process.returncode, stdout, stderr)
+
+
+def kill_programs() -> int:
+    """
+    Kills all programs started by run_program which are still running (in workers and subprocesses)
+
+    Returns:
+        int: Number of killed programs.
+    """
+    with _programs_lock:
+        programs = list(_programs)
+
+    for process in programs:
+        try:
+            process.kill()
+        except OSError:
+            # already finished
+            pass
+
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    return len(programs) + sum(pool.kill_running() for pool in pools)
+
+
+def _run_here(file_path: str) -> dict:
+    """
+    Runs the program in this process as if it was started by python file_path and returns its result
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    argv, path, stdin, cwd = sys.argv, list(sys.path), sys.stdin, os.getcwd()
+    modules = set(sys.modules)
+    returncode = 0
+
+    try:
+        sys.argv = [file_path]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(file_path)))
+        sys.stdin = io.StringIO()
+
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                runpy.run_path(file_path, run_name="__main__")
+
+            except SystemExit as e:
+                if isinstance(e.code, int) or e.code is None:
+                    returncode = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    returncode = 1
+
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+
+    finally:
+        sys.argv, sys.path[:], sys.stdin = argv, path, stdin
+        os.chdir(cwd)
+
+        # modules imported by the program are imported again by the next one
+        for name in set(sys.modules) - modules:
+            del sys.modules[name]
+
+    return {"returncode": returncode, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def serve() -> None:
+    """
+    Main loop of a worker process, runs programs sent by Worker on stdin
+    """
+    # answers use a copy of stdout, anything written directly to the file descriptor is dropped
+    answers = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    commands = sys.stdin
+
+    # the work done once for all programs of this worker
+    import modules.robot as r
+    import modules.transport as t
+
+    try:
+        t.get_transport(r.URL).get("/state/started")
+    except Exception:
+        # controller is not reachable now, programs report it themselves
+        pass
+
+    def answer(data: dict) -> None:
+        answers.write(json.dumps(data) + "\n")
+        answers.flush()
+
+    answer({"ready": True})
+
+    for line in commands:
+        answer(_run_here(json.loads(line)["path"]))
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,74 @@
+"""
+Fixtures shared by the tests (run from the repository root: python -m pytest tests)
+"""
+import json
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import modules.ik_cache as ik
+import modules.robot as r
+import modules.simulator as sim
+import modules.transport as t
+
+
+class ScriptedSimulator(sim.Simulator):
+    """
+    Simulator with failures at known requests instead of random ones
+
+    Example:
+        simulator.fail["PUT /eef/pose"] = {3}     # the third move answers 500
+        simulator.down = True                     # every request answers 503
+    """
+    def __init__(self, **kwargs):
+        super().__init__(time_scale=0, **kwargs)
+        self.fail: dict[str, set[int]] = {}
+        self.down = False
+
+    def handle(self, method: str, path: str, query: dict, body: str) -> tuple[int, str]:
+        endpoint = f"{method} {path}"
+
+        if self.down:
+            return 503, ""
+
+        with self.lock:
+            number = self.requests[endpoint] + 1
+
+        if number in self.fail.get(endpoint, ()):
+            with self.lock:
+                self.requests[endpoint] += 1
+            return 500, json.dumps({"message": "Scripted failure."})
+
+        return super().handle(method, path, query, body)
+
+
+@pytest.fixture
+def simulator():
+    simulator = ScriptedSimulator()
+    simulator.start()
+
+    yield simulator
+
+    simulator.stop()
+
+
+@pytest.fixture
+def robot(simulator):
+    """
+    Robot in Mode.ASSISTANT with its own connection and IK cache, IK is always asked from the simulator
+    """
+    robot = r.Robot(simulator.url, r.Mode.ASSISTANT, t.HttpTransport(simulator.url), ik_cache=ik.IKCache(), ik_mode="remote")
+
+    yield robot
+
+    robot.transport.close()
+
+
+def pose(x: float, y: float, z: float = 0.05) -> r.Pose:
+    """
+    Pose with the suction cup pointing down
+    """
+    return r.Pose(r.Position(x, y, z), r.Orientation(0, 0, 1, 0))
@@ -0,0 +1,78 @@
+"""
+Lazy robot connection of FunctionHandler
+"""
+import gc
+import time
+import pytest
+import modules.functions as f
+import modules.transport as t
+import modules.workers as w
+from conftest import ROOT
+
+
+def wait_until(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+
+    return condition()
+
+
+@pytest.fixture
+def monitor(simulator, monkeypatch):
+    """
+    Fast health checks of the simulator instead of the shared monitor with ROBOT_HEALTH_INTERVAL
+    """
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(w, "WORKERS", 0)
+
+    monitor = t.HealthMonitor(simulator.url, interval=0.02)
+    monkeypatch.setitem(t._monitors, simulator.url, monitor)
+
+    yield monitor
+
+    monitor.stop()
+
+
+def spec_names(handler: f.FunctionHandler) -> set:
+    return {spec["name"] for spec in handler.get_all_specs()}
+
+
+def test_connects_when_controller_appears_and_withdraws_robot_functions(simulator, monitor):
+    simulator.down = True
+    monitor.start()
+    handler = f.FunctionHandler(0, simulator.url)
+
+    assert not handler.robot_running
+    assert "move_to" not in spec_names(handler)
+    assert handler.robot is None
+    assert handler.handle_function("get_pose", {}).startswith("Robot is not available")
+
+    simulator.down = False
+    assert wait_until(lambda: handler.robot_running)
+    assert "move_to" in spec_names(handler)
+
+    simulator.down = True
+    assert wait_until(lambda: not handler.robot_running)
+    assert "move_to" not in spec_names(handler)
+
+    # the Robot stays connected, the functions come back with the controller
+    simulator.down = False
+    assert wait_until(lambda: handler.robot_running)
+    handler.close()
+
+
+def test_closed_or_deleted_handler_is_not_kept_by_the_monitor(simulator, monitor):
+    monitor.start()
+
+    handler = f.FunctionHandler(0, simulator.url)
+    assert handler.on_health_check in monitor._live_listeners()
+    handler.close()
+    assert monitor._live_listeners() == []
+
+    handler = f.FunctionHandler(0, simulator.url)
+    del handler
+    gc.collect()
+    assert monitor._live_listeners() == []
@@ -0,0 +1,156 @@
+"""
+Command batches, failure reporting of multi-command methods and the IK cache (against the local simulator)
+"""
+import pytest
+import modules.ik_cache as ik
+import modules.robot as r
+import modules.tracking as bt
+from conftest import pose
+
+
+def pick_place_batch(robot: r.Robot) -> r.CommandBatch:
+    batch = r.CommandBatch(robot)
+    batch.move_to(pose(0.2, 0.0), "JUMP")
+    batch.suck()
+    batch.move_to(pose(0.2, 0.05), "JUMP")
+    batch.release()
+
+    return batch
+
+
+def test_batch_sends_all_commands(robot, simulator):
+    batch = pick_place_batch(robot)
+    batch.send()
+
+    assert batch.ok
+    assert batch.failed_index is None
+    assert len(batch.results) == 4
+    assert simulator.requests["PUT /release"] == 1
+
+
+def test_batch_stops_at_failed_command_in_assistant_mode(robot, simulator):
+    simulator.fail["PUT /eef/pose"] = {2}
+    batch = pick_place_batch(robot)
+    batch.send()
+
+    assert not batch.ok
+    assert batch.failed_index == 2
+    assert len(batch.results) == 3
+    assert batch.results[-1].startswith("Command 2 (move_to) failed")
+    assert simulator.requests["PUT /release"] == 0
+
+
+def test_batch_failure_of_last_command_is_not_ok(robot, simulator):
+    simulator.fail["PUT /release"] = {1}
+    batch = pick_place_batch(robot)
+    batch.send()
+
+    # the failure message is a result too, so the number of results equals the number of commands
+    assert len(batch.results) == len(batch.commands)
+    assert not batch.ok
+    assert batch.failed_index == 3
+
+
+def test_batch_raises_with_index_in_default_mode(robot, simulator):
+    robot.mode = r.Mode.DEFAULT
+    simulator.fail["PUT /eef/pose"] = {2}
+
+    with pytest.raises(r.BatchError) as error:
+        pick_place_batch(robot).send()
+
+    assert error.value.index == 2
+    assert len(error.value.results) == 2
+
+
+def test_invalid_or_unreachable_batch_sends_nothing(robot, simulator):
+    batch = pick_place_batch(robot)
+    batch.move_to(pose(0.2, 0.0), "JUMP", velocity=500)
+
+    with pytest.raises(r.BatchError) as error:
+        batch.send()
+    assert error.value.index == 4
+
+    batch = pick_place_batch(robot)
+    batch.move_to(pose(5.0, 5.0), "JUMP")
+
+    with pytest.raises(r.BatchError) as error:
+        batch.send()
+    assert error.value.index == 4
+
+    assert simulator.requests["PUT /eef/pose"] == 0
+    assert simulator.requests["PUT /suck"] == 0
+
+
+def test_follow_path_reports_failed_last_waypoint(robot, simulator):
+    waypoints = [pose(0.2, 0.0), pose(0.2, 0.05), pose(0.25, 0.05)]
+    simulator.fail["PUT /eef/pose"] = {3}
+
+    result = robot.follow_path(waypoints, "JOINTS")
+    assert result.startswith("Command 2 (move_to) failed")
+
+    assert robot.follow_path(waypoints, "JOINTS") == "Success! Moved through 3 waypoints (0 skipped)."
+
+
+def test_pick_and_place_reports_failed_last_release(robot, simulator):
+    jobs = [(pose(0.2, 0.0), pose(0.2, 0.05)), (pose(0.22, 0.0), pose(0.22, 0.05))]
+    simulator.fail["PUT /release"] = {2}
+
+    result = robot.pick_and_place(jobs)
+    assert "(release) failed" in result
+
+    assert robot.pick_and_place(jobs).startswith("Success! Moved 2 objects")
+
+
+def test_belt_pick_reports_failed_release_and_skips_reachability_check(robot, simulator):
+    tracker = bt.BeltTracker(robot)
+    simulator.fail["PUT /release"] = {1}
+
+    result = tracker.pick(tracker.add_part(pose(0.2, 0.0)), pose(0.2, 0.05))
+    assert "(release) failed" in result
+
+    assert tracker.pick(tracker.add_part(pose(0.2, 0.0)), pose(0.2, 0.05)) == "Success!"
+
+    # the intercept is sent at once, an extra IK round trip would let the belt move away
+    assert simulator.requests["PUT /ik"] == 0
+
+
+def test_ik_cache_hits_and_negative_results(robot, simulator):
+    assert robot.calculate_ik(pose(0.2, 0.0)) is not None
+    assert robot.calculate_ik(pose(0.2, 0.0)) is not None
+
+    # closer than the tolerance of the cache
+    assert robot.calculate_ik(pose(0.2 + robot.ik_cache.tolerance / 10, 0.0)) is not None
+
+    assert robot.calculate_ik(pose(5.0, 5.0)) is None
+    assert robot.calculate_ik(pose(5.0, 5.0)) is None
+
+    assert simulator.requests["PUT /ik"] == 2
+    assert robot.ik_cache.stats() == {"hits": 3, "misses": 2, "size": 2}
+
+
+def test_ik_cache_eviction_and_clear(robot, simulator):
+    robot.ik_cache = ik.IKCache(max_size=2)
+
+    for y in (0.0, 0.01, 0.02):
+        robot.calculate_ik(pose(0.2, y))
+    assert simulator.requests["PUT /ik"] == 3
+
+    # least recently used pose was dropped
+    robot.calculate_ik(pose(0.2, 0.02))
+    assert simulator.requests["PUT /ik"] == 3
+    robot.calculate_ik(pose(0.2, 0.0))
+    assert simulator.requests["PUT /ik"] == 4
+
+    robot.ik_cache.clear()
+    robot.calculate_ik(pose(0.2, 0.0))
+    assert simulator.requests["PUT /ik"] == 5
+
+
+def test_ik_cache_file_with_other_tolerance_is_ignored(tmp_path):
+    path = str(tmp_path / "ik.json")
+    cache = ik.IKCache(path=path)
+    cache.put(pose(0.2, 0.0), [0.0, 0.1, 0.2, 0.3, 0.4])
+    cache.save()
+
+    assert ik.IKCache(path=path).get(pose(0.2, 0.0)) == (True, [0.0, 0.1, 0.2, 0.3, 0.4])
+    assert ik.IKCache(tolerance=0.001, path=path).get(pose(0.2, 0.0)) == (False, None)